@@ -14,6 +14,7 @@ import itertools
 import logging
 
 
+from pytype import call_cache
 from pytype import exceptions
 from pytype import function
 from pytype import output
@@ -2302,27 +2303,35 @@ class InterpreterClass(SimpleAbstractValue, Class):
     methods = []
     constants = collections.defaultdict(pytd_utils.TypeBuilder)
 
+    # Filter all members at once, which lets the solver share work.
+    members = [(name, member) for name, member in self.members.items()
+               if name not in output.CLASS_LEVEL_IGNORE]
+    instance_members = [(name, member) for instance in self.instances
+                        for name, member in instance.members.items()
+                        if name not in output.CLASS_LEVEL_IGNORE]
+    visible = self.vm.program.solver.FilterMany(
+        [member for _, member in members + instance_members],
+        self.vm.exitpoint)
+
     # class-level attributes
-    for name, member in self.members.items():
-      if name not in output.CLASS_LEVEL_IGNORE:
-        for value in member.FilteredData(self.vm.exitpoint):
-          if isinstance(value, Function):
-            v = value.to_pytd_def(node, name)
-            if isinstance(v, pytd.Function):
-              methods.append(v)
-            elif isinstance(v, pytd.TYPE):
-              constants[name].add_type(v)
-            else:
-              raise AssertionError(str(type(v)))
+    for (name, _), bindings in zip(members, visible):
+      for binding in bindings:
+        value = binding.data
+        if isinstance(value, Function):
+          v = value.to_pytd_def(node, name)
+          if isinstance(v, pytd.Function):
+            methods.append(v)
+          elif isinstance(v, pytd.TYPE):
+            constants[name].add_type(v)
           else:
-            constants[name].add_type(value.to_type(node))
+            raise AssertionError(str(type(v)))
+        else:
+          constants[name].add_type(value.to_type(node))
 
     # instance-level attributes
-    for instance in self.instances:
-      for name, member in instance.members.items():
-        if name not in output.CLASS_LEVEL_IGNORE:
-          for value in member.FilteredData(self.vm.exitpoint):
-            constants[name].add_type(value.to_type(node))
+    for (name, _), bindings in zip(instance_members, visible[len(members):]):
+      for binding in bindings:
+        constants[name].add_type(binding.data.to_type(node))
 
     bases = [pytd_utils.JoinTypes(b.get_instance_type(node)
                                   for b in basevar.data)
@@ -2391,8 +2400,6 @@ class InterpreterFunction(Function):
     vm: TypegraphVirtualMachine instance.
   """
 
-  _function_cache = {}
-
   @staticmethod
   def make_function(name, code, f_locals, f_globals, defaults, kw_defaults,
                     closure, annotations, vm):
@@ -2401,7 +2408,8 @@ class InterpreterFunction(Function):
     Things like anonymous functions and generator expressions are created
     every time the corresponding code executes. Caching them makes it easier
     to detect when the environment hasn't changed and a function call can be
-    optimized away.
+    optimized away. The cache is per VM, since the VMs in a process can share
+    code objects (e.g. the ones of __builtin__.py).
 
     Arguments:
       name: Function name.
@@ -2427,11 +2435,11 @@ class InterpreterFunction(Function):
                  for key, value in annotations.items()}, None),
                (dict(enumerate(defaults)), None),
                (dict(enumerate(closure or ())), None)))
-    if key not in InterpreterFunction._function_cache:
-      InterpreterFunction._function_cache[key] = InterpreterFunction(
+    if key not in vm.function_cache:
+      vm.function_cache[key] = InterpreterFunction(
           name, code, f_locals, f_globals, defaults, kw_defaults,
           closure, annotations, vm, vm.root_cfg_node)
-    return InterpreterFunction._function_cache[key]
+    return vm.function_cache[key]
 
   def __init__(self, name, code, f_locals, f_globals, defaults, kw_defaults,
                closure, annotations, vm, node):
@@ -2448,7 +2456,14 @@ class InterpreterFunction(Function):
     self.closure = closure
     self.annotations = annotations
     self.cls = self.vm.convert.function_type
+    # Maps call keys to (callargs, ret, node_after_call), for the signatures.
+    # The return values to reuse are in vm.call_cache. Once there are more than
+    # --max-call-records, they're folded into _folded_calls.
     self._call_records = {}
+    # Maps (params, ret) to node_after_call, where "params" is a sorted tuple
+    # of (name, data tuple) and "ret" the data tuple of the return value.
+    self._folded_calls = {}
+    self._num_calls = 0
     self.nonstararg_count = self.code.co_argcount
     if self.code.co_kwonlyargcount >= 0:  # This is usually -1 or 0 (fast call)
       self.nonstararg_count += self.code.co_kwonlyargcount
@@ -2632,12 +2647,14 @@ class InterpreterFunction(Function):
           (callargs, None),
           (frame.f_globals.members, set(self.code.co_names)),
           (frame.f_locals.members, set(self.code.co_varnames)))
+      old_result = self.vm.call_cache.get(self, callkey)
     else:
       # Make the callkey the number of times this function has been called so
       # that no call has the same key as a previous one.
-      callkey = len(self._call_records)
-    if callkey in self._call_records:
-      _, old_ret, _, old_remaining_depth = self._call_records[callkey]
+      callkey = self._num_calls
+      old_result = None
+    if old_result is not None:
+      old_ret, old_remaining_depth = old_result
       # Optimization: This function has already been called, with the same
       # environment and arguments, so recycle the old return value and don't
       # record this call. We pretend that this return value originated at the
@@ -2655,6 +2672,7 @@ class InterpreterFunction(Function):
         ret = self.vm.program.NewVariable(old_ret.name, old_ret.data, [], node)
         return node, ret
 
+    num_cfg_nodes = len(self.vm.program.cfg_nodes)
     if self.code.co_flags & loadmarshal.CodeType.CO_GENERATOR:
       generator = Generator(frame, self.vm, node)
       # Run the generator right now, even though the program didn't call it,
@@ -2663,26 +2681,67 @@ class InterpreterFunction(Function):
       node_after_call, ret = node2, generator.to_variable(node2, self.name)
     else:
       node_after_call, ret = self.vm.run_frame(frame, node)
-    self._call_records[callkey] = (callargs,
-                                   ret,
-                                   node_after_call,
-                                   self.vm.remaining_depth())
+    self._num_calls += 1
+    self._call_records[callkey] = (callargs, ret, node_after_call)
+    if len(self._call_records) > self.vm.options.max_call_records:
+      self._fold_call_records()
+    if self.vm.options.skip_repeat_calls:
+      self.vm.call_cache.add(
+          self, callkey, call_cache.CallResult(ret, self.vm.remaining_depth()),
+          len(self.vm.program.cfg_nodes) - num_cfg_nodes)
     self.last_frame = frame
     return node_after_call, ret
 
+  def has_been_called(self):
+    return bool(self._call_records or self._folded_calls)
+
+  def _fold_call_records(self):
+    """Replace the call records with their data, to bound their memory.
+
+    Calls with the same data for every parameter and the return value are
+    folded into one. The folded calls lose the information which of their
+    bindings are visible together, so their signatures are the full Cartesian
+    product of the data.
+    """
+    log.info("Folding %d call records of %r",
+             len(self._call_records), self.name)
+    for callargs, ret, node_after_call in self._call_records.values():
+      params = tuple(sorted((name, tuple(var.data))
+                            for name, var in callargs.items()))
+      self._folded_calls.setdefault((params, tuple(ret.data)), node_after_call)
+    self._call_records = {}
+
   def _get_call_combinations(self):
+    """Get the possible signatures of this function's calls.
+
+    Yields:
+      Tuples (node_after_call, combination, return_data). "combination" maps
+      the parameter names to their data.
+    """
     signature_data = set()
-    for callargs, ret, node_after_call, _ in self._call_records.values():
+    for callargs, ret, node_after_call in self._call_records.values():
       for combination in utils.variable_product_dict(callargs):
         for return_value in ret.bindings:
-          values = combination.values() + [return_value]
-          data = tuple(v.data for v in values)
+          data = (tuple(sorted((name, value.data)
+                               for name, value in combination.items())),
+                  return_value.data)
           if data in signature_data:
             # This combination yields a signature we already know is possible
             continue
-          if node_after_call.HasCombination(values):
+          if node_after_call.HasCombination(
+              combination.values() + [return_value]):
+            signature_data.add(data)
+            yield (node_after_call,
+                   {name: value.data for name, value in combination.items()},
+                   return_value.data)
+    for (params, ret), node_after_call in self._folded_calls.items():
+      names = [name for name, _ in params]
+      for values in itertools.product(*[data for _, data in params]):
+        for return_data in ret:
+          data = (tuple(zip(names, values)), return_data)
+          if data not in signature_data:
             signature_data.add(data)
-            yield node_after_call, combination, return_value
+            yield node_after_call, dict(zip(names, values)), return_data
 
   def _fix_param_name(self, name):
     """Sanitize a parameter name; remove Python intrinstics."""
@@ -2728,14 +2787,14 @@ class InterpreterFunction(Function):
   def to_pytd_def(self, node, function_name):
     """Generate a pytd.Function definition."""
     signatures = []
-    for node_after, combination, return_value in self._get_call_combinations():
+    for node_after, combination, return_data in self._get_call_combinations():
       params = tuple(pytd.Parameter(self._fix_param_name(name),
-                                    combination[name].data.to_type(node),
+                                    combination[name].to_type(node),
                                     kwonly, optional, None)
                      for name, kwonly, optional in self.get_parameters())
       params = self._with_replaced_annotations(node_after, params)
       ret = self._get_annotation_return(
-          node, default=return_value.data.to_type(node_after))
+          node, default=return_data.to_type(node_after))
       starargs, starstarargs = self._get_star_params()
       signatures.append(pytd.Signature(
           params=params,
@@ -1,13 +1,26 @@
 """Functions for computing the execution order of bytecode."""
 
+import array
+
+from pytype import metrics
 from pytype import utils
 from pytype.pyc import opcodes
 from pytype.pyc import pyc
 
 
+# Code objects are only split into blocks once the VM needs their bytecode.
+# The difference between these two is the number of code objects that were
+# never run (e.g. functions that --main doesn't reach).
+_code_objects = metrics.Counter("ordered_code_objects")
+_code_objects_ordered = metrics.Counter("ordered_code_objects_materialized")
+
+
 class OrderedCode(object):
   """Code object which knows about instruction ordering.
 
+  The bytecode of the underlying code object is disassembled and ordered on
+  first access to co_code or order.
+
   Attributes:
     co_*: Same as loadmarshal.CodeType.
     order: A list of bytecode blocks. They're ordered ancestors-first, see
@@ -23,15 +36,42 @@ class OrderedCode(object):
     # callers).
     assert hasattr(code, "co_code")
     self.__dict__.update({name: value for name, value in code.__dict__.items()
-                          if name.startswith("co_")})
-    self.order = order
+                          if name.startswith("co_") and name != "co_code"})
     self.python_version = python_version
+    # The code object to compute co_code and order from, if we haven't yet.
+    self._code = None
+    _code_objects.inc()
+    if bytecode is None:
+      self._code = code
+    else:
+      self._set_bytecode(bytecode, order)
+
+  def _set_bytecode(self, bytecode, order):
+    _code_objects_ordered.inc()
+    self._order = order
     # Store the "nice" version of the bytecode under co_code. We never claimed
     # to be compatible with CodeType.
-    self.co_code = bytecode
+    self._co_code = bytecode
     for insn in bytecode:
       insn.code = self
 
+  def _materialize(self):
+    code, self._code = self._code, None
+    bytecode = _order_bytecode(code)
+    self._set_bytecode(bytecode, compute_order(bytecode))
+
+  @property
+  def co_code(self):
+    if self._code is not None:
+      self._materialize()
+    return self._co_code
+
+  @property
+  def order(self):
+    if self._code is not None:
+      self._materialize()
+    return self._order
+
 
 class Block(object):
   """A block is a node in a directed graph.
@@ -75,6 +115,178 @@ class Block(object):
     return self.code.__iter__()
 
 
+class CompactOrderedCode(OrderedCode):
+  """An OrderedCode that stores its instructions in arrays.
+
+  Instead of keeping an opcodes.Opcode instance per instruction, this stores
+  the class, argument, line and jump targets of each instruction in parallel
+  arrays, and blocks as ranges of instruction indices. co_code and the blocks
+  return CompactOpcode views into these arrays, which have the same API as
+  opcodes.Opcode. This uses a fraction of the memory for large functions, at
+  the cost of creating a view for every instruction accessed.
+  """
+
+  # The opcode classes that appear in code, for storing them as integers.
+  _classes = []
+  _class_to_id = {}
+
+  @classmethod
+  def _class_id(cls, opcode_class):
+    i = cls._class_to_id.get(opcode_class)
+    if i is None:
+      i = cls._class_to_id[opcode_class] = len(cls._classes)
+      cls._classes.append(opcode_class)
+    return i
+
+  def _set_bytecode(self, bytecode, order):
+    _code_objects_ordered.inc()
+    self._opcodes = array.array(
+        "i", (self._class_id(op.__class__) for op in bytecode))
+    self._args = array.array(
+        "i", (op.arg if op.has_arg() else 0 for op in bytecode))
+    self._lines = array.array("i", (op.line for op in bytecode))
+    self._targets = array.array(
+        "i", (op.target.index if op.target else -1 for op in bytecode))
+    self._block_targets = array.array(
+        "i", (op.block_target.index if op.block_target else -1
+              for op in bytecode))
+    self._co_code = _InstructionRange(self, 0, len(bytecode))
+    # Rebuild the blocks on top of index ranges.
+    new_blocks = {}
+    for block in order:
+      start = block.code[0].index
+      new_blocks[block] = Block(
+          _InstructionRange(self, start, start + len(block.code)))
+    for block in order:
+      for target in block.outgoing:
+        new_blocks[block].connect_outgoing(new_blocks[target])
+    self._order = [new_blocks[block] for block in order]
+
+
+class CompactOpcode(object):
+  """A view of one instruction of a CompactOrderedCode.
+
+  Supports the read-only part of the opcodes.Opcode API. Use opcode_class,
+  not isinstance(), to find out which instruction this is.
+  """
+
+  __slots__ = ("code", "index")
+
+  def __init__(self, code, index):
+    self.code = code
+    self.index = index
+
+  def __eq__(self, other):
+    return (isinstance(other, CompactOpcode) and
+            self.code is other.code and self.index == other.index)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((id(self.code), self.index))
+
+  def __getattr__(self, attr):
+    # The flag accessors (has_arg(), no_next(), ...) of the opcode class.
+    return getattr(self.opcode_class, attr)
+
+  def __str__(self):
+    if self.has_arg():
+      return "%4d: %s %s" % (self.index, self.name, self.pretty_arg)
+    else:
+      return "%4d: %s" % (self.index, self.name)
+
+  def __repr__(self):
+    return self.name
+
+  @property
+  def opcode_class(self):
+    # pylint: disable=protected-access
+    return CompactOrderedCode._classes[self.code._opcodes[self.index]]
+
+  @property
+  def name(self):
+    return self.opcode_class.__name__
+
+  @property
+  def arg(self):
+    # pylint: disable=protected-access
+    return self.code._args[self.index] if self.has_arg() else None
+
+  @property
+  def pretty_arg(self):
+    cls = self.opcode_class
+    if cls.has_jump():
+      return self.arg
+    code = self.code
+    if code.co_cellvars is not None and code.co_freevars is not None:
+      cellvars_freevars = code.co_cellvars + code.co_freevars
+    else:
+      cellvars_freevars = None
+    # pylint: disable=protected-access
+    return opcodes._prettyprint_arg(cls, self.arg, code.co_consts,
+                                    code.co_names, code.co_varnames,
+                                    cellvars_freevars)
+
+  @property
+  def line(self):
+    return self.code._lines[self.index]  # pylint: disable=protected-access
+
+  def _instruction(self, index):
+    return CompactOpcode(self.code, index) if index >= 0 else None
+
+  @property
+  def target(self):
+    # pylint: disable=protected-access
+    return self._instruction(self.code._targets[self.index])
+
+  @property
+  def block_target(self):
+    # pylint: disable=protected-access
+    return self._instruction(self.code._block_targets[self.index])
+
+  @property
+  def next(self):
+    if self.index + 1 < len(self.code.co_code):
+      return CompactOpcode(self.code, self.index + 1)
+    return None
+
+  @property
+  def prev(self):
+    return self._instruction(self.index - 1)
+
+
+class _InstructionRange(object):
+  """A sequence of CompactOpcode for a range of instructions."""
+
+  __slots__ = ("code", "start", "stop")
+
+  def __init__(self, code, start, stop):
+    self.code = code
+    self.start = start
+    self.stop = stop
+
+  def __len__(self):
+    return self.stop - self.start
+
+  def __getitem__(self, index_or_slice):
+    if isinstance(index_or_slice, slice):
+      return [CompactOpcode(self.code, self.start + i)
+              for i in range(*index_or_slice.indices(len(self)))]
+    if index_or_slice < 0:
+      index_or_slice += len(self)
+    if not 0 <= index_or_slice < len(self):
+      raise IndexError(index_or_slice)
+    return CompactOpcode(self.code, self.start + index_or_slice)
+
+  def __iter__(self):
+    for i in range(self.start, self.stop):
+      yield CompactOpcode(self.code, i)
+
+  def __repr__(self):
+    return repr(list(self))
+
+
 def add_pop_block_targets(bytecode):
   """Modifies bytecode so that each POP_BLOCK has a block_target.
 
@@ -185,7 +397,14 @@ def compute_order(bytecode):
   return utils.order_nodes(blocks)
 
 
-def order_code(code):
+def _order_bytecode(code):
+  """Disassemble a CodeType object, and compute block targets."""
+  bytecodes = opcodes.dis_code(code)
+  add_pop_block_targets(bytecodes)  # TODO(kramm): move into pyc/opcodes.py?
+  return bytecodes
+
+
+def order_code(code, compact=False):
   """Split a CodeType object into ordered blocks.
 
   This takes a CodeType object (i.e., a piece of compiled Python code) and
@@ -193,22 +412,28 @@ def order_code(code):
 
   Args:
     code: A loadmarshal.CodeType object.
+    compact: Whether to return a CompactOrderedCode.
 
   Returns:
     A CodeBlocks instance.
   """
-  bytecodes = opcodes.dis_code(code)
-  add_pop_block_targets(bytecodes)  # TODO(kramm): move into pyc/opcodes.py?
-  return OrderedCode(code, bytecodes, compute_order(bytecodes),
-                     code.python_version)
+  bytecodes = _order_bytecode(code)
+  cls = CompactOrderedCode if compact else OrderedCode
+  return cls(code, bytecodes, compute_order(bytecodes), code.python_version)
 
 
 class OrderCodeVisitor(object):
-  """Visitor for recursively changing all CodeType to OrderedCode."""
+  """Visitor for recursively changing all CodeType to OrderedCode.
+
+  The blocks of each code object are only computed once they're needed.
+  """
+
+  def __init__(self, compact=False):
+    self._cls = CompactOrderedCode if compact else OrderedCode
 
   def visit_code(self, code):
-    return order_code(code)
+    return self._cls(code, None, None, code.python_version)
 
 
-def process_code(code):
-  return pyc.visit(code, OrderCodeVisitor())
+def process_code(code, compact=False):
+  return pyc.visit(code, OrderCodeVisitor(compact))
@@ -0,0 +1,91 @@
+"""Compare the memory used by OrderedCode and CompactOrderedCode.
+
+Usage:
+  python -m pytype.blocks_benchmark [file.py ...]
+
+Without arguments, this measures a generated module with one very large
+function, like generated code tends to have. With arguments, it measures the
+given source files, which have to be valid for the running Python version.
+The sizes are estimates, summed up from sys.getsizeof of the instruction
+stream: the instructions, the lists and arrays holding them, and the blocks.
+"""
+
+import sys
+import timeit
+
+from pytype import blocks
+from pytype.pyc import pyc
+
+
+def _generate_module(size):
+  """Generate the source of a module with one big function."""
+  lines = ["def f(x, y):"]
+  for i in range(size):
+    if i % 10:
+      lines.append("  y = y + x * %d" % i)
+    else:
+      lines.append("  if x > %d:" % i)
+      lines.append("    y = y - %d" % i)
+  lines.append("  return y")
+  return "\n".join(lines) + "\n"
+
+
+def _all_code(code):
+  yield code
+  for const in code.co_consts:
+    if isinstance(const, blocks.OrderedCode):
+      for c in _all_code(const):
+        yield c
+
+
+def _block_size(block):
+  return (sys.getsizeof(block) + sys.getsizeof(block.__dict__) +
+          sys.getsizeof(block.incoming) + sys.getsizeof(block.outgoing))
+
+
+def _size(code):
+  """Estimate the memory used by the instructions of an OrderedCode."""
+  # pylint: disable=protected-access
+  if isinstance(code, blocks.CompactOrderedCode):
+    size = sum(sys.getsizeof(a) for a in (
+        code._opcodes, code._args, code._lines, code._targets,
+        code._block_targets))
+    size += sys.getsizeof(code.co_code)
+    size += sum(_block_size(b) + sys.getsizeof(b.code) for b in code.order)
+  else:
+    size = sys.getsizeof(code.co_code)
+    size += sum(sys.getsizeof(op) for op in code.co_code)
+    size += sum(_block_size(b) + sys.getsizeof(b.code) for b in code.order)
+  return size + sys.getsizeof(code.order)
+
+
+def _measure(name, code):
+  for compact in (False, True):
+    ordered = blocks.process_code(code, compact=compact)
+    seconds = timeit.timeit(
+        lambda: [c.order for c in _all_code(
+            blocks.process_code(code, compact=compact))], number=1)
+    instructions = sum(len(c.co_code) for c in _all_code(ordered))
+    size = sum(_size(c) for c in _all_code(ordered))
+    print "%s (%s): %d instructions, %.1f KB, %.1f bytes/instruction, " \
+          "%.3f s to order" % (
+              name, "compact" if compact else "objects", instructions,
+              size / 1024.0, float(size) / instructions, seconds)
+
+
+def main(argv):
+  if len(argv) > 1:
+    sources = []
+    for filename in argv[1:]:
+      with open(filename) as fi:
+        sources.append((filename, fi.read()))
+  else:
+    sources = [("generated.py", _generate_module(5000))]
+  for filename, src in sources:
+    code = pyc.compile_src(src, sys.version_info[:2], sys.executable,
+                           filename=filename)
+    _measure(filename, code)
+
+
+if __name__ == "__main__":
+  main(sys.argv)
@@ -2,6 +2,7 @@
 
 
 from pytype import blocks
+from pytype import metrics
 from pytype.pyc import opcodes
 from pytype.tests import test_inference
 import unittest
@@ -259,6 +260,106 @@ class OrderingTest(test_inference.InferenceTest):
     self.assertEquals(2, len(b4.code))
 
 
+class LazyOrderingTest(test_inference.InferenceTest):
+  """Tests for the lazy ordering of code objects in process_code."""
+
+  def test_process_code(self):
+    # pylint: disable=protected-access
+    metrics._prepare_for_test()
+    blocks._code_objects._reset()
+    blocks._code_objects_ordered._reset()
+    co = self.make_code([
+        0x64, 1, 0,  # 0 LOAD_CONST, arg=1 (1)
+        0x53,  # 3 RETURN_VALUE
+    ], name="outer")
+    co.co_consts = [None, self.make_code([
+        0x64, 0, 0,  # 0 LOAD_CONST, arg=0 (None)
+        0x53,  # 3 RETURN_VALUE
+    ], name="inner")]
+    ordered_code = blocks.process_code(co)
+    inner = ordered_code.co_consts[1]
+    self.assertIsInstance(inner, blocks.OrderedCode)
+    self.assertEquals("ordered_code_objects: 2", str(blocks._code_objects))
+    self.assertEquals("ordered_code_objects_materialized: 0",
+                      str(blocks._code_objects_ordered))
+    b0, = ordered_code.order
+    self.assertEquals(2, len(b0.code))
+    self.assertIs(ordered_code, ordered_code.co_code[0].code)
+    self.assertEquals("ordered_code_objects_materialized: 1",
+                      str(blocks._code_objects_ordered))
+    self.assertEquals("inner", inner.co_name)
+    self.assertEquals(2, len(inner.co_code))
+    self.assertEquals("ordered_code_objects_materialized: 2",
+                      str(blocks._code_objects_ordered))
+
+
+class CompactOrderedCodeTest(test_inference.InferenceTest):
+  """Tests for CompactOrderedCode."""
+
+  def _make_loop(self):
+    # Disassembled from:
+    # | for x in y:
+    # |   pass
+    return self.make_code([
+        0x78, 13, 0,  # [0] 0 SETUP_LOOP, dest=16 [6],
+        0x7c, 0, 0,   # [1] 3 LOAD_FAST, arg=0,
+        0x44,         # [2] 6 GET_ITER,
+        0x5d, 6, 0,   # [3] 7 FOR_ITER, dest=16 [6],
+        0x7d, 1, 0,   # [4] 10 STORE_FAST, arg=1,
+        0x71, 7, 0,   # [5] 13 JUMP_ABSOLUTE, dest=7 [3],
+        0x57,         # [6] 16 POP_BLOCK,
+        0x64, 0, 0,   # [7] 17 LOAD_CONST, arg=0,
+        0x53,         # [8] 20 RETURN_VALUE
+    ], name="loop")
+
+  def test_same_as_ordered_code(self):
+    expected = blocks.order_code(self._make_loop())
+    compact = blocks.order_code(self._make_loop(), compact=True)
+    self.assertIsInstance(compact, blocks.CompactOrderedCode)
+    self.assertEquals("loop", compact.co_name)
+    self.assertEquals(len(expected.co_code), len(compact.co_code))
+    for op1, op2 in zip(expected.co_code, compact.co_code):
+      self.assertEquals(op1.name, op2.name)
+      self.assertIs(op1.opcode_class, op2.opcode_class)
+      self.assertEquals(op1.index, op2.index)
+      self.assertEquals(op1.line, op2.line)
+      self.assertEquals(op1.has_arg(), op2.has_arg())
+      self.assertEquals(op1.no_next(), op2.no_next())
+      self.assertEquals(str(op1.pretty_arg if op1.has_arg() else None),
+                        str(op2.pretty_arg if op2.has_arg() else None))
+      for attr in ("arg", "target", "block_target", "next", "prev"):
+        value1, value2 = getattr(op1, attr, None), getattr(op2, attr)
+        if isinstance(value1, opcodes.Opcode):
+          self.assertEquals(value1.index, value2.index)
+        else:
+          self.assertEquals(value1, value2)
+      self.assertIs(compact, op2.code)
+    self.assertEquals([[op.index for op in b] for b in expected.order],
+                      [[op.index for op in b] for b in compact.order])
+    self.assertEquals(
+        [sorted(b.id for b in block.outgoing) for block in expected.order],
+        [sorted(b.id for b in block.outgoing) for block in compact.order])
+
+  def test_views(self):
+    compact = blocks.order_code(self._make_loop(), compact=True)
+    op = compact.co_code[5]
+    self.assertEquals("JUMP_ABSOLUTE", op.name)
+    # Views of the same instruction are interchangeable, e.g. as dict keys.
+    self.assertEquals(compact.co_code[3], op.target)
+    self.assertEquals({op.target: 1}, {compact.co_code[3]: 1})
+    self.assertNotEquals(compact.co_code[4], op.target)
+    self.assertEquals(compact.co_code[-1], compact.co_code[8])
+    self.assertEquals(["POP_BLOCK", "LOAD_CONST", "RETURN_VALUE"],
+                      [o.name for o in compact.co_code[6:]])
+    self.assertIsNone(compact.co_code[8].next)
+    self.assertRaises(IndexError, compact.co_code.__getitem__, 9)
+
+  def test_process_code(self):
+    co = blocks.process_code(self._make_loop(), compact=True)
+    self.assertIsInstance(co, blocks.CompactOrderedCode)
+    self.assertEquals("SETUP_LOOP", co.order[0][0].name)
+
+
 class BlockStackTest(test_inference.InferenceTest):
   """Test the add_pop_block_targets function."""
 
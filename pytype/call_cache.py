@@ -0,0 +1,87 @@
+"""A bounded store for the results of calls to InterpreterFunctions.
+
+With --skip-repeat-calls (the default), a function called again with the same
+arguments and globals reuses the return value of the earlier call instead of
+being analyzed again. This module holds the return values for this, for all
+functions of a VM. It keeps at most a fixed number of them, dropping the least
+recently used first, and only keeps the results of calls whose analysis was
+expensive enough to be worth it. A call whose result isn't kept is simply
+analyzed again.
+
+The cost of a call is the number of CFG nodes its analysis created. Unlike
+wall time, this doesn't depend on the machine, so the output of pytype stays
+deterministic.
+"""
+
+import collections
+
+from pytype import metrics
+
+_cache_hits = metrics.Counter("call_cache_hits")
+_cache_misses = metrics.Counter("call_cache_misses")
+_cache_evictions = metrics.Counter("call_cache_evictions")
+_cache_rejected = metrics.Counter("call_cache_rejected")
+_call_cost = metrics.Distribution("call_cache_call_cost")
+
+
+# The result of a call. "ret" is the cfg.Variable returned by the call, and
+# "remaining_depth" the analysis depth that was left when it was made.
+CallResult = collections.namedtuple("CallResult", ["ret", "remaining_depth"])
+
+
+class CallCache(object):
+  """Maps (function, call key) to the CallResult of an earlier call.
+
+  Attributes:
+    max_size: The maximum number of results to keep, or None for no limit.
+    min_cost: Only keep the results of calls that created at least this many
+      CFG nodes.
+  """
+
+  def __init__(self, max_size=None, min_cost=0):
+    self.max_size = max_size
+    self.min_cost = min_cost
+    self._results = collections.OrderedDict()
+
+  def __len__(self):
+    return len(self._results)
+
+  def get(self, func, callkey):
+    """Look up the result of an earlier call.
+
+    Args:
+      func: The abstract.InterpreterFunction that is being called.
+      callkey: A hash of the arguments and the environment of the call.
+    Returns:
+      A CallResult, or None if we don't know the result of this call.
+    """
+    key = (func, callkey)
+    result = self._results.pop(key, None)
+    if result is None:
+      _cache_misses.inc()
+      return None
+    _cache_hits.inc()
+    # Move the result to the end, i.e., make it the most recently used one.
+    self._results[key] = result
+    return result
+
+  def add(self, func, callkey, result, cost):
+    """Store the result of a call, if it is worth it.
+
+    Args:
+      func: The abstract.InterpreterFunction that was called.
+      callkey: A hash of the arguments and the environment of the call.
+      result: A CallResult.
+      cost: The number of CFG nodes created by analyzing the call.
+    """
+    _call_cost.add(cost)
+    key = (func, callkey)
+    self._results.pop(key, None)
+    if cost < self.min_cost:
+      _cache_rejected.inc()
+      return
+    self._results[key] = result
+    if self.max_size is not None:
+      while len(self._results) > self.max_size:
+        self._results.popitem(last=False)
+        _cache_evictions.inc()
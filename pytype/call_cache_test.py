@@ -0,0 +1,87 @@
+"""Tests for call_cache.py."""
+
+import textwrap
+
+from pytype import call_cache
+from pytype import config
+from pytype import errors
+from pytype import infer
+from pytype import metrics
+from pytype.pytd import pytd
+
+import unittest
+
+
+class CallCacheTest(unittest.TestCase):
+  """Tests for call_cache.CallCache."""
+
+  def setUp(self):
+    metrics._prepare_for_test()
+    for counter in (call_cache._cache_hits, call_cache._cache_misses,
+                    call_cache._cache_evictions, call_cache._cache_rejected):
+      counter._reset()
+
+  def testGetAndAdd(self):
+    cache = call_cache.CallCache()
+    self.assertIsNone(cache.get("f", "key"))
+    result = call_cache.CallResult("ret", 3)
+    cache.add("f", "key", result, 1)
+    self.assertIs(result, cache.get("f", "key"))
+    self.assertIsNone(cache.get("g", "key"))
+    self.assertEquals(1, call_cache._cache_hits._total)
+    self.assertEquals(2, call_cache._cache_misses._total)
+
+  def testEvictLeastRecentlyUsed(self):
+    cache = call_cache.CallCache(max_size=2)
+    for key in ("a", "b"):
+      cache.add("f", key, call_cache.CallResult(key, 0), 1)
+    cache.get("f", "a")
+    cache.add("f", "c", call_cache.CallResult("c", 0), 1)
+    self.assertEquals(2, len(cache))
+    self.assertIsNone(cache.get("f", "b"))
+    self.assertIsNotNone(cache.get("f", "a"))
+    self.assertIsNotNone(cache.get("f", "c"))
+    self.assertEquals(1, call_cache._cache_evictions._total)
+
+  def testMinCost(self):
+    cache = call_cache.CallCache(min_cost=10)
+    cache.add("f", "cheap", call_cache.CallResult("ret", 0), 9)
+    cache.add("f", "expensive", call_cache.CallResult("ret", 0), 10)
+    self.assertIsNone(cache.get("f", "cheap"))
+    self.assertIsNotNone(cache.get("f", "expensive"))
+    self.assertEquals(1, call_cache._cache_rejected._total)
+
+  def _infer(self, src, **kwargs):
+    options = config.Options.create(**kwargs)
+    ast = infer.infer_types(textwrap.dedent(src), errors.ErrorLog(), options,
+                            run_builtins=False)
+    # The order of the signatures depends on the order of the calls.
+    return sorted(pytd.Print(ast).splitlines())
+
+  def testSameOutput(self):
+    src = """\
+      def f(x):
+        return [x]
+      x = f(1), f(1), f("a"), f(1)
+    """
+    expected = self._infer(src)
+    self.assertTrue(call_cache._cache_hits._total)
+    self.assertEquals(expected, self._infer(src, call_cache_size=1))
+    self.assertTrue(call_cache._cache_evictions._total)
+    self.assertEquals(expected, self._infer(src, call_cache_min_cost=10**6))
+    self.assertTrue(call_cache._cache_rejected._total)
+
+  def testFoldCallRecords(self):
+    src = """\
+      def f(x, y):
+        return [x]
+      x = f(1, 1), f(1, "a"), f("a", 1), f(1, 1)
+    """
+    expected = self._infer(src)
+    self.assertEquals(expected, self._infer(src, max_call_records=1))
+    self.assertEquals(expected, self._infer(src, max_call_records=1,
+                                            skip_repeat_calls=False))
+
+
+if __name__ == "__main__":
+  unittest.main()
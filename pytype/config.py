@@ -11,7 +11,10 @@ import subprocess
 
 
 from pytype import imports_map_loader
+from pytype import result_cache
 from pytype import utils
+from pytype.pyc import pyc
+from pytype.pytd import cfg
 
 
 LOG_LEVELS = [logging.CRITICAL, logging.ERROR, logging.WARNING,
@@ -82,11 +85,22 @@ class Options(object):
         "-d", "--disable", action="store",
         dest="disable", default=None,
         help=("Comma separated list of error names to ignore."))
+    o.add_option(
+        "--fork", action="store_true",
+        dest="fork", default=False,
+        help=("Run the builtins once, then fork a process for every file "
+              "that starts from the resulting state. Only works on systems "
+              "with os.fork()."))
     o.add_option(
         "--imports_info", type="string", action="store",
         dest="imports_info", default=None,
         help=("Information for mapping import .pytd to files. "
               "This options is incompatible with --pythonpath."))
+    o.add_option(
+        "-j", "--jobs", type="int", action="store",
+        dest="jobs", default=1,
+        help=("Number of worker processes to use when processing multiple "
+              "files. The default is to process them one after another."))
     o.add_option(
         "-m", "--main", action="store_true",
         dest="main_only", default=False,
@@ -111,6 +125,24 @@ class Options(object):
         "--no-skip-calls", action="store_false",
         dest="skip_repeat_calls", default=True,
         help=("Don't reuse the results of previous function calls."))
+    o.add_option(
+        "--call-cache-size", type="int", action="store",
+        dest="call_cache_size", default=10000,
+        help=("How many results of function calls to keep for reuse. The "
+              "least recently used ones are dropped first, and analyzed "
+              "again when needed."))
+    o.add_option(
+        "--call-cache-min-cost", type="int", action="store",
+        dest="call_cache_min_cost", default=0,
+        help=("Only keep the results of function calls whose analysis "
+              "created at least this many CFG nodes. Cheaper calls are "
+              "analyzed again every time."))
+    o.add_option(
+        "--max-call-records", type="int", action="store",
+        dest="max_call_records", default=1000,
+        help=("How many distinct calls of one function to remember for its "
+              "signatures. Beyond that, the calls are folded into their "
+              "types, which may give less precise signatures."))
     o.add_option(
         "--nofail", action="store_true",
         dest="nofail", default=False,
@@ -144,6 +176,18 @@ class Options(object):
         "--profile", type="string", action="store",
         dest="profile", default=None,
         help="Profile pytype and output the stats to the specified file.")
+    o.add_option(
+        "--trace-events", type="string", action="store",
+        dest="trace_events", default=None,
+        help=("Record the time spent in each phase of the analysis (compiling, "
+              "running the program, solving, ...) and write it to the "
+              "specified file, in the Chrome trace-event format."))
+    o.add_option(
+        "--profile-source", type="string", action="store",
+        dest="profile_source", default=None,
+        help=("Write the time, CFG nodes and bindings spent on every line "
+              "and opcode of the analyzed code to the specified file, and "
+              "the call stacks, for flamegraph tools, to FILE.collapsed."))
     o.add_option(
         "--python_exe", type="string", action="store",
         dest="python_exe", default=None,
@@ -168,10 +212,69 @@ class Options(object):
               "then pytype should be invoked with $OUTDIR in "
               "--pythonpath. This option is incompatible with "
               "--imports_info.") % os.pathsep)
+    o.add_option(
+        "--server", type="string", action="store",
+        dest="server", default=None,
+        help=("Run as a server that listens on the given unix socket, and "
+              "processes the command lines sent by pytype-client. This keeps "
+              "the builtins and the parsed .pyi files in memory between runs. "
+              "Requests are processed like with --fork, and requests with the "
+              "same options share the state after running the builtins."))
+    o.add_option(
+        "--sort-by-imports", action="store_true",
+        dest="sort_by_imports", default=False,
+        help=("When processing multiple files, scan their imports first and "
+              "process each file once, after the files it imports, instead of "
+              "doing two passes. Files that import each other are processed "
+              "until their outputs don't change anymore."))
+    o.add_option(
+        "--result-cache", type="string", action="store",
+        dest="result_cache", default=None,
+        help=("Directory for caching the results of analyzing files. A file "
+              "is only analyzed again if its source, the .pyi files of its "
+              "dependencies or the relevant options changed."))
+    o.add_option(
+        "--result-cache-size", type="int", action="store",
+        dest="result_cache_size", default=1024,
+        help=("Maximum size of the --result-cache directory, in megabytes. "
+              "The least recently used results are removed first."))
+    o.add_option(
+        "--bytecode-cache", type="string", action="store",
+        dest="bytecode_cache", default=None,
+        help=("Directory for caching compiled sources across runs. Unchanged "
+              "sources, including the builtins, aren't compiled again."))
+    o.add_option(
+        "--bytecode-cache-size", type="int", action="store",
+        dest="bytecode_cache_size", default=256,
+        help=("Maximum size of the --bytecode-cache directory, in megabytes. "
+              "The least recently used entries are removed first."))
+    o.add_option(
+        "--watch", action="store_true",
+        dest="watch", default=False,
+        help=("Keep running, and process the files again whenever they, or "
+              "the .pyi files they import, change. Only the changed files and "
+              "the files that import them are processed again."))
+    o.add_option(
+        "--watch-interval", type="float", action="store",
+        dest="watch_interval", default=1.0,
+        help="How often to check for changes with --watch, in seconds.")
     o.add_option(
         "-Z", "--quick", action="store_true",
         dest="quick",
         help=("Only do an approximation."))
+    o.add_option(
+        "--analysis-shards", type="int", action="store",
+        dest="analysis_shards", default=1,
+        help=("Run the module once, and then analyze its classes and "
+              "functions in this many child processes. Speeds up huge "
+              "modules. Functions only get the signatures of calls from "
+              "their own shard, and of calls from the module itself."))
+    o.add_option(
+        "--compact-bytecode", action="store_true",
+        dest="compact_bytecode", default=False,
+        help=("Store the bytecode of functions in arrays instead of as "
+              "objects. Uses less memory for large functions, but is "
+              "slower."))
     o.add_option(
         "-T", "--no-typeshed", action="store_false",
         dest="typeshed", default=True,
@@ -185,6 +288,22 @@ class Options(object):
         "--abort-on-complex", action="store_true",
         dest="abort_on_complex", default=False,
         help=("Abort early on files that are too complex."))
+    o.add_option(
+        "--max-seconds", type="float", action="store",
+        dest="max_seconds", default=None,
+        help=("Time budget for analyzing one file, in seconds. Files that "
+              "take longer are analyzed again with lower precision."))
+    o.add_option(
+        "--max-cfg-nodes", type="int", action="store",
+        dest="max_cfg_nodes", default=None,
+        help=("Budget for the number of CFG nodes of one file. Files that "
+              "need more are analyzed again with lower precision."))
+    o.add_option(
+        "--max-memory", type="int", action="store",
+        dest="max_memory", default=None,
+        help=("Memory budget for analyzing one file, in megabytes by which "
+              "the resident memory may grow. If the process grows more, the "
+              "file is analyzed again with lower precision. Linux only."))
     o.add_option(
         # Not stored, just used to configure logging.
         "-v", "--verbosity", type="int", action="store",
@@ -272,6 +391,95 @@ class Options(object):
           "Python versions 3.0 - 3.3 are not supported. "
           "Use 3.4 and higher.")
 
+  @uses(["jobs", "fork", "analysis_shards"])
+  def _store_profile_source(self, profile_source):
+    if profile_source and (self.jobs > 1 or self.fork or
+                           self.analysis_shards > 1):
+      # The profile of other processes would get lost.
+      raise optparse.OptParseError(
+          "--profile-source can't be used with --jobs, --fork or "
+          "--analysis-shards")
+    self.profile_source = profile_source
+
+  def _store_analysis_shards(self, analysis_shards):
+    if analysis_shards < 1:
+      raise optparse.OptionValueError(
+          "--analysis-shards must be at least 1: %r" % analysis_shards)
+    self.analysis_shards = analysis_shards
+
+  def _store_call_cache_size(self, call_cache_size):
+    if call_cache_size < 1:
+      raise optparse.OptionValueError(
+          "--call-cache-size must be at least 1: %r" % call_cache_size)
+    self.call_cache_size = call_cache_size
+
+  def _store_call_cache_min_cost(self, call_cache_min_cost):
+    if call_cache_min_cost < 0:
+      raise optparse.OptionValueError(
+          "--call-cache-min-cost must not be negative: %r" %
+          call_cache_min_cost)
+    self.call_cache_min_cost = call_cache_min_cost
+
+  def _store_max_call_records(self, max_call_records):
+    if max_call_records < 1:
+      raise optparse.OptionValueError(
+          "--max-call-records must be at least 1: %r" % max_call_records)
+    self.max_call_records = max_call_records
+
+  def _store_jobs(self, jobs):
+    if jobs < 1:
+      raise optparse.OptionValueError("--jobs must be at least 1: %r" % jobs)
+    self.jobs = jobs
+
+  def _store_result_cache_size(self, result_cache_size):
+    if result_cache_size < 0:
+      raise optparse.OptionValueError(
+          "--result-cache-size must not be negative: %r" % result_cache_size)
+    self.result_cache_size = result_cache_size
+
+  @uses(["result_cache_size"])
+  def _store_result_cache(self, result_cache_dir):
+    """Postprocess --result-cache. Stores a result_cache.ResultCache, or None."""
+    if result_cache_dir:
+      self.result_cache = result_cache.ResultCache(
+          result_cache_dir, self.result_cache_size << 20)
+    else:
+      self.result_cache = None
+
+  @uses(["bytecode_cache_size"])
+  def _store_bytecode_cache(self, bytecode_cache):
+    """Postprocess --bytecode-cache. Stores a pyc.BytecodeCache, or None."""
+    if bytecode_cache:
+      if self.bytecode_cache_size < 0:
+        raise optparse.OptionValueError(
+            "--bytecode-cache-size must not be negative: %r" %
+            self.bytecode_cache_size)
+      self.bytecode_cache = pyc.BytecodeCache(
+          bytecode_cache, self.bytecode_cache_size << 20)
+    else:
+      self.bytecode_cache = None
+
+  def _store_max_seconds(self, max_seconds):
+    if max_seconds is not None and max_seconds <= 0:
+      raise optparse.OptionValueError(
+          "--max-seconds must be positive: %r" % max_seconds)
+    self.max_seconds = max_seconds
+
+  def _store_max_cfg_nodes(self, max_cfg_nodes):
+    if max_cfg_nodes is not None and max_cfg_nodes <= 0:
+      raise optparse.OptionValueError(
+          "--max-cfg-nodes must be positive: %r" % max_cfg_nodes)
+    self.max_cfg_nodes = max_cfg_nodes
+
+  def _store_max_memory(self, max_memory):
+    if max_memory is not None and max_memory <= 0:
+      raise optparse.OptionValueError(
+          "--max-memory must be positive: %r" % max_memory)
+    if max_memory is not None and cfg.GetMemoryUsage() is None:
+      raise optparse.OptionValueError(
+          "--max-memory is not supported on this platform")
+    self.max_memory = max_memory
+
   def _store_disable(self, disable):
     if disable:
       self.disable = disable.split(",")
@@ -0,0 +1,153 @@
+"""A directory of cached values, with a size limit.
+
+Every entry is a file named after its key. Entries are written atomically, so
+several processes can share a cache. If the total size of the files exceeds a
+limit, the least recently used entries are evicted.
+"""
+
+import errno
+import logging
+import os
+
+from pytype import utils
+
+log = logging.getLogger(__name__)
+
+
+# When we evict, we go this far below the size limit, so that we don't have to
+# scan the directory again for the next few entries.
+_EVICT_TO = 0.9
+
+
+class CorruptEntryError(Exception):
+  """Raised by DiskCache._decode for entries that can't be read."""
+
+
+class DiskCache(object):
+  """A directory of cache entries. By default, the values are strings.
+
+  Subclasses set the metrics.Counter instances that count hits, misses and
+  evictions. They are class attributes so that the counters of the process
+  are used even if the cache was pickled, e.g. for a worker process.
+
+  To avoid listing the directory for every put(), we keep an estimate of the
+  total size, and only rescan the directory once the estimate exceeds the
+  limit. Entries written by other processes are only counted after a rescan,
+  so if several processes share a cache, it can temporarily grow beyond the
+  limit.
+  """
+
+  _hits = None
+  _misses = None
+  _evictions = None
+
+  def __init__(self, path, max_size):
+    """Initialize.
+
+    Args:
+      path: The cache directory. Created if it doesn't exist.
+      max_size: The maximum total size of the entries, in bytes.
+    """
+    self._path = path
+    self._max_size = max_size
+    self._size = None  # Estimated total size. None until the first scan.
+    try:
+      os.makedirs(path)
+    except OSError as e:
+      if e.errno != errno.EEXIST:
+        raise
+
+  @property
+  def path(self):
+    return self._path
+
+  def _filename(self, key):
+    return os.path.join(self._path, key + ".entry")
+
+  def _decode(self, data):
+    """Convert the contents of an entry file to the value.
+
+    Subclasses override this (and _encode) to store other values than strings.
+
+    Args:
+      data: The contents of the file.
+    Returns:
+      The value.
+    Raises:
+      CorruptEntryError: If the entry is broken, e.g. truncated.
+    """
+    return data
+
+  def _encode(self, value):
+    """Convert a value to the contents of its entry file."""
+    return value
+
+  def get(self, key):
+    """Look up an entry. Returns None if it's not in the cache."""
+    filename = self._filename(key)
+    try:
+      with open(filename, "rb") as fi:
+        value = self._decode(fi.read())
+    except IOError:
+      self._misses.inc()
+      return None
+    except CorruptEntryError:
+      log.warning("Removing corrupt entry %s", filename)
+      self._misses.inc()
+      self._remove(filename)
+      return None
+    # Record the access, for eviction.
+    try:
+      os.utime(filename, None)
+    except OSError:
+      pass  # Another process evicted it.
+    self._hits.inc()
+    return value
+
+  def put(self, key, value):
+    """Store an entry, evicting old entries if the cache is too big."""
+    data = self._encode(value)
+    utils.write_atomically(self._filename(key), data)
+    if self._size is not None:
+      # If we replaced an existing entry, this overestimates the size, which
+      # at worst causes an early rescan.
+      self._size += len(data)
+    if self._size is None or self._size > self._max_size:
+      self._evict()
+
+  def _remove(self, filename):
+    """Delete an entry file. Returns whether it existed."""
+    try:
+      os.unlink(filename)
+    except OSError:
+      return False  # Another process removed it.
+    return True
+
+  def _evict(self):
+    """Scan the directory and remove the least recently used entries.
+
+    If the entries exceed max_size, we remove entries until they're below a
+    fraction _EVICT_TO of it.
+    """
+    entries = []
+    total = 0
+    for basename in os.listdir(self._path):
+      if not basename.endswith(".entry"):
+        continue
+      filename = os.path.join(self._path, basename)
+      try:
+        stat = os.stat(filename)
+      except OSError:
+        continue  # Another process evicted it.
+      entries.append((stat.st_mtime, stat.st_size, filename))
+      total += stat.st_size
+    if total > self._max_size:
+      entries.sort()
+      for _, size, filename in entries:
+        if total <= self._max_size * _EVICT_TO:
+          break
+        log.info("Evicting %s from %s", filename, self._path)
+        if self._remove(filename):
+          self._evictions.inc()
+        total -= size
+    self._size = total
@@ -177,6 +177,11 @@ class ErrorLogBase(object):
   def error(self, opcode, message, details=None):
     self._add(Error.at_opcode(opcode, SEVERITY_ERROR, message, details=details))
 
+  def extend(self, errors):
+    """Add errors, e.g. the ones another process found."""
+    for error in errors:
+      self._add(error)
+
   def save(self):
     """Returns a checkpoint that represents the log messages up to now."""
     return CheckPoint(self, len(self._errors))
@@ -0,0 +1,352 @@
+"""Compute the import dependencies between the files pytype is processing.
+
+When pytype is given more than one file, the files might import each other. The
+output (.pyi) of a file should be generated before the files that import it are
+analyzed, so this module scans the imports of all files and sorts them
+accordingly. Files that (transitively) import each other are grouped into one
+component.
+"""
+
+import logging
+import os
+import re
+
+from pytype import utils
+from pytype.pyc import opcodes
+from pytype.pyc import pyc
+
+log = logging.getLogger(__name__)
+
+
+# Imports in .pyi files, which are written by pytype or by hand, so they are
+# always one per line.
+_PYI_IMPORT_RE = re.compile(r"^\s*(?:import|from)\s+([\w.]+)", re.MULTILINE)
+
+
+class _File(object):
+  """A file we're processing, as a node in the import graph."""
+
+  def __init__(self, input_filename, output_filename, module_names):
+    self.input_filename = input_filename
+    self.output_filename = output_filename
+    self.module_names = module_names
+    self.incoming = set()  # the files this file imports
+
+  @property
+  def src_out(self):
+    return self.input_filename, self.output_filename
+
+  def is_package(self):
+    basename = os.path.basename(self.input_filename)
+    return os.path.splitext(basename)[0] == "__init__"
+
+  def __repr__(self):
+    return "_File(%r)" % self.input_filename
+
+
+def _get_const(code, op):
+  if isinstance(op, opcodes.LOAD_CONST):
+    return code.co_consts[op.arg]
+  return None
+
+
+def get_imports(code):
+  """Find all imports in a code object, including nested ones.
+
+  Args:
+    code: An instance of loadmarshal.CodeType.
+  Returns:
+    A list of (name, level, fromlist) tuples. See __import__ for the meaning of
+    these. "level" is None if it's not a constant.
+  """
+  imports = []
+  class Visitor(object):
+    def visit_code(self, c):
+      ops = opcodes.dis_code(c)
+      for i, op in enumerate(ops):
+        if isinstance(op, opcodes.IMPORT_NAME):
+          # IMPORT_NAME is preceded by LOAD_CONST <level> and
+          # LOAD_CONST <fromlist>.
+          level = _get_const(c, ops[i - 2]) if i >= 2 else None
+          fromlist = _get_const(c, ops[i - 1]) if i >= 1 else None
+          imports.append((c.co_names[op.arg], level, fromlist or ()))
+      return c
+  pyc.visit(code, Visitor())
+  return imports
+
+
+def resolve_import(module_name, is_package, name, level, fromlist):
+  """Compute the modules an import statement might refer to.
+
+  Args:
+    module_name: The name of the module containing the import, or None.
+    is_package: Whether the module is the __init__ of a package.
+    name: The module name passed to IMPORT_NAME. E.g. "foo.bar".
+    level: The level of the import. -1 (or None) for Python 2 style imports that
+      try both a relative and an absolute import, 0 for absolute imports,
+      and >= 1 for "from . import", "from .. import", etc.
+    fromlist: The names in "from x import a, b, c". These might be modules.
+  Returns:
+    A list of fully qualified module names.
+  """
+  if module_name is None:
+    package = None
+  elif is_package:
+    package = module_name.split(".")
+  else:
+    package = module_name.split(".")[:-1]
+  bases = []
+  if level is None or level < 0:
+    bases.append(name)
+    if package:
+      bases.append(".".join(package + [name]))
+  elif level == 0:
+    bases.append(name)
+  elif package is not None and level - 1 <= len(package):
+    prefix = package[:len(package) - (level - 1)]
+    bases.append(".".join(prefix + ([name] if name else [])))
+  modules = []
+  for base in bases:
+    if not base:
+      continue
+    # "import a.b.c" also imports "a" and "a.b".
+    parts = base.split(".")
+    modules.extend(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+    modules.extend(base + "." + f for f in fromlist if f != "*")
+  return modules
+
+
+def _strip_init(module_name):
+  if module_name == "__init__":
+    return None
+  elif module_name.endswith(".__init__"):
+    return module_name[:-len(".__init__")]
+  else:
+    return module_name
+
+
+def get_module_names(input_filename, output_filename, options):
+  """Find the names under which the other files can import a file.
+
+  A file is found either through its output (via --pythonpath or the imports
+  map), or, if it's a module in the pythonpath, through its name.
+
+  Args:
+    input_filename: The .py file.
+    output_filename: The .pyi file we'll generate for it, or None.
+    options: config.Options object.
+  Returns:
+    A set of module names.
+  """
+  names = set()
+  paths = [os.path.splitext(input_filename)[0]]
+  if output_filename and output_filename != "-":
+    output_path = os.path.splitext(output_filename)[0]
+    if options.imports_map is not None:
+      output_path = os.path.abspath(output_filename)
+      for short_path, path in options.imports_map.items():
+        if path == output_path:
+          names.add(short_path.replace(os.sep, "."))
+    else:
+      paths.append(output_path)
+  for path in paths:
+    for searchdir in options.pythonpath:
+      if searchdir and path.startswith(searchdir):
+        subdir = path[len(searchdir):].lstrip(os.sep)
+        names.add(subdir.replace(os.sep, "."))
+      elif not searchdir and not os.path.isabs(path):
+        names.add(os.path.normpath(path).replace(os.sep, "."))
+  return {name for name in map(_strip_init, names) if name}
+
+
+def _pyi_candidates(module_name, options):
+  """The filenames the loader tries for a module, in order."""
+  for searchdir in options.pythonpath:
+    path = os.path.join(searchdir, *module_name.split("."))
+    for candidate in (os.path.join(path, "__init__"), path):
+      if options.imports_map is not None:
+        filename = options.imports_map.get(candidate)
+      else:
+        filename = candidate + ".pyi"
+      if filename:
+        yield filename
+
+
+def _is_file(filename):
+  return os.path.exists(filename) and not os.path.isdir(filename)
+
+
+def find_pyi(module_name, options):
+  """Find the .pyi the loader would use for a module, like load_pytd does.
+
+  Args:
+    module_name: A fully qualified module name.
+    options: config.Options object.
+  Returns:
+    A filename, or None if the module isn't in the pythonpath or imports map.
+  """
+  for filename in _pyi_candidates(module_name, options):
+    if _is_file(filename):
+      return filename
+  return None
+
+
+def read_pyi_dependencies(module_names, options, missing=None):
+  """Read the .pyi files of some modules and of everything they import.
+
+  Args:
+    module_names: A sequence of fully qualified module names.
+    options: config.Options object.
+    missing: If not None, a set. We add the filenames that don't exist yet, but
+      would be used for one of the modules if they were created.
+  Returns:
+    A dictionary mapping filenames to file contents.
+  """
+  contents = {}
+  seen = set()
+  todo = list(module_names)
+  while todo:
+    module_name = todo.pop()
+    if module_name in seen:
+      continue
+    seen.add(module_name)
+    filename = None
+    for candidate in _pyi_candidates(module_name, options):
+      if _is_file(candidate):
+        filename = candidate
+        break
+      elif missing is not None:
+        missing.add(candidate)
+    if filename is None or filename in contents:
+      continue
+    with open(filename, "rb") as fi:
+      contents[filename] = fi.read()
+    for name in _PYI_IMPORT_RE.findall(contents[filename]):
+      parts = name.split(".")
+      todo.extend(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+  return contents
+
+
+def _scan_imports(f, options):
+  """Compile a file, and return the imports in it."""
+  with open(f.input_filename, "rb") as fi:
+    src = fi.read()
+  try:
+    code = pyc.compile_src(src, options.python_version, options.python_exe,
+                           filename=f.input_filename,
+                           cache=options.bytecode_cache)
+  except pyc.CompileError:
+    # We'll report the error when we analyze the file.
+    return []
+  return get_imports(code)
+
+
+class ImportGraph(object):
+  """The import dependencies between the files we're processing.
+
+  Attributes:
+    pyi_dependencies: A dictionary mapping each input filename to the set of
+      .pyi files (other than the outputs of input files) that it depends on,
+      directly or through other .pyi files.
+    missing_pyis: A dictionary mapping each input filename to the set of .pyi
+      files that don't exist, but that it would depend on if they were created,
+      e.g. for imports that can't be resolved yet.
+  """
+
+  def __init__(self, src_out, options):
+    """Scan the imports of all files.
+
+    Args:
+      src_out: A sequence of (input_filename, output_filename) tuples.
+      options: config.Options object.
+    """
+    self._files = [
+        _File(input_filename, output_filename,
+              get_module_names(input_filename, output_filename, options))
+        for input_filename, output_filename in src_out]
+    outputs = {f.output_filename for f in self._files}
+    modules = {}
+    for f in self._files:
+      for name in f.module_names:
+        modules.setdefault(name, f)
+    self.pyi_dependencies = {}
+    self.missing_pyis = {}
+    for f in self._files:
+      # We don't know which of its names a file will be analyzed under, so
+      # resolve relative imports against all of them.
+      module_names = sorted(f.module_names) or [None]
+      external = set()
+      for name, level, fromlist in _scan_imports(f, options):
+        for module_name in module_names:
+          for candidate in resolve_import(module_name, f.is_package(), name,
+                                          level, fromlist):
+            if candidate not in modules:
+              external.add(candidate)
+            elif modules[candidate] is not f:
+              f.incoming.add(modules[candidate])
+      log.info("%s imports %s", f.input_filename,
+               ", ".join(sorted(dep.input_filename for dep in f.incoming)))
+      missing = set()
+      self.pyi_dependencies[f.input_filename] = (
+          set(read_pyi_dependencies(sorted(external), options, missing)) -
+          outputs)
+      self.missing_pyis[f.input_filename] = missing - outputs
+
+  def importers(self, input_filenames):
+    """Find the files that (transitively) import some files.
+
+    Args:
+      input_filenames: A collection of input filenames.
+    Returns:
+      A set of input filenames. Includes the ones passed in.
+    """
+    result = set(input_filenames)
+    changed = True
+    while changed:
+      changed = False
+      for f in self._files:
+        if f.input_filename not in result and any(
+            dep.input_filename in result for dep in f.incoming):
+          result.add(f.input_filename)
+          changed = True
+    return result
+
+  def levels(self, only=None):
+    """Sort the files according to their import dependencies.
+
+    Args:
+      only: If not None, a collection of input filenames. Only the components
+        containing one of these files are returned.
+    Returns:
+      A list of levels. Each level is a list of components, and a component is
+      a list of (input_filename, output_filename) tuples that (transitively)
+      import each other. All the files a component imports are in the same
+      component or in a component on a lower level, so the components of one
+      level can be processed in parallel.
+    """
+    depth = {}
+    levels = []
+    for component in utils.strongly_connected_components(self._files):
+      members = set(component)
+      d = max([depth[dep] + 1
+               for f in component for dep in f.incoming
+               if dep not in members] or [0])
+      for f in component:
+        depth[f] = d
+      if d == len(levels):
+        levels.append([])
+      if only is None or any(f.input_filename in only for f in component):
+        levels[d].append([f.src_out for f in component])
+    return [level for level in levels if level]
+
+
+def sort_by_imports(src_out, options):
+  """Sort files according to their import dependencies.
+
+  Args:
+    src_out: A sequence of (input_filename, output_filename) tuples.
+    options: config.Options object.
+  Returns:
+    A list of levels. See ImportGraph.levels.
+  """
+  return ImportGraph(src_out, options).levels()
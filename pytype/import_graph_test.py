@@ -0,0 +1,150 @@
+"""Tests for import_graph.py."""
+
+import textwrap
+
+from pytype import config
+from pytype import import_graph
+from pytype import utils
+from pytype.pyc import pyc
+
+import unittest
+
+
+class ImportGraphTest(unittest.TestCase):
+  """Tests for import_graph.py."""
+
+  PYTHON_VERSION = (2, 7)
+
+  def setUp(self):
+    self.options = config.Options.create(python_version=self.PYTHON_VERSION)
+
+  def _get_imports(self, src):
+    code = pyc.compile_src(textwrap.dedent(src), self.PYTHON_VERSION,
+                           self.options.python_exe, filename="test.py")
+    return import_graph.get_imports(code)
+
+  def testGetImports(self):
+    imports = self._get_imports("""\
+      from __future__ import absolute_import
+      import foo.bar
+      from . import baz
+      from ..quux import x, y
+      def f():
+        import inner
+    """)
+    self.assertItemsEqual([
+        ("__future__", 0, ("absolute_import",)),
+        ("foo.bar", 0, ()),
+        ("", 1, ("baz",)),
+        ("quux", 2, ("x", "y")),
+        ("inner", 0, ()),
+    ], imports)
+
+  def testResolveAbsoluteImport(self):
+    self.assertEquals(["foo", "foo.bar"],
+                      import_graph.resolve_import("pkg.mod", False, "foo.bar",
+                                                  0, ()))
+
+  def testResolveImplicitRelativeImport(self):
+    self.assertItemsEqual(
+        ["foo", "foo.x", "pkg", "pkg.foo", "pkg.foo.x"],
+        import_graph.resolve_import("pkg.mod", False, "foo", -1, ("x",)))
+
+  def testResolveRelativeImport(self):
+    self.assertItemsEqual(
+        ["pkg", "pkg.sub"],
+        import_graph.resolve_import("pkg.mod", False, "", 1, ("sub",)))
+    self.assertItemsEqual(
+        ["a", "a.b", "a.b.pkg", "a.b.pkg.sub"],
+        import_graph.resolve_import("a.b.pkg", True, "", 1, ("sub",)))
+    self.assertItemsEqual(
+        ["a", "a.sub", "a.sub.x"],
+        import_graph.resolve_import("a.b.mod", False, "sub", 2, ("x",)))
+
+  def testResolveRelativeImportWithoutModuleName(self):
+    self.assertEquals([], import_graph.resolve_import(None, False, "", 1,
+                                                      ("sub",)))
+
+  def testGetModuleNames(self):
+    with utils.Tempdir() as d:
+      self.options.tweak(pythonpath=[d["out"]])
+      self.assertEquals(
+          {"pkg.mod"},
+          import_graph.get_module_names(d["src/pkg/mod.py"],
+                                        d["out/pkg/mod.pyi"], self.options))
+      self.assertEquals(
+          {"pkg"},
+          import_graph.get_module_names(d["src/pkg/__init__.py"],
+                                        d["out/pkg/__init__.pyi"],
+                                        self.options))
+
+  def testSortByImports(self):
+    with utils.Tempdir() as d:
+      a = d.create_file("a.py", "import b\nimport d\n")
+      b = d.create_file("b.py", "import c\n")
+      c = d.create_file("c.py", "import b\n")
+      dd = d.create_file("d.py", "import sys\n")
+      e = d.create_file("e.py", "")
+      self.options.tweak(pythonpath=[d["out"]])
+      src_out = [(f, d["out/%s.pyi" % name])
+                 for f, name in [(a, "a"), (b, "b"), (c, "c"), (dd, "d"),
+                                 (e, "e")]]
+      levels = import_graph.sort_by_imports(src_out, self.options)
+      self.assertEquals(2, len(levels))
+      self.assertItemsEqual([[src_out[1], src_out[2]], [src_out[3]],
+                             [src_out[4]]], levels[0])
+      self.assertEquals([[src_out[0]]], levels[1])
+
+  def testSortByImportsIgnoresSyntaxErrors(self):
+    with utils.Tempdir() as d:
+      a = d.create_file("a.py", "import b\n")
+      b = d.create_file("b.py", "x = (\n")
+      self.options.tweak(pythonpath=[d["out"]])
+      src_out = [(a, d["out/a.pyi"]), (b, d["out/b.pyi"])]
+      levels = import_graph.sort_by_imports(src_out, self.options)
+      self.assertEquals([[[src_out[1]]], [[src_out[0]]]], levels)
+
+  def testImporters(self):
+    with utils.Tempdir() as d:
+      a = d.create_file("a.py", "import b\n")
+      b = d.create_file("b.py", "import c\n")
+      c = d.create_file("c.py", "")
+      e = d.create_file("e.py", "import c\n")
+      self.options.tweak(pythonpath=[d["out"]])
+      src_out = [(f, d["out/%s.pyi" % name])
+                 for f, name in [(a, "a"), (b, "b"), (c, "c"), (e, "e")]]
+      graph = import_graph.ImportGraph(src_out, self.options)
+      self.assertEquals({a, b}, graph.importers([b]))
+      self.assertEquals({a, b, c, e}, graph.importers([c]))
+      self.assertEquals([[[src_out[1]]], [[src_out[0]]]],
+                        graph.levels(graph.importers([b])))
+
+  def testPyiDependencies(self):
+    with utils.Tempdir() as d:
+      a = d.create_file("a.py", "import b\nimport ext\n")
+      b = d.create_file("b.py", "")
+      ext = d.create_file("pyi/ext.pyi", "import ext2\n")
+      ext2 = d.create_file("pyi/ext2.pyi", "")
+      d.create_file("out/b.pyi", "")
+      self.options.tweak(pythonpath=[d["out"], d["pyi"]])
+      src_out = [(a, d["out/a.pyi"]), (b, d["out/b.pyi"])]
+      graph = import_graph.ImportGraph(src_out, self.options)
+      self.assertEquals({ext, ext2}, graph.pyi_dependencies[a])
+      self.assertEquals(set(), graph.pyi_dependencies[b])
+
+  def testMissingPyis(self):
+    with utils.Tempdir() as d:
+      a = d.create_file("a.py", "import ext\nimport later\n")
+      d.create_file("pyi/ext.pyi", "")
+      self.options.tweak(pythonpath=[d["pyi"]])
+      graph = import_graph.ImportGraph([(a, d["a.pyi"])], self.options)
+      self.assertIn(d["pyi/later.pyi"], graph.missing_pyis[a])
+      self.assertIn(d["pyi/later/__init__.pyi"], graph.missing_pyis[a])
+      self.assertNotIn(d["pyi/ext.pyi"], graph.missing_pyis[a])
+      d.create_file("pyi/later.pyi", "")
+      graph = import_graph.ImportGraph([(a, d["a.pyi"])], self.options)
+      self.assertIn(d["pyi/later.pyi"], graph.pyi_dependencies[a])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,19 +1,27 @@
 """Code for generating and storing inferred types."""
 
 import collections
+import copy
+import cPickle
 import logging
 import os
 import StringIO
 import subprocess
 import sys
+import time
+import traceback
 
 
 from pytype import abstract
 from pytype import convert_structural
+from pytype import errors
+from pytype import metrics
 from pytype import output
 from pytype import state as frame_state
+from pytype import tracing
 from pytype import utils
 from pytype import vm
+from pytype.pytd import cfg
 from pytype.pytd import optimize
 from pytype.pytd import pytd
 from pytype.pytd import utils as pytd_utils
@@ -31,6 +39,17 @@ CallRecord = collections.namedtuple("CallRecord",
 # How deep to follow call chains, during module loading:
 INIT_MAXIMUM_DEPTH = 4
 
+# How many bindings a variable may have in the last step of
+# infer_types_degraded, before we widen it to "Any".
+_WIDEN_VARIABLE_SIZE = 16
+
+_budget_exceeded = metrics.MapCounter("budget_exceeded")
+_degradation_steps = metrics.MapCounter("degradation_steps")
+
+
+class ShardError(Exception):
+  """Raised if a child process analyzing a shard of a module failed."""
+
 
 class AnalysisFrame(object):
   """Frame representing the "analysis function" that calls everything."""
@@ -209,19 +228,24 @@ class CallTracer(vm.VirtualMachine):
 
   def pytd_classes_for_unknowns(self):
     classes = []
-    for name, var in self._unknowns.items():
-      for value in var.FilteredData(self.exitpoint):
-        classes.append(value.to_structural_def(self.exitpoint, name))
+    unknowns = self._unknowns.items()
+    visible = self.program.solver.FilterMany(
+        [var for _, var in unknowns], self.exitpoint)
+    for (name, _), bindings in zip(unknowns, visible):
+      for binding in bindings:
+        classes.append(binding.data.to_structural_def(self.exitpoint, name))
     return classes
 
   def pytd_for_types(self, defs, ignore):
     for name, var in defs.items():
       abstract.variable_set_official_name(var, name)
     data = []
-    for name, var in defs.items():
-      if name in output.TOP_LEVEL_IGNORE or name in ignore:
-        continue
-      options = var.FilteredData(self.exitpoint)
+    names = [name for name in defs
+             if name not in output.TOP_LEVEL_IGNORE and name not in ignore]
+    visible = self.program.solver.FilterMany(
+        [defs[name] for name in names], self.exitpoint)
+    for name, bindings in zip(names, visible):
+      options = [binding.data for binding in bindings]
       if (len(options) > 1 and not
           all(isinstance(o, (abstract.Function, abstract.BoundFunction))
               for o in options)):
@@ -569,30 +593,295 @@ def _get_module_name(filename, options):
         return subdir.replace(os.sep, ".")
 
 
+def preload_tracer(errorlog, options, check,
+                   run_builtins=True,
+                   reverse_operators=False,
+                   cache_unknowns=False,
+                   init_maximum_depth=INIT_MAXIMUM_DEPTH):
+  """Create a CallTracer that has already run the builtins.
+
+  The tracer can be passed to check_types (if "check" is True) or infer_types
+  (otherwise), with the same errorlog and arguments. This is for running many
+  programs from the same starting state, e.g. by forking after this call.
+
+  Args:
+    errorlog: Where error messages go. Instance of errors.ErrorLog.
+    options: config.Options object
+    check: True if the tracer is for check_types, False for infer_types.
+    run_builtins: Whether to preload the native Python builtins.
+    reverse_operators: See infer_types.
+    cache_unknowns: See infer_types.
+    init_maximum_depth: Depth of analysis during module loading.
+  Returns:
+    A CallTracer.
+  """
+  tracer = CallTracer(errorlog=errorlog, options=options,
+                      reverse_operators=reverse_operators,
+                      cache_unknowns=cache_unknowns,
+                      generate_unknowns=not check and not options.quick)
+  tracer.preload_program(init_maximum_depth, run_builtins)
+  return tracer
+
+
+def _compute_ast(tracer, defs, ignore, solve_unknowns, extract_locals):
+  """Compute the pytd of an analyzed module. See infer_types."""
+  with tracing.span("compute_types", tracer.program):
+    ast = tracer.compute_types(defs, ignore)
+  with tracing.span("resolve_ast"):
+    ast = tracer.loader.resolve_ast(ast)
+  if solve_unknowns:
+    # convert_pytd can't be interrupted, so this is the last chance to stop.
+    tracer.program.CheckTimeAndMemory()
+    log.info("=========== PyTD to solve =============\n%s", pytd.Print(ast))
+    with tracing.span("convert_pytd"):
+      ast = convert_structural.convert_pytd(ast, tracer.loader.concat_all())
+  elif extract_locals:
+    log.info("Solving is turned off. Discarding call traces.")
+    # Rename "~unknown" to "?"
+    ast = ast.Visit(visitors.RemoveUnknownClasses())
+    # Remove "~list" etc.:
+    ast = convert_structural.extract_local(ast)
+  return ast
+
+
+def _shard_defs(defs, ignore, num_shards):
+  """Split the top-level definitions of a module into shards.
+
+  Args:
+    defs: A dictionary mapping names to cfg.Variable.
+    ignore: Names to leave out.
+    num_shards: The number of shards.
+  Returns:
+    A list of num_shards sets of names. The classes and functions are
+    distributed round-robin, everything else is in the first shard.
+  """
+  shards = [set() for _ in range(num_shards)]
+  i = 0
+  for name, var in sorted(defs.items()):
+    if name in ignore:
+      continue
+    if any(isinstance(v, (abstract.InterpreterClass,
+                          abstract.InterpreterFunction,
+                          abstract.BoundInterpreterFunction))
+           for v in var.data):
+      shards[i % num_shards].add(name)
+      i += 1
+    else:
+      shards[0].add(name)
+  return shards
+
+
+# The result of analyzing a shard in a child process. "ast" is None if the
+# child failed, in which case "budget" is the budget it exceeded (see
+# cfg.ProgramTooComplexError) or "error" is the traceback of the exception.
+_ShardResult = collections.namedtuple(
+    "_ShardResult", ["ast", "errors", "metrics_dump", "trace_events",
+                     "budget", "error"])
+
+
+def _analyze_shard(tracer, loc, defs, ignore, shard, maximum_depth,
+                   solve_unknowns, extract_locals):
+  """Analyze a shard of the definitions, and compute their pytd.
+
+  Besides the definitions in the shard, the pytd contains the functions that
+  the shard called, with the signatures of these calls.
+
+  Args:
+    tracer: A CallTracer that has run the module.
+    loc: The CFG node at the end of the module.
+    defs: A dictionary mapping names to cfg.Variable, for the whole module.
+    ignore: Names to leave out.
+    shard: The names to analyze.
+    maximum_depth: See infer_types.
+    solve_unknowns: See infer_types.
+    extract_locals: See infer_types.
+  Returns:
+    A pytd.TypeDeclUnit.
+  """
+  with tracing.span("analyze", tracer.program):
+    tracer.exitpoint = tracer.analyze(
+        loc, {name: defs[name] for name in shard}, ignore, maximum_depth)
+  called = {name for name, var in defs.items()
+            if any(isinstance(v, abstract.InterpreterFunction) and
+                   v.has_been_called() for v in var.data)}
+  # The definitions of the other shards have to be in the pytd while solving,
+  # so that references to them resolve. We drop them afterwards.
+  ast = _compute_ast(tracer, defs, ignore, solve_unknowns, extract_locals)
+  others = set(defs) - shard - called
+  return ast.Replace(
+      constants=tuple(c for c in ast.constants if c.name not in others),
+      classes=tuple(c for c in ast.classes if c.name not in others),
+      functions=tuple(f for f in ast.functions if f.name not in others))
+
+
+def _run_shard_in_child(tracer, loc, defs, ignore, shard, maximum_depth,
+                        solve_unknowns, extract_locals):
+  """Fork, and run _analyze_shard in the child.
+
+  The child analyzes a copy of the state of the tracer (copy-on-write).
+
+  Args:
+    tracer: See _analyze_shard.
+    loc: See _analyze_shard.
+    defs: See _analyze_shard.
+    ignore: See _analyze_shard.
+    shard: See _analyze_shard.
+    maximum_depth: See _analyze_shard.
+    solve_unknowns: See _analyze_shard.
+    extract_locals: See _analyze_shard.
+  Returns:
+    A tuple (pid, file), with a file to read the _ShardResult from.
+  """
+  # Don't let the child print what's still buffered.
+  sys.stdout.flush()
+  sys.stderr.flush()
+  read_fd, write_fd = os.pipe()
+  pid = os.fork()
+  if pid == 0:
+    try:
+      os.close(read_fd)
+      num_errors = len(tracer.errorlog)
+      metrics.reset()
+      tracing.reset()
+      ast = budget = error = None
+      try:
+        ast = _analyze_shard(tracer, loc, defs, ignore, shard, maximum_depth,
+                             solve_unknowns, extract_locals)
+      except cfg.ProgramTooComplexError as e:
+        budget = e.budget
+      except Exception:  # pylint: disable=broad-except
+        error = traceback.format_exc()
+      result = _ShardResult(ast, list(tracer.errorlog)[num_errors:],
+                            metrics.dump_and_reset(), tracing.dump_and_reset(),
+                            budget, error)
+      with os.fdopen(write_fd, "wb") as fi:
+        cPickle.dump(result, fi, cPickle.HIGHEST_PROTOCOL)
+    finally:
+      os._exit(0)  # pylint: disable=protected-access
+  os.close(write_fd)
+  return pid, os.fdopen(read_fd, "rb")
+
+
+def _merge_shards(asts):
+  """Merge the pytds of the shards of a module.
+
+  Functions that are in several pytds (because they were called from several
+  shards) get the signatures of all of them. The shards don't share any other
+  definitions.
+
+  Args:
+    asts: A list of pytd.TypeDeclUnit, one per shard.
+  Returns:
+    A pytd.TypeDeclUnit.
+  """
+  functions = collections.OrderedDict()
+  for ast in asts:
+    for f in ast.functions:
+      if f.name in functions:
+        signatures = pytd_utils.Dedup(functions[f.name].signatures +
+                                      f.signatures)
+        f = f.Replace(signatures=tuple(signatures))
+      functions[f.name] = f
+  ast = pytd_utils.Concat(*asts, name=asts[0].name)
+  return ast.Replace(
+      functions=tuple(functions.values()),
+      # These can be in several shards, since they're created by the solver.
+      classes=tuple(pytd_utils.Dedup(ast.classes)),
+      type_params=tuple(pytd_utils.Dedup(ast.type_params)),
+      aliases=tuple(pytd_utils.Dedup(ast.aliases)))
+
+
+def _infer_sharded(tracer, loc, defs, ignore, maximum_depth, shards,
+                   solve_unknowns, extract_locals):
+  """Analyze the top-level definitions of a module in parallel.
+
+  The module has already been run. Every child process starts from a copy of
+  this state, analyzes one shard of the classes and functions and computes
+  their pytd, which we then merge.
+
+  Args:
+    tracer: A CallTracer that has run the module.
+    loc: The CFG node at the end of the module.
+    defs: A dictionary mapping names to cfg.Variable.
+    ignore: Names to leave out.
+    maximum_depth: See infer_types.
+    shards: The sets of names to analyze, one per child process. See
+      _shard_defs.
+    solve_unknowns: See infer_types.
+    extract_locals: See infer_types.
+  Returns:
+    A pytd.TypeDeclUnit.
+  Raises:
+    cfg.ProgramTooComplexError: If a shard exceeded one of the budgets.
+    ShardError: If a child failed.
+  """
+  children = [_run_shard_in_child(tracer, loc, defs, ignore, shard,
+                                  maximum_depth, solve_unknowns,
+                                  extract_locals)
+              for shard in shards]
+  results = []
+  for pid, fi in children:
+    with fi:
+      data = fi.read()
+    os.waitpid(pid, 0)
+    if not data:
+      raise ShardError("Process %d analyzing a shard died" % pid)
+    results.append(cPickle.loads(data))
+  for result in results:
+    tracer.errorlog.extend(result.errors)
+    metrics.merge_from_string(result.metrics_dump)
+    tracing.merge(result.trace_events)
+  for result in results:
+    if result.budget:
+      raise cfg.ProgramTooComplexError(result.budget)
+    elif result.error:
+      raise ShardError("Analyzing a shard failed:\n%s" % result.error)
+  tracer.exitpoint = loc
+  return _merge_shards([result.ast for result in results])
+
+
+def _get_tracer(tracer, errorlog, filename, options, **kwargs):
+  """Create a CallTracer, or set up one created by preload_tracer."""
+  module_name = _get_module_name(filename, options)
+  if tracer is None:
+    return CallTracer(errorlog=errorlog, options=options,
+                      module_name=module_name, **kwargs)
+  assert tracer.errorlog is errorlog
+  tracer.loader.base_module = module_name
+  return tracer
+
+
 def check_types(py_src, pytd_src, py_filename, pytd_filename, errorlog,
                 options,
                 run_builtins=True,
                 reverse_operators=False,
                 cache_unknowns=False,
-                init_maximum_depth=INIT_MAXIMUM_DEPTH):
+                init_maximum_depth=INIT_MAXIMUM_DEPTH,
+                tracer=None,
+                shared_modules=None):
   """Verify a PyTD against the Python code."""
-  tracer = CallTracer(errorlog=errorlog, options=options,
-                      module_name=_get_module_name(py_filename, options),
-                      reverse_operators=reverse_operators,
-                      cache_unknowns=cache_unknowns,
-                      generate_unknowns=False)
-  loc, defs, builtin_names = tracer.run_program(
-      py_src, py_filename, init_maximum_depth, run_builtins)
+  tracer = _get_tracer(tracer, errorlog, py_filename, options,
+                       reverse_operators=reverse_operators,
+                       cache_unknowns=cache_unknowns,
+                       generate_unknowns=False,
+                       shared_modules=shared_modules)
+  with tracing.span("run_program", tracer.program):
+    loc, defs, builtin_names = tracer.run_program(
+        py_src, py_filename, init_maximum_depth, run_builtins)
   if pytd_src is not None:
     ast = builtins.ParsePyTD(pytd_src, pytd_filename, options.python_version,
                              lookup_classes=True)
-    ast = tracer.loader.resolve_ast(ast)
-    tracer.check_types(loc, defs, ast,
-                       os.path.basename(py_filename),
-                       os.path.basename(pytd_filename))
+    with tracing.span("resolve_ast"):
+      ast = tracer.loader.resolve_ast(ast)
+    with tracing.span("check_types", tracer.program):
+      tracer.check_types(loc, defs, ast,
+                         os.path.basename(py_filename),
+                         os.path.basename(pytd_filename))
   else:
-    tracer.analyze(loc, defs, builtin_names,
-                   maximum_depth=(1 if options.quick else None))
+    with tracing.span("analyze", tracer.program):
+      tracer.analyze(loc, defs, builtin_names,
+                     maximum_depth=(1 if options.quick else None))
+  tracer.program.ClearCaches()
 
 
 def infer_types(src,
@@ -601,7 +890,8 @@ def infer_types(src,
                 deep=True, solve_unknowns=True,
                 reverse_operators=False, cache_unknowns=False,
                 extract_locals=True, init_maximum_depth=INIT_MAXIMUM_DEPTH,
-                maximum_depth=None):
+                maximum_depth=None, tracer=None, shared_modules=None,
+                max_variable_size=None, deadline=None):
   """Given Python source return its types.
 
   Args:
@@ -622,34 +912,53 @@ def infer_types(src,
       traces?
     init_maximum_depth: Depth of analysis during module loading.
     maximum_depth: Depth of the analysis. Default: unlimited.
+    tracer: A CallTracer from preload_tracer(), or None to create a new one.
+    shared_modules: Modules loaded by other runs, see load_pytd.Loader. Not
+      used if "tracer" is given.
+    max_variable_size: If given, variables with more bindings than this are
+      widened to Any. See cfg.Program.WidenLargeVariables.
+    deadline: The time.time() by which the analysis has to be done. Default:
+      --max-seconds from now.
   Returns:
     A TypeDeclUnit
   Raises:
     AssertionError: In case of a bad parameter combination.
+    cfg.ProgramTooComplexError: If the analysis exceeded one of the budgets in
+      the options.
   """
-  tracer = CallTracer(errorlog=errorlog, options=options,
-                      module_name=_get_module_name(filename, options),
-                      reverse_operators=reverse_operators,
-                      cache_unknowns=cache_unknowns,
-                      generate_unknowns=not options.quick)
-  loc, defs, builtin_names = tracer.run_program(
-      src, filename, init_maximum_depth, run_builtins)
+  tracer = _get_tracer(tracer, errorlog, filename, options,
+                       reverse_operators=reverse_operators,
+                       cache_unknowns=cache_unknowns,
+                       generate_unknowns=not options.quick,
+                       shared_modules=shared_modules)
+  if max_variable_size is not None:
+    tracer.program.WidenLargeVariables(max_variable_size,
+                                       tracer.convert.unsolvable)
+  program = tracer.program
+  with tracing.span("run_program", program):
+    loc, defs, builtin_names = tracer.run_program(
+        src, filename, init_maximum_depth, run_builtins, deadline)
   log.info("===Done run_program===")
-  if deep:
-    tracer.exitpoint = tracer.analyze(loc, defs, builtin_names, maximum_depth)
+  if deep and options.analysis_shards > 1:
+    shards = [shard for shard in _shard_defs(defs, builtin_names,
+                                             options.analysis_shards)
+              if shard]
   else:
-    tracer.exitpoint = loc
-  ast = tracer.compute_types(defs, builtin_names)
-  ast = tracer.loader.resolve_ast(ast)
-  if solve_unknowns:
-    log.info("=========== PyTD to solve =============\n%s", pytd.Print(ast))
-    ast = convert_structural.convert_pytd(ast, tracer.loader.concat_all())
-  elif extract_locals:
-    log.info("Solving is turned off. Discarding call traces.")
-    # Rename "~unknown" to "?"
-    ast = ast.Visit(visitors.RemoveUnknownClasses())
-    # Remove "~list" etc.:
-    ast = convert_structural.extract_local(ast)
+    shards = []
+  # With only one shard (e.g., for an empty module), there's nothing to gain
+  # from a child process.
+  if len(shards) > 1:
+    ast = _infer_sharded(tracer, loc, defs, builtin_names, maximum_depth,
+                         shards, solve_unknowns, extract_locals)
+  else:
+    if deep:
+      with tracing.span("analyze", program):
+        tracer.exitpoint = tracer.analyze(loc, defs, builtin_names,
+                                          maximum_depth)
+    else:
+      tracer.exitpoint = loc
+    ast = _compute_ast(tracer, defs, builtin_names, solve_unknowns,
+                       extract_locals)
   if options.output_cfg or options.output_typegraph:
     if options.output_cfg and options.output_typegraph:
       raise AssertionError("Can output CFG or typegraph, but not both")
@@ -666,5 +975,92 @@ def infer_types(src,
     else:
       with open(options.output_debug, "w") as fi:
         fi.write(text)
-
+  program.ClearCaches()
   return ast
+
+
+def infer_types_degraded(src, errorlog, options, **kwargs):
+  """Like infer_types, but retry with lower precision if we exceed a budget.
+
+  If the analysis exceeds one of the budgets in the options (--max-seconds,
+  --max-cfg-nodes, --max-memory, and the variable size for
+  --abort-on-complex), we analyze the module again, with
+    1. maximum_depth 1,
+    2. additionally, no solving of unknowns (like --quick),
+    3. additionally, variables with many bindings widened to Any,
+  until one of the attempts stays within the budgets. --max-seconds is for all
+  attempts together, so once it is exceeded, we give up.
+
+  Args:
+    src: A string containing Python source code.
+    errorlog: Where error messages go. Instance of errors.ErrorLog. Only gets
+      the errors of the successful attempt.
+    options: config.Options object
+    **kwargs: Other arguments for infer_types.
+  Returns:
+    A tuple (ast, budget). "budget" is the name of the last budget that was
+    exceeded, or None if the first attempt succeeded.
+  Raises:
+    cfg.ProgramTooComplexError: If even the last attempt exceeded a budget, or
+      if we ran out of time.
+  """
+  if options.max_seconds is not None:
+    kwargs = dict(kwargs, deadline=time.time() + options.max_seconds)
+  # A preloaded tracer can only be used once.
+  retry_kwargs = dict(kwargs, tracer=None, init_maximum_depth=1,
+                      maximum_depth=1)
+  quick_options = copy.copy(options)
+  quick_options.tweak(quick=True)
+  attempts = [
+      ("full", options, kwargs),
+      ("maximum_depth", options, retry_kwargs),
+      ("quick", quick_options, dict(retry_kwargs, solve_unknowns=False)),
+      ("widened", quick_options, dict(retry_kwargs, solve_unknowns=False,
+                                      max_variable_size=_WIDEN_VARIABLE_SIZE)),
+  ]
+  checkpoint = errorlog.save()
+  budget = None
+  tried = []
+  for i, (step, step_options, step_kwargs) in enumerate(attempts):
+    # E.g. with --quick, the "quick" step is the same as the one before.
+    settings = (step_options.quick, tuple(sorted(
+        (k, v) for k, v in step_kwargs.items() if k != "tracer")))
+    if settings in tried:
+      continue
+    tried.append(settings)
+    try:
+      ast = infer_types(src, errorlog, step_options, **step_kwargs)
+    except cfg.ProgramTooComplexError as e:
+      budget = e.budget
+      _budget_exceeded.inc(budget)
+      errorlog.revert_to(checkpoint)
+      if i == len(attempts) - 1 or budget == "time":
+        raise
+      log.warn("Exceeded the %s budget in step %r, analyzing again with "
+               "lower precision.", budget, step)
+    else:
+      _degradation_steps.inc(step)
+      return ast, budget
+
+
+def infer_types_many(sources, options, **kwargs):
+  """Infer the types of many modules, sharing the state they have in common.
+
+  The modules share the loaded .pyi files (see load_pytd.Loader) and the
+  compiled builtins. Every module still gets its own CallTracer and typegraph,
+  so the results are the same as calling infer_types for each module.
+
+  Args:
+    sources: An iterable of (src, filename) tuples. "filename" may be None.
+    options: config.Options object
+    **kwargs: Other arguments for infer_types, e.g. "deep".
+  Yields:
+    A tuple (filename, pytd.TypeDeclUnit, errors.ErrorLog) for every source,
+    in order, as soon as it's done.
+  """
+  shared_modules = {}
+  for src, filename in sources:
+    errorlog = errors.ErrorLog()
+    ast = infer_types(src, errorlog, options, filename=filename,
+                      shared_modules=shared_modules, **kwargs)
+    yield filename, ast, errorlog
@@ -12,6 +12,36 @@ from pytype.pytd.parse import visitors
 log = logging.getLogger(__name__)
 
 
+# Parsed (but not yet resolved) ASTs, shared by all loaders in this process, so
+# that e.g. a long-running pytype server only parses every file once. The
+# parser doesn't create pointers to other modules, so these ASTs can be reused.
+_parsed_builtins = {}  # (subdir, module, version, typeshed) => AST or None
+_parsed_files = {}  # filename => (stamp, AST)
+
+
+def _file_stamp(filename):
+  """Identify the current version of a file, or None if it doesn't exist."""
+  try:
+    st = os.stat(filename)
+  except OSError:
+    return None
+  # Files are overwritten when pytype processes their .py file again.
+  return st.st_ino, st.st_size, st.st_mtime
+
+
+def _parse_file(filename, module_name, python_version):
+  """Parse a .pyi file, or return the AST from a previous parse."""
+  stamp = (_file_stamp(filename), module_name, python_version)
+  cached = _parsed_files.get(filename)
+  if cached is not None and cached[0] == stamp:
+    return cached[1]
+  ast = builtins.ParsePyTD(filename=filename,
+                           module=module_name,
+                           python_version=python_version)
+  _parsed_files[filename] = stamp, ast
+  return ast
+
+
 class Module(object):
   """Represents a parsed module.
 
@@ -21,13 +51,20 @@ class Module(object):
       unique.
     ast: The parsed PyTD. Internal references will be resolved, but
       NamedType nodes referencing other modules might still be unresolved.
+    dependencies: The names of the modules this module references.
+    dependency_asts: A map, module name to AST, of the dependencies that the
+      references in our AST point into. Set once the module is fully loaded.
+    stamp: The _file_stamp of the file when we loaded it.
   """
 
   def __init__(self, module_name, filename, ast):
     self.module_name = module_name
     self.filename = filename
     self.ast = ast
+    self.dependencies = ()
+    self.dependency_asts = {}
     self.dirty = True
+    self.stamp = _file_stamp(filename)
 
 
 class DependencyNotFoundError(Exception):
@@ -56,15 +93,20 @@ class Loader(object):
     _modules: A map, filename to Module, for caching modules already loaded.
     _concatenated: A concatenated pytd of all the modules. Refreshed when
                    necessary.
+    _shared_modules: A map, module name to Module, of fully loaded modules
+                     that other loaders with the same options can take over,
+                     or None.
   """
 
   PREFIX = "pytd:"  # for pytd files that ship with pytype
 
   def __init__(self,
                base_module,
-               options):
+               options,
+               shared_modules=None):
     self.base_module = base_module
     self.options = options
+    self._shared_modules = shared_modules
     self.builtins, self.typing = builtins.GetBuiltinsAndTyping()
     self._modules = {
         "__builtin__":
@@ -97,16 +139,17 @@ class Loader(object):
         raise AssertionError("%s exists as both %s and %s" %
                              (module_name, filename, existing.filename))
       return existing.ast
+    shared = self._take_shared_module(module_name, filename)
+    if shared:
+      return shared.ast
     if not ast:
-      ast = builtins.ParsePyTD(filename=filename,
-                               module=module_name,
-                               python_version=self.options.python_version)
+      ast = _parse_file(filename, module_name, self.options.python_version)
     ast = self._postprocess_pyi(ast)
     module = Module(module_name, filename, ast)
     self._modules[module_name] = module
     try:
-      module.ast = self._load_and_resolve_ast_dependencies(module.ast,
-                                                           module_name)
+      module.ast, module.dependencies = (
+          self._load_and_resolve_ast_dependencies(module.ast, module_name))
       # Now that any imported TypeVar instances have been resolved, adjust type
       # parameters in classes and functions.
       module.ast = visitors.AdjustTypeParameters(module.ast)
@@ -125,8 +168,72 @@ class Loader(object):
       raise
     return module.ast
 
+  def _take_shared_module(self, module_name, filename):
+    """Reuse a module, and the modules it depends on, from another loader.
+
+    Args:
+      module_name: The name of the module.
+      filename: The file we would load the module from.
+    Returns:
+      The Module, or None if no other loader has loaded it from the same file,
+      or if the file of the module or of one of its dependencies has changed
+      since.
+    """
+    if self._shared_modules is None:
+      return None
+    module = self._shared_modules.get(module_name)
+    if module is None or module.filename != filename:
+      return None
+    new_modules = self._collect_shared_module(module)
+    if new_modules is None:
+      return None
+    log.debug("Reusing module %r with dependencies %r", module_name,
+              sorted(new_modules))
+    self._modules.update(new_modules)
+    self._concatenated = None  # invalidate
+    return module
+
+  def _collect_shared_module(self, module):
+    """Collect a shared module and the dependencies we'd have to take over.
+
+    We take over all dependencies, too, so that we end up with the same
+    modules (e.g. for concat_all) as if we had loaded this one ourselves.
+
+    Args:
+      module: A Module from _shared_modules.
+    Returns:
+      A map, module name to Module, of the module and the dependencies we
+      haven't loaded yet. None if any of their files changed, or if a
+      dependency (ours or a shared one) isn't the one the module's references
+      point into.
+    """
+    new_modules = {}
+    todo = [module]
+    while todo:
+      m = todo.pop()
+      if m.module_name in new_modules:
+        continue
+      if m.stamp != _file_stamp(m.filename):
+        return None
+      new_modules[m.module_name] = m
+      for name, ast in m.dependency_asts.items():
+        dependency = (self._modules.get(name) or
+                      self._shared_modules.get(name))
+        if dependency is None or dependency.ast is not ast:
+          return None
+        if name not in self._modules:
+          todo.append(dependency)
+    return new_modules
+
   def _load_and_resolve_ast_dependencies(self, ast, ast_name=None):
-    """Fill in all ClassType.cls pointers."""
+    """Fill in all ClassType.cls pointers.
+
+    Args:
+      ast: The AST.
+      ast_name: The name of the module the AST is for.
+    Returns:
+      A tuple of the resolved AST and the names of the modules it references.
+    """
     deps = visitors.CollectDependencies()
     ast.Visit(deps)
     if deps.modules:
@@ -139,7 +246,7 @@ class Loader(object):
                     for name, module in self._modules.items()}
       ast = ast.Visit(visitors.LookupExternalTypes(module_map, full_names=True,
                                                    self_name=ast_name))
-    return ast
+    return ast, tuple(sorted(deps.modules))
 
   def _finish_ast(self, ast):
     module_map = {name: module.ast
@@ -151,16 +258,29 @@ class Loader(object):
   def resolve_ast(self, ast):
     """Resolve the dependencies of an AST, without adding it to our modules."""
     ast = self._postprocess_pyi(ast)
-    ast = self._load_and_resolve_ast_dependencies(ast)
+    ast, _ = self._load_and_resolve_ast_dependencies(ast)
     self._lookup_all_classes()
     self._finish_ast(ast)
     return ast
 
   def _lookup_all_classes(self):
+    finished = []
     for module in self._modules.values():
       if module.dirty:
         self._finish_ast(module.ast)
         module.dirty = False
+        module.dependency_asts = {
+            name: self._modules[name].ast for name in module.dependencies
+            if name in self._modules}
+        finished.append(module)
+    if self._shared_modules is not None:
+      for module in finished:
+        if module.filename.startswith(self.PREFIX):
+          continue  # Every loader has these.
+        existing = self._shared_modules.get(module.module_name)
+        # Replace modules whose files, or whose dependencies, changed.
+        if existing is None or self._collect_shared_module(existing) is None:
+          self._shared_modules[module.module_name] = module
 
   def import_relative_name(self, name):
     """IMPORT_NAME with level=-1. A name relative to the current directory."""
@@ -207,11 +327,16 @@ class Loader(object):
   def _load_builtin(self, subdir, module_name):
     """Load a pytd/pyi that ships with pytype or typeshed."""
     version = self.options.python_version
-    # Try our own type definitions first.
-    mod = builtins.ParsePredefinedPyTD(subdir, module_name, version)
-    if not mod and self.options.typeshed:
-      # Fall back to typeshed.
-      mod = typeshed.parse_type_definition(subdir, module_name, version)
+    key = (subdir, module_name, version, self.options.typeshed)
+    if key in _parsed_builtins:
+      mod = _parsed_builtins[key]
+    else:
+      # Try our own type definitions first.
+      mod = builtins.ParsePredefinedPyTD(subdir, module_name, version)
+      if not mod and self.options.typeshed:
+        # Fall back to typeshed.
+        mod = typeshed.parse_type_definition(subdir, module_name, version)
+      _parsed_builtins[key] = mod
     if mod:
       log.debug("Found %s entry for %r", subdir, module_name)
       return self._load_file(filename=self.PREFIX + module_name,
@@ -50,6 +50,51 @@ class ImportPathsTest(unittest.TestCase):
       loader = load_pytd.Loader("base", self.options)
       self.assertTrue(loader.import_name("baz").Lookup("baz.x"))
 
+  def testSharedModules(self):
+    with utils.Tempdir() as d:
+      d.create_file("foo.pyi", "import bar\nx = ... # type: bar.Bar")
+      d.create_file("bar.pyi", "class Bar(object): ...")
+      self.options.tweak(pythonpath=[d.path])
+      shared_modules = {}
+      loader1 = load_pytd.Loader("base", self.options, shared_modules)
+      foo1 = loader1.import_name("foo")
+      loader2 = load_pytd.Loader("base", self.options, shared_modules)
+      foo2 = loader2.import_name("foo")
+      self.assertIs(foo1, foo2)
+      self.assertIs(loader1.import_name("bar"), loader2.import_name("bar"))
+      self.assertItemsEqual(
+          [m.name for m in loader1.concat_all().classes],
+          [m.name for m in loader2.concat_all().classes])
+
+  def testSharedModulesChangedDependency(self):
+    with utils.Tempdir() as d:
+      d.create_file("foo.pyi", "import bar\nx = ... # type: bar.Bar")
+      d.create_file("bar.pyi", "class Bar(object): ...")
+      self.options.tweak(pythonpath=[d.path])
+      shared_modules = {}
+      loader1 = load_pytd.Loader("base", self.options, shared_modules)
+      foo1 = loader1.import_name("foo")
+      d.create_file("bar.pyi", "class Bar(object): ...\nclass Baz(object): ...")
+      loader2 = load_pytd.Loader("base", self.options, shared_modules)
+      self.assertIsNot(foo1, loader2.import_name("foo"))
+      self.assertTrue(loader2.import_name("bar").Lookup("bar.Baz"))
+
+  def testSharedModulesModifiedBetweenLoads(self):
+    with utils.Tempdir() as d:
+      d.create_file("foo.pyi", "import bar\nx = ... # type: bar.Bar")
+      d.create_file("bar.pyi", "class Bar(object): ...")
+      self.options.tweak(pythonpath=[d.path])
+      shared_modules = {}
+      load_pytd.Loader("base", self.options, shared_modules).import_name("foo")
+      d.create_file("bar.pyi", "class Bar(object): ...\nclass Baz(object): ...")
+      loader2 = load_pytd.Loader("base", self.options, shared_modules)
+      foo2 = loader2.import_name("foo")
+      # The second loader loaded foo and bar again, so it shares them now.
+      loader3 = load_pytd.Loader("base", self.options, shared_modules)
+      self.assertIs(foo2, loader3.import_name("foo"))
+      self.assertIs(loader2.import_name("bar"), loader3.import_name("bar"))
+      self.assertTrue(loader3.import_name("bar").Lookup("bar.Baz"))
+
   def testBuiltins(self):
     with utils.Tempdir() as d:
       d.create_file("foo.pyi", "x = ... # type: int")
@@ -20,6 +20,7 @@ def bar(n):
 
 import math
 import re
+import StringIO
 import time
 
 import yaml
@@ -41,6 +42,11 @@ def _prepare_for_test(enabled=True):
   _enabled = enabled
 
 
+def enabled():
+  """Whether metrics are currently being collected."""
+  return _enabled
+
+
 def get_report():
   """Return a string listing all metrics, one per line."""
   lines = [str(_registered_metrics[n]) + "\n"
@@ -60,6 +66,32 @@ def merge_from_file(metrics_file):
       existing._merge(metric)  # pylint: disable=protected-access
 
 
+def dump_and_reset():
+  """Return a yaml dump of all metrics, then reset their values.
+
+  This is used by worker processes to hand the metrics they collected for one
+  unit of work back to the main process, which merges them with
+  merge_from_file(). Resetting ensures that nothing is counted twice.
+
+  Returns:
+    A string.
+  """
+  dump = yaml.dump(_registered_metrics.values())
+  reset()
+  return dump
+
+
+def reset():
+  """Reset the values of all metrics, e.g. between two runs of pytype."""
+  for metric in _registered_metrics.values():
+    metric._reset()  # pylint: disable=protected-access
+
+
+def merge_from_string(dump):
+  """Merge metrics returned by dump_and_reset() into the current metrics."""
+  merge_from_file(StringIO.StringIO(dump))
+
+
 class Metric(object):
   """Abstract base class for metrics."""
 
@@ -80,6 +112,10 @@ class Metric(object):
     """Return a string sumamrizing the value of the metric."""
     raise NotImplementedError
 
+  def _reset(self):
+    """Reset the metric to its initial value."""
+    raise NotImplementedError
+
   def _merge(self, other):
     """Merge data from another metric of the same type."""
     raise NotImplementedError
@@ -93,6 +129,9 @@ class Counter(Metric):
 
   def __init__(self, name):
     super(Counter, self).__init__(name)
+    self._reset()
+
+  def _reset(self):
     self._total = 0
 
   def inc(self, count=1):
@@ -116,6 +155,10 @@ class StopWatch(Metric):
 
   def __init__(self, name):
     super(StopWatch, self).__init__(name)
+    self._reset()
+
+  def _reset(self):
+    self._total = 0.0
 
   def __enter__(self):
     self._start_time = time.clock()
@@ -137,6 +180,9 @@ class MapCounter(Metric):
 
   def __init__(self, name):
     super(MapCounter, self).__init__(name)
+    self._reset()
+
+  def _reset(self):
     self._counts = {}
     self._total = 0
 
@@ -174,6 +220,9 @@ class Distribution(Metric):
 
   def __init__(self, name):
     super(Distribution, self).__init__(name)
+    self._reset()
+
+  def _reset(self):
     self._count = 0  # Number of values.
     self._total = 0.0  # Sum of the values.
     self._squared = 0.0  # Sum of the squares of the values.
@@ -77,6 +77,20 @@ class MetricsTest(unittest.TestCase):
     self.assertRaises(TypeError, metrics.merge_from_file,
                       cStringIO.StringIO(dump))
 
+  def test_dump_and_reset(self):
+    c = metrics.Counter("foo")
+    d = metrics.Distribution("bar")
+    c.inc(3)
+    d.add(2)
+    dump = metrics.dump_and_reset()
+    self.assertEquals(0, c._total)
+    self.assertEquals(0, d._count)
+    # Merging the dump restores the values that were collected.
+    metrics.merge_from_string(dump)
+    self.assertEquals(3, c._total)
+    self.assertEquals(1, d._count)
+    self.assertEquals(2, d._max)
+
 
 class StopWatchTest(unittest.TestCase):
   """Tests for StopWatch."""
@@ -1,4 +1,12 @@
-"""Compiles a single .py to a .pyc and writes it to stdout."""
+"""Compiles a single .py to a .pyc and writes it to stdout.
+
+With --server, compiles sources sent over stdin until stdin is closed, instead.
+Every request is three frames (source, filename, mode), and every response is
+one frame holding the output we'd write to stdout for a single file. A frame is
+a 32-bit little-endian length, followed by that many bytes. Since requests are
+processed in order, a client can also write a whole batch of requests before
+reading the responses.
+"""
 
 # These are C modules built into Python. Don't add any modules that are
 # implemented in a .py:
@@ -18,6 +26,27 @@ def _write32(f, w):
       (w >> 24) & 0xff]))
 
 
+def _read32(f):
+  b = bytearray(f.read(4))
+  if len(b) < 4:
+    raise EOFError()
+  return b[0] | b[1] << 8 | b[2] << 16 | b[3] << 24
+
+
+def write_frame(f, data):
+  _write32(f, len(data))
+  f.write(data)
+
+
+def read_frame(f):
+  """Read one frame. Raises EOFError if the stream ends early."""
+  size = _read32(f)
+  data = f.read(size)
+  if len(data) < size:
+    raise EOFError()
+  return data
+
+
 def write_pyc(f, codeobject, source_size=0, timestamp=0):
   f.write(MAGIC)
   _write32(f, timestamp)
@@ -26,23 +55,63 @@ def write_pyc(f, codeobject, source_size=0, timestamp=0):
   f.write(marshal.dumps(codeobject))
 
 
-def compile_to_pyc(data_file, filename, output, mode="exec"):
-  with open(data_file, "r") as fi:
-    src = fi.read()
+def compile_src_to_pyc(src, filename, output, mode="exec"):
+  """Compile src, and write the pyc (or the error) to output."""
   try:
     codeobject = compile(src, filename, mode)
   except Exception as err:  # pylint: disable=broad-except
+    message = str(err)
+    if not isinstance(message, bytes):
+      message = message.encode("utf-8")
     output.write(b"\1")
-    output.write(str(err))
+    output.write(message)
   else:
     output.write(b"\0")
     write_pyc(output, codeobject)
 
 
+def compile_to_pyc(data_file, filename, output, mode="exec"):
+  with open(data_file, "r") as fi:
+    src = fi.read()
+  compile_src_to_pyc(src, filename, output, mode)
+
+
+class _Buffer(object):
+  """A minimal replacement for StringIO, which is implemented in a .py."""
+
+  def __init__(self):
+    self.chunks = []
+
+  def write(self, data):
+    self.chunks.append(bytes(data))
+
+  def getvalue(self):
+    return b"".join(self.chunks)
+
+
+def serve(input_stream, output):
+  """Compile the sources sent to input_stream until it is closed."""
+  while True:
+    try:
+      src = read_frame(input_stream)
+    except EOFError:
+      return
+    filename = read_frame(input_stream).decode("utf-8")
+    mode = read_frame(input_stream).decode("utf-8")
+    result = _Buffer()
+    compile_src_to_pyc(src, filename, result, mode)
+    write_frame(output, result.getvalue())
+    output.flush()
+
+
 def main():
+  output = sys.stdout.buffer if hasattr(sys.stdout, "buffer") else sys.stdout
+  if sys.argv[1:] == ["--server"]:
+    stdin = sys.stdin.buffer if hasattr(sys.stdin, "buffer") else sys.stdin
+    serve(stdin, output)
+    return
   if len(sys.argv) != 4:
     sys.exit(1)
-  output = sys.stdout.buffer if hasattr(sys.stdout, "buffer") else sys.stdout
   compile_to_pyc(data_file=sys.argv[1], filename=sys.argv[2],
                  output=output, mode=sys.argv[3])
 
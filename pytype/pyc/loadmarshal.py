@@ -49,6 +49,13 @@ TYPE_SHORT_ASCII_INTERNED = 0x5a  # 'Z'
 # Python 3.4.
 REF = 0x80
 
+# Decoders for the fixed-size values. Marshal data is always little-endian.
+# unpack_from decodes in place, without copying the bytes out of the buffer.
+_unpack_int32 = struct.Struct('<i').unpack_from
+_unpack_int64 = struct.Struct('<q').unpack_from
+_unpack_double = struct.Struct('<d').unpack_from
+_unpack_complex = struct.Struct('<dd').unpack_from
+
 
 class _NULL(object):
   """Used internally, e.g. as a sentinel in dictionary entry lists."""
@@ -115,20 +122,22 @@ class _LoadMarshal(object):
     """Load an encoded Python data structure."""
     c = '?'  # make pylint happy
     try:
-      c = self._read_byte()
+      pos = self.bufpos
+      c = ord(self.bufstr[pos])
+      self.bufpos = pos + 1
       if c & REF:
         # This element might recursively contain other elements, which
         # themselves store things in the refs table. So we need to determine the
         # index position *before* reading the contents of this element.
         idx = self._reserve_ref()
-        result = _LoadMarshal.dispatch[c & ~REF](self)
+        result = self.dispatch[c & ~REF](self)
         self.refs[idx] = result
       else:
-        result = _LoadMarshal.dispatch[c](self)
+        result = self.dispatch[c](self)
       return result
     except KeyError:
       raise ValueError('bad marshal code: %r (%02x)' % (chr(c), c))
-    except IndexError:
+    except (IndexError, struct.error):
       raise EOFError
 
   def _read(self, n):
@@ -145,36 +154,33 @@ class _LoadMarshal(object):
     self.bufpos += 1
     return ord(self.bufstr[pos])
 
-  def _read_short(self):
-    """Read a signed 16 bit word."""
-    lo = self._read_byte()
-    hi = self._read_byte()
-    x = lo | (hi<<8)
-    if x & 0x8000:
-      # sign extension
-      x -= 0x10000
-    return x
-
   def _read_long(self):
     """Read a signed 32 bit word."""
-    s = self._read(4)
-    x = ord(s[0]) | ord(s[1])<<8 | ord(s[2])<<16 | ord(s[3])<<24
-    if ord(s[3]) & 0x80 and x > 0:
-      # sign extension
-      x = -((1<<32) - x)
-      return int(x)
-    else:
-      return x
+    pos = self.bufpos
+    self.bufpos += 4
+    return _unpack_int32(self.bufstr, pos)[0]
 
   def _read_long64(self):
     """Read a signed 64 bit integer."""
-    s = self._read(8)
-    x = (ord(s[0]) | ord(s[1])<<8 | ord(s[2])<<16 | ord(s[3])<<24 |
-         ord(s[4])<<32 | ord(s[5])<<40 | ord(s[6])<<48 | ord(s[7])<<56)
-    if ord(s[7]) & 0x80 and x > 0:
-      # sign extension
-      x = -((1<<64) - x)
-    return x
+    pos = self.bufpos
+    self.bufpos += 8
+    return _unpack_int64(self.bufstr, pos)[0]
+
+  def _read_sized(self):
+    """Read a string that is prefixed with its 32 bit length."""
+    buf = self.bufstr
+    pos = self.bufpos + 4
+    end = pos + _unpack_int32(buf, self.bufpos)[0]
+    if end > len(buf):
+      raise EOFError()
+    self.bufpos = end
+    # The only copy: We need an immutable string.
+    return buf[pos:end]
+
+  def _load_many(self, n):
+    """Load a run of n elements, e.g. of a tuple."""
+    load = self.load
+    return [load() for _ in xrange(n)]
 
   def _reserve_ref(self):
     """Reserve one entry in the reference table.
@@ -208,18 +214,19 @@ class _LoadMarshal(object):
   def load_ellipsis(self):
     return Ellipsis
 
-  def load_int(self):
-    return self._read_long()
-
-  def load_int64(self):
-    return self._read_long64()
+  # These are called for every integer constant, so avoid another call.
+  load_int = _read_long
+  load_int64 = _read_long64
 
   def load_long(self):
     """Load a variable length integer."""
     size = self._read_long()
+    # The digits are 15 bit unsigned numbers, stored in 16 bits each.
+    pos = self.bufpos
+    self.bufpos += 2 * abs(size)
+    digits = struct.unpack_from('<%dH' % abs(size), self.bufstr, pos)
     x = 0
-    for i in xrange(abs(size)):
-      d = self._read_short()
+    for i, d in enumerate(digits):
       x |= d<<(i*15)
     return x if size >= 0 else -x
 
@@ -229,8 +236,9 @@ class _LoadMarshal(object):
     return float(s)
 
   def load_binary_float(self):
-    binary = self._read(8)
-    return struct.unpack('<d', binary)[0]
+    pos = self.bufpos
+    self.bufpos += 8
+    return _unpack_double(self.bufstr, pos)[0]
 
   def load_complex(self):
     n = self._read_byte()
@@ -242,16 +250,15 @@ class _LoadMarshal(object):
     return complex(real, imag)
 
   def load_binary_complex(self):
-    binary = self._read(16)
-    return complex(*struct.unpack('dd', binary))
+    pos = self.bufpos
+    self.bufpos += 16
+    return complex(*_unpack_complex(self.bufstr, pos))
 
   def load_string(self):
-    n = self._read_long()
-    return self._read(n)
+    return self._read_sized()
 
   def load_interned(self):
-    n = self._read_long()
-    ret = intern(self._read(n))
+    ret = intern(self._read_sized())
     self._stringtable.append(ret)
     return ret
 
@@ -260,14 +267,10 @@ class _LoadMarshal(object):
     return self._stringtable[n]
 
   def load_unicode(self):
-    n = self._read_long()
-    s = self._read(n)
-    ret = s.decode('utf8')
-    return ret
+    return self._read_sized().decode('utf8')
 
   def load_ascii(self):
-    n = self._read_long()
-    return self._read(n)
+    return self._read_sized()
 
   def load_short_ascii(self):
     n = self._read_byte()
@@ -278,17 +281,11 @@ class _LoadMarshal(object):
 
   def load_small_tuple(self):
     n = self._read_byte()
-    l = []
-    for _ in xrange(n):
-      l.append(self.load())
-    return tuple(l)
+    return tuple(self._load_many(n))
 
   def load_list(self):
     n = self._read_long()
-    l = []
-    for _ in xrange(n):
-      l.append(self.load())
-    return l
+    return self._load_many(n)
 
   def load_dict(self):
     d = {}
@@ -326,13 +323,11 @@ class _LoadMarshal(object):
 
   def load_set(self):
     n = self._read_long()
-    args = [self.load() for _ in xrange(n)]
-    return set(args)
+    return set(self._load_many(n))
 
   def load_frozenset(self):
     n = self._read_long()
-    args = [self.load() for _ in xrange(n)]
-    return frozenset(args)
+    return frozenset(self._load_many(n))
 
   def load_ref(self):
     n = self._read_long()
@@ -0,0 +1,53 @@
+"""Benchmark for loadmarshal.loads on large marshalled code objects.
+
+Usage:
+  python -m pytype.pyc.loadmarshal_benchmark [file.pyc ...]
+
+Without arguments, this times a generated module with big constant tables,
+like the ones of generated code (e.g. protobufs). With arguments, it times
+the given .pyc files, which have to match the running Python version.
+"""
+
+import imp
+import marshal
+import sys
+import timeit
+
+from pytype.pyc import loadmarshal
+
+
+def _generate_module(size):
+  """Generate the source of a module with tables of constants."""
+  table = ", ".join("%d: (%d, 's%d', %d.5, %dL)" % (i, i * 7, i, i, i << 70)
+                    for i in range(size))
+  names = ", ".join("u'name%d'" % i for i in range(size))
+  functions = "".join("def f%d(x):\n  return x + %d\n" % (i, i)
+                      for i in range(size // 10))
+  return "TABLE = {%s}\nNAMES = [%s]\n%s" % (table, names, functions)
+
+
+def _read_pyc(filename):
+  with open(filename, "rb") as fi:
+    data = fi.read()
+  if data[:4] != imp.get_magic():
+    raise ValueError("%s isn't a pyc for this Python version" % filename)
+  return data[8:]  # Skip the magic word and the timestamp.
+
+
+def main(argv):
+  if len(argv) > 1:
+    blobs = [(filename, _read_pyc(filename)) for filename in argv[1:]]
+  else:
+    code = compile(_generate_module(20000), "generated.py", "exec")
+    blobs = [("generated.py", marshal.dumps(code))]
+  version = sys.version_info[:2]
+  repeat = 5
+  for name, data in blobs:
+    timer = timeit.Timer(lambda data=data: loadmarshal.loads(data, version))
+    seconds = timer.timeit(number=repeat) / repeat
+    print "%s: %d bytes, %.3f s per load, %.1f MB/s" % (
+        name, len(data), seconds, len(data) / seconds / 2**20)
+
+
+if __name__ == "__main__":
+  main(sys.argv)
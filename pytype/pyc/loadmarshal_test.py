@@ -163,5 +163,14 @@ class TestLoadMarshal(unittest.TestCase):
   def test_truncated_byte(self):
     self.assertRaises(EOFError, lambda: self.load('f'))
 
+  def test_truncated_int(self):
+    self.assertRaises(EOFError, lambda: self.load('i\1\2'))
+
+  def test_truncated_long(self):
+    self.assertRaises(EOFError, lambda: self.load('l\3\0\0\0\1\0'))
+
+  def test_truncated_string(self):
+    self.assertRaises(EOFError, lambda: self.load('s\4\0\0\0abc'))
+
 if __name__ == '__main__':
   unittest.main()
@@ -3,6 +3,8 @@
 # We define all-uppercase classes, to match their opcode names:
 # pylint: disable=invalid-name
 
+import collections
+
 HAS_CONST = 1  # references the constant table
 HAS_NAME = 2  # references the name table
 HAS_JREL = 4  # relative jump
@@ -41,6 +43,11 @@ class Opcode(object):
   def name(self):
     return self.__class__.__name__
 
+  @property
+  def opcode_class(self):
+    # Views like blocks.CompactOpcode return the class they're a view of.
+    return self.__class__
+
   @classmethod
   def has_const(cls):
     return bool(cls.FLAGS & HAS_CONST)
@@ -113,12 +120,28 @@ class Opcode(object):
 class OpcodeWithArg(Opcode):
   """An opcode with one argument."""
 
-  __slots__ = ("arg", "pretty_arg")
+  __slots__ = ("arg", "_pretty_arg", "_arg_names")
 
-  def __init__(self, index, line, arg, pretty_arg=None):
+  def __init__(self, index, line, arg, pretty_arg=None, arg_names=None):
     super(OpcodeWithArg, self).__init__(index, line)
     self.arg = arg
-    self.pretty_arg = pretty_arg
+    self._pretty_arg = pretty_arg
+    # An _ArgNames, for computing pretty_arg when it's needed.
+    self._arg_names = arg_names
+
+  @property
+  def pretty_arg(self):
+    """A readable version of arg, e.g. a variable name. Used for logging."""
+    if self._pretty_arg is None:
+      if self._arg_names is None:
+        return self.arg
+      self._pretty_arg = _prettyprint_arg(
+          self.__class__, self.arg, *self._arg_names)
+    return self._pretty_arg
+
+  @pretty_arg.setter
+  def pretty_arg(self, value):
+    self._pretty_arg = value
 
   def __str__(self):
     return "%4d: %s %s" % (self.index, self.__class__.__name__, self.arg)
@@ -958,34 +981,73 @@ class _LineNumberTableParser(object):
 
 def _prettyprint_arg(cls, oparg, co_consts, co_names,
                      co_varnames, cellvars_freevars):
-  if cls.has_jrel():
+  if cls.FLAGS & HAS_JREL:
     return oparg
-  elif co_consts and cls.has_const():
+  elif co_consts and cls.FLAGS & HAS_CONST:
     return repr(co_consts[oparg])
-  elif co_names and cls.has_name():
+  elif co_names and cls.FLAGS & HAS_NAME:
     return co_names[oparg]
-  elif co_varnames and cls.has_local():
+  elif co_varnames and cls.FLAGS & HAS_LOCAL:
     return co_varnames[oparg]
-  elif cellvars_freevars and cls.has_free():
+  elif cellvars_freevars and cls.FLAGS & HAS_FREE:
     return cellvars_freevars[oparg]
   else:
     return oparg
 
 
-def _dis(data, mapping,
-         co_varnames=None, co_names=None, co_consts=None, co_cellvars=None,
-         co_freevars=None, co_lnotab=None, co_firstlineno=None):
-  """Disassemble a string into a list of Opcode instances."""
+# The tables of a code object that the arguments of opcodes refer to.
+_ArgNames = collections.namedtuple(
+    "_ArgNames", ["co_consts", "co_names", "co_varnames", "cellvars_freevars"])
+
+
+def _make_decode_table(mapping):
+  """Precompute, for every opcode byte, the class and how to decode it.
+
+  Args:
+    mapping: A map from opcode numbers to Opcode subclasses.
+  Returns:
+    A list of 256 entries (cls, has_argument, is_jump, is_relative_jump), with
+    None for undefined opcodes.
+  """
+  table = [None] * 256
+  for opcode, cls in mapping.items():
+    table[opcode] = (cls, bool(cls.FLAGS & HAS_ARGUMENT),
+                     bool(cls.FLAGS & (HAS_JREL | HAS_JABS)),
+                     bool(cls.FLAGS & HAS_JREL))
+  return table
+
+
+# Disassembled code, as returned by _decode. Identical code (e.g. of the
+# builtins, which are compiled for every VM) is only decoded once. When the
+# cache is full, we start over.
+_decode_cache = {}
+_DECODE_CACHE_SIZE = 10000
+
+
+def _decode(data, table, co_lnotab, co_firstlineno):
+  """Decode bytecode.
+
+  Args:
+    data: The bytecode, a string.
+    table: The result of _make_decode_table.
+    co_lnotab: The line number table, or None.
+    co_firstlineno: The line of the first instruction.
+  Returns:
+    A tuple of (cls, line, arg) tuples. "arg" is None for opcodes without an
+    argument. The argument of jumps is the index of the target instruction.
+  """
+  # An empty line number table may also be given as an (unhashable) list.
+  key = (data, id(table), co_lnotab or None, co_firstlineno)
+  result = _decode_cache.get(key)
+  if result is not None:
+    return result
   code = []
   size = len(data)
   pos = 0
   lp = _LineNumberTableParser(co_lnotab, co_firstlineno) if co_lnotab else None
   offset_to_index = {}
+  jumps = []
   extended_arg = 0
-  if co_cellvars is not None and co_freevars is not None:
-    cellvars_freevars = co_cellvars + co_freevars
-  else:
-    cellvars_freevars = None
   while pos < size:
     opcode = ord(data[pos])
     index = len(code)
@@ -996,37 +1058,64 @@ def _dis(data, mapping,
       # single line programs don't have co_lnotab
       line = co_firstlineno
     pos += 1
-    cls = mapping[opcode]
+    cls, has_argument, is_jump, is_relative_jump = table[opcode]
     if cls is EXTENDED_ARG:
       # EXTENDED_ARG modifies the opcode after it, setting bits 16..31 of
       # its argument.
       assert not extended_arg, "two EXTENDED_ARGs in a row"
       extended_arg = ord(data[pos]) << 16 | ord(data[pos+1]) << 24
       pos += 2
-    elif cls.FLAGS & HAS_ARGUMENT:
+    elif has_argument:
       oparg = ord(data[pos]) | ord(data[pos+1]) << 8 | extended_arg
       extended_arg = 0
       pos += 2
-      if cls.has_jrel():
+      if is_relative_jump:
         oparg += pos
-      pretty = _prettyprint_arg(cls, oparg, co_consts, co_names, co_varnames,
-                                cellvars_freevars)
-      code.append(cls(index, line, oparg, pretty))
+      if is_jump:
+        jumps.append(index)
+      code.append((cls, line, oparg))
     else:
       assert not extended_arg, "EXTENDED_ARG in front of opcode without arg"
-      code.append(cls(index, line))
+      code.append((cls, line, None))
+  # Jump to the index of the target opcode, rather than to its offset.
+  for i in jumps:
+    cls, line, oparg = code[i]
+    code[i] = (cls, line, offset_to_index[oparg])
+  result = tuple(code)
+  if len(_decode_cache) >= _DECODE_CACHE_SIZE:
+    _decode_cache.clear()
+  _decode_cache[key] = result
+  return result
+
 
-  # Map the target of jump instructions to the opcode they jump to, and fill
-  # in "next" and "prev" pointers
+def _dis(data, mapping,
+         co_varnames=None, co_names=None, co_consts=None, co_cellvars=None,
+         co_freevars=None, co_lnotab=None, co_firstlineno=None):
+  """Disassemble a string into a list of Opcode instances."""
+  decoded = _decode(data, _decode_tables[id(mapping)], co_lnotab,
+                    co_firstlineno)
+  if co_cellvars is not None and co_freevars is not None:
+    cellvars_freevars = co_cellvars + co_freevars
+  else:
+    cellvars_freevars = None
+  arg_names = _ArgNames(co_consts, co_names, co_varnames, cellvars_freevars)
+  code = [cls(index, line) if arg is None else
+          cls(index, line, arg, None, arg_names)
+          for index, (cls, line, arg) in enumerate(decoded)]
+  # Fill in the targets of jump instructions, and "next" and "prev" pointers.
   for i, op in enumerate(code):
     if op.FLAGS & (HAS_JREL | HAS_JABS):
-      op.arg = op.pretty_arg = offset_to_index[op.arg]
+      op.pretty_arg = op.arg
       op.target = code[op.arg]
     op.prev = code[i - 1] if i > 0 else None
     op.next = code[i + 1] if i < len(code) - 1 else None
   return code
 
 
+_decode_tables = {id(mapping): _make_decode_table(mapping)
+                  for mapping in (python2_mapping, python3_mapping)}
+
+
 def dis(data, python_version, *args, **kwargs):
   assert python_version[0] in (2, 3)
   mapping = python2_mapping if python_version[0] == 2 else python3_mapping
@@ -756,6 +756,36 @@ class Python2Test(_TestBase):
     self.assertEquals(ops[0].arg, 0x10002)
     self.assertEquals(ops[1].name, 'RETURN_VALUE')
 
+  def test_memoize(self):
+    code = ''.join(chr(c) for c in [
+        0x71, 3, 0,  # 0 JUMP_ABSOLUTE, dest=3,
+        0x64, 0, 0,  # 3 LOAD_CONST, arg=0,
+        0x53,  # 6 RETURN_VALUE
+    ])
+    ops1 = opcodes.dis(code, self.PYTHON_VERSION, co_consts=[None])
+    ops2 = opcodes.dis(code, self.PYTHON_VERSION, co_consts=[42])
+    # Every call returns new opcodes, which callers are free to modify ...
+    for op1, op2 in zip(ops1, ops2):
+      self.assertIsNot(op1, op2)
+    self.assertIs(ops2[0].target, ops2[1])
+    self.assertIs(ops2[1].prev, ops2[0])
+    # ... but they still describe the constants they were disassembled with.
+    self.assertEquals('None', ops1[1].pretty_arg)
+    self.assertEquals('42', ops2[1].pretty_arg)
+    self.assertEquals(1, ops2[0].pretty_arg)
+
+  def test_pretty_arg(self):
+    ops = opcodes.dis(''.join(chr(c) for c in [
+        0x74, 0, 0,  # 0 LOAD_GLOBAL, arg=0,
+        0x7c, 0, 0,  # 3 LOAD_FAST, arg=0,
+        0x53,  # 6 RETURN_VALUE
+    ]), self.PYTHON_VERSION, co_names=['x'], co_varnames=['y'])
+    self.assertEquals('x', ops[0].pretty_arg)
+    self.assertEquals('y', ops[1].pretty_arg)
+    ops[1].pretty_arg = 'z'
+    self.assertEquals('z', ops[1].pretty_arg)
+    self.assertEquals(0, self.dis([0x7c, 0, 0])[0].pretty_arg)
+
 
 class Python3Test(_TestBase):
   """Test bytecodes specific to Python 3."""
@@ -1,30 +1,189 @@
 """Functions for generating, reading and parsing pyc."""
 
+import atexit
 import copy
+import hashlib
+import logging
 import os
 import StringIO
 import subprocess
-import tempfile
+import threading
 
+from pytype import disk_cache
+from pytype import metrics
 from pytype.pyc import compile_bytecode
 from pytype.pyc import loadmarshal
 from pytype.pyc import magic
 
 
+log = logging.getLogger(__name__)
+
+
 COMPILE_SCRIPT = os.path.join(os.path.dirname(__file__), "compile_bytecode.py")
 
 
+# Change this whenever the format of the bytecode cache entries changes.
+_BYTECODE_CACHE_VERSION = 1
+
+_bytecode_cache_hits = metrics.Counter("bytecode_cache_hits")
+_bytecode_cache_misses = metrics.Counter("bytecode_cache_misses")
+_bytecode_cache_evictions = metrics.Counter("bytecode_cache_evictions")
+
+
 class CompileError(Exception):
   pass
 
 
+class BytecodeCache(disk_cache.DiskCache):
+  """An on-disk cache of compiled sources. See --bytecode-cache."""
+
+  _hits = _bytecode_cache_hits
+  _misses = _bytecode_cache_misses
+  _evictions = _bytecode_cache_evictions
+
+  @staticmethod
+  def compute_key(src, filename, python_version, python_exe, mode):
+    h = hashlib.sha1()
+    for part in (_BYTECODE_CACHE_VERSION, src, filename, python_version,
+                 python_exe, mode):
+      part = part.encode("utf-8") if isinstance(part, unicode) else str(part)
+      h.update("%d:%s" % (len(part), part))
+    return h.hexdigest()
+
+
+class _CompileServer(object):
+  """A "compile_bytecode.py --server" process, for compiling many sources.
+
+  Starting an interpreter takes much longer than compiling a small module, so
+  we keep one process per interpreter around, and send it the sources over a
+  pipe. If the process dies, we start a new one.
+  """
+
+  def __init__(self, exe):
+    self._exe = exe
+    self._process = None
+
+  def _start(self):
+    log.info("Starting compile server: %s", " ".join(self._exe))
+    self._process = subprocess.Popen(
+        self._exe + [COMPILE_SCRIPT, "--server"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+  def compile(self, src, filename, mode):
+    """Compile src. Returns the output of compile_bytecode.compile_to_pyc."""
+    for attempt in range(2):
+      if self._process is None or self._process.poll() is not None:
+        self._start()
+      try:
+        self._send(self._process, [(src, filename, mode)])
+        return compile_bytecode.read_frame(self._process.stdout)
+      except (IOError, OSError, EOFError) as e:
+        log.warn("Compile server failed (attempt %d): %s", attempt + 1, e)
+        self.close()
+    raise IOError("Compile server %r keeps failing" % " ".join(self._exe))
+
+  def compile_many(self, requests):
+    """Compile many sources, sending them all before reading any results.
+
+    Args:
+      requests: A list of (src, filename, mode) tuples.
+    Returns:
+      A list with the output of compile_bytecode.compile_to_pyc for every
+      request.
+    """
+    if self._process is None or self._process.poll() is not None:
+      self._start()
+    process = self._process
+    def send():
+      try:
+        self._send(process, requests)
+      except (IOError, OSError):
+        pass  # We'll notice when reading the results.
+    # Write from another thread, since the server blocks once we stop reading.
+    writer = threading.Thread(target=send)
+    writer.start()
+    results = []
+    try:
+      for _ in requests:
+        results.append(compile_bytecode.read_frame(process.stdout))
+    except (IOError, OSError, EOFError) as e:
+      log.warn("Compile server failed after %d of %d sources: %s",
+               len(results), len(requests), e)
+      self.close()
+    writer.join()
+    # If the server died, compile the rest one at a time.
+    for src, filename, mode in requests[len(results):]:
+      results.append(self.compile(src, filename, mode))
+    return results
+
+  @staticmethod
+  def _send(process, requests):
+    for request in requests:
+      for data in request:
+        if isinstance(data, unicode):
+          data = data.encode("utf-8")
+        compile_bytecode.write_frame(process.stdin, data)
+    process.stdin.flush()
+
+  def close(self):
+    """Stop the process. A new one is started by the next compile() call."""
+    if self._process is None:
+      return
+    process, self._process = self._process, None
+    try:
+      process.stdin.close()
+    except IOError:
+      pass
+    if process.poll() is None:
+      process.kill()
+    process.wait()
+
+
+# Maps (process id, interpreter command line) to a _CompileServer. We use a
+# separate server in every process, since processes that were forked from the
+# one that started a server can't share its pipes.
+_compile_servers = {}
+
+
+def _get_compile_server(exe):
+  key = (os.getpid(), tuple(exe))
+  server = _compile_servers.get(key)
+  if server is None:
+    server = _compile_servers[key] = _CompileServer(exe)
+  return server
+
+
+@atexit.register
+def close_compile_servers():
+  """Stop the compile servers started by this process."""
+  pid = os.getpid()
+  for (server_pid, _), server in _compile_servers.items():
+    if server_pid == pid:
+      server.close()
+
+
+def _get_exe(python_version, python_exe):
+  """The command line for running the interpreter, for _CompileServer."""
+  if python_exe:
+    # Allow python_exe to contain parameters (E.g. "-T")
+    return python_exe.split() + ["-S"]
+  else:
+    return ["python" + ".".join(map(str, python_version))]
+
+
+def _compile_in_process(src, filename, mode):
+  output = StringIO.StringIO()
+  compile_bytecode.compile_src_to_pyc(src, filename, output, mode)
+  return output.getvalue()
+
+
 def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
-                                     mode="exec"):
+                                     mode="exec", cache=None):
   """Compile Python source code to pyc data.
 
-  This may use py_compile if the src is for the same version as we're running,
-  or else it spawns an external process to produce a .pyc file. The generated
-  bytecode (.pyc file) is read and both it and any temporary files are deleted.
+  This may compile in-process if the src is for the same version as we're
+  running, or else it sends the source to a compile server running the right
+  version of Python (see _CompileServer).
 
   Args:
     src: Python sourcecode
@@ -36,6 +195,7 @@ def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
     mode: Same as __builtin__.compile: "exec" if source consists of a
       sequence of statements, "eval" if it consists of a single expression,
       or "single" if it consists of a single interactive statement.
+    cache: A BytecodeCache, or None. Only successful compilations are cached.
 
   Returns:
     The compiled pyc file as a binary string.
@@ -43,30 +203,23 @@ def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
     CompileError: If we find a syntax error in the file.
     IOError: If our compile script failed.
   """
-  fi = tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False)
-
-  try:
-    fi.write(src)
-    fi.close()
-    if python_exe == "HOST":
-      # We were asked to use the version of Python we're running to compile.
-      output = StringIO.StringIO()
-      compile_bytecode.compile_to_pyc(fi.name, filename or fi.name,
-                                      output, mode)
-      bytecode = output.getvalue()
-    else:
-      # In order to be able to compile pyc files for both Python 2 and Python 3,
-      # we spawn an external process.
-      if python_exe:
-        # Allow python_exe to contain parameters (E.g. "-T")
-        exe = python_exe.split() + ["-S"]
-      else:
-        exe = ["python" + ".".join(map(str, python_version))]
-      bytecode = subprocess.check_output(exe + [
-          COMPILE_SCRIPT, fi.name, filename or fi.name, mode])
-  finally:
-    os.unlink(fi.name)
+  filename = filename or "<string>"
+  if cache:
+    key = cache.compute_key(src, filename, python_version, python_exe, mode)
+    pyc_data = cache.get(key)
+    if pyc_data is not None:
+      return pyc_data
+  if python_exe == "HOST":
+    # We were asked to use the version of Python we're running to compile.
+    bytecode = _compile_in_process(src, filename, mode)
+  else:
+    # In order to be able to compile pyc files for both Python 2 and Python 3,
+    # we use an external process.
+    exe = _get_exe(python_version, python_exe)
+    bytecode = _get_compile_server(exe).compile(src, filename, mode)
   if bytecode[0] == chr(0):  # compile OK
+    if cache:
+      cache.put(key, bytecode[1:])
     return bytecode[1:]
   elif bytecode[0] == chr(1):  # compile error
     raise CompileError(bytecode[1:])
@@ -74,6 +227,55 @@ def compile_src_string_to_pyc_string(src, filename, python_version, python_exe,
     raise IOError("_compile.py produced invalid result")
 
 
+# Code compiled by precompile(), keyed by BytecodeCache.compute_key.
+_precompiled = {}
+
+
+def precompile(sources, python_version, python_exe, cache=None):
+  """Compile many sources at once, for later calls of compile_src.
+
+  The sources that aren't in the cache are sent to the compile server in one
+  batch, which saves a round trip per source. compile_src then returns the
+  parsed code without compiling again. Sources with syntax errors are skipped,
+  compile_src will report the error.
+
+  Args:
+    sources: A list of (src, filename, mode) tuples.
+    python_version: Python version, (major, minor).
+    python_exe: Path to Python interpreter, "HOST", or None.
+    cache: A BytecodeCache, or None.
+  """
+  todo = []
+  for src, filename, mode in sources:
+    filename = filename or "<string>"
+    key = BytecodeCache.compute_key(
+        src, filename, python_version, python_exe, mode)
+    if key in _precompiled:
+      continue
+    pyc_data = cache.get(key) if cache else None
+    if pyc_data is None:
+      todo.append((key, (src, filename, mode)))
+    else:
+      _precompiled[key] = parse_pyc_string(pyc_data)
+  if not todo:
+    return
+  requests = [request for _, request in todo]
+  if python_exe == "HOST":
+    results = [_compile_in_process(*request) for request in requests]
+  else:
+    exe = _get_exe(python_version, python_exe)
+    results = _get_compile_server(exe).compile_many(requests)
+  for (key, _), bytecode in zip(todo, results):
+    if bytecode[:1] == chr(0):
+      if cache:
+        cache.put(key, bytecode[1:])
+      _precompiled[key] = parse_pyc_string(bytecode[1:])
+
+
+def clear_precompiled():
+  _precompiled.clear()
+
+
 def parse_pyc_stream(fi):
   """Parse pyc data from a file.
 
@@ -121,7 +323,8 @@ class AdjustFilename(object):
     return code
 
 
-def compile_src(src, python_version, python_exe, filename=None, mode="exec"):
+def compile_src(src, python_version, python_exe, filename=None, mode="exec",
+                cache=None):
   """Compile a string to pyc, and then load and parse the pyc.
 
   Args:
@@ -130,13 +333,19 @@ def compile_src(src, python_version, python_exe, filename=None, mode="exec"):
     python_exe: Path to Python interpreter, or None.
     filename: The filename the sourcecode is from.
     mode: "exec", "eval" or "single".
+    cache: A BytecodeCache, or None.
 
   Returns:
     An instance of loadmarshal.CodeType.
   """
-  pyc_data = compile_src_string_to_pyc_string(
-      src, filename, python_version, python_exe, mode)
-  code = parse_pyc_string(pyc_data)
+  code = None
+  if _precompiled:
+    code = _precompiled.get(BytecodeCache.compute_key(
+        src, filename or "<string>", python_version, python_exe, mode))
+  if code is None:
+    pyc_data = compile_src_string_to_pyc_string(
+        src, filename, python_version, python_exe, mode, cache)
+    code = parse_pyc_string(pyc_data)
   assert code.python_version == python_version
   visit(code, AdjustFilename(filename))
   return code
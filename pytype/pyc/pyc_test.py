@@ -1,6 +1,11 @@
 """Tests for pyc.py."""
 
+import os
+import StringIO
 
+from pytype import metrics
+from pytype import utils
+from pytype.pyc import compile_bytecode
 from pytype.pyc import opcodes
 from pytype.pyc import pyc
 import unittest
@@ -70,6 +75,93 @@ class TestPyc(unittest.TestCase):
                        ("LOAD_CONST", 3),
                        ("RETURN_VALUE", 3)], op_and_line)
 
+  def test_compile_server_reused(self):
+    self._compile("a = 1")
+    exe = ("python2.7",)
+    server = pyc._compile_servers[(os.getpid(), exe)]  # pylint: disable=protected-access
+    process = server._process  # pylint: disable=protected-access
+    self._compile("b = 1")
+    self.assertIs(process, server._process)  # pylint: disable=protected-access
+
+  def test_compile_server_restart(self):
+    self._compile("a = 1")
+    exe = ("python2.7",)
+    server = pyc._compile_servers[(os.getpid(), exe)]  # pylint: disable=protected-access
+    server._process.kill()  # pylint: disable=protected-access
+    server._process.wait()  # pylint: disable=protected-access
+    code = self._compile("foobar = 3")
+    self.assertIn("foobar", code.co_names)
+
+  def test_bytecode_cache(self):
+    # pylint: disable=protected-access
+    metrics._prepare_for_test()
+    hits = pyc._bytecode_cache_hits
+    misses = pyc._bytecode_cache_misses
+    hits._reset()
+    misses._reset()
+    # pylint: enable=protected-access
+    with utils.Tempdir() as d:
+      cache = pyc.BytecodeCache(d["cache"], 1 << 20)
+      def compile_src(src, mode="exec"):
+        return pyc.compile_src_string_to_pyc_string(
+            src, "foo.py", self.python_version, None, mode, cache=cache)
+      data = compile_src("x = 1")
+      self.assertEquals(data, compile_src("x = 1"))
+      self.assertNotEquals(data, compile_src("x = 2"))
+      compile_src("x", mode="eval")
+      self.assertRaises(pyc.CompileError, compile_src, "x = (")
+      self.assertRaises(pyc.CompileError, compile_src, "x = (")
+    self.assertEquals("bytecode_cache_hits: 1", str(hits))
+    self.assertEquals("bytecode_cache_misses: 5", str(misses))
+
+  def test_precompile(self):
+    sources = [("a = 1", "a.py", "exec"), ("b = (", "b.py", "exec"),
+               ("c", "c.py", "eval")]
+    pyc.precompile(sources, self.python_version, None)
+    try:
+      code = pyc.compile_src("a = 1", self.python_version, None, "a.py")
+      self.assertIs(code, pyc.compile_src("a = 1", self.python_version, None,
+                                          "a.py"))
+      self.assertIn("a", code.co_names)
+      self.assertIn("c", pyc.compile_src("c", self.python_version, None,
+                                         "c.py", mode="eval").co_names)
+      self.assertRaises(pyc.CompileError, pyc.compile_src, "b = (",
+                        self.python_version, None, "b.py")
+    finally:
+      pyc.clear_precompiled()
+    self.assertIsNot(code, pyc.compile_src("a = 1", self.python_version, None,
+                                           "a.py"))
+
+  def test_compile_many(self):
+    server = pyc._CompileServer(["python2.7"])  # pylint: disable=protected-access
+    try:
+      results = server.compile_many([("x = %d" % i, "a.py", "exec")
+                                     for i in range(1000)] +
+                                    [("x = (", "b.py", "exec")])
+    finally:
+      server.close()
+    self.assertEquals(1001, len(results))
+    self.assertTrue(all(r[0] == "\0" for r in results[:1000]))
+    self.assertEquals("\1", results[1000][0])
+
+
+class TestCompileBytecode(unittest.TestCase):
+  """Tests for compile_bytecode.py."""
+
+  def test_serve(self):
+    requests = StringIO.StringIO()
+    for src in ("x = 1", "x = (", "x"):
+      for data in (src, "foo.py", "exec"):
+        compile_bytecode.write_frame(requests, data)
+    requests.seek(0)
+    responses = StringIO.StringIO()
+    compile_bytecode.serve(requests, responses)
+    responses.seek(0)
+    results = [compile_bytecode.read_frame(responses) for _ in range(3)]
+    self.assertEquals(["\0", "\1", "\0"], [r[0] for r in results])
+    self.assertIn("foo.py", results[1])
+    self.assertRaises(EOFError, compile_bytecode.read_frame, responses)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -5,22 +5,68 @@ and to model path-specific visibility of nested data structures.
 """
 
 
+import bisect
 import collections
+import resource
+import time
 
 
 from pytype import metrics
 from pytype.pytd import utils
 
 
-_solved_find_queries = {}
-_supernode_reachable = {}
+_variable_size_metric = metrics.Distribution("variable_size")
+_supernode_index_metric = metrics.MapCounter("cfg_supernode_index")
+_reachability_cache_metric = metrics.MapCounter("cfg_reachability_cache")
+_find_queries_size_metric = metrics.Distribution("cfg_find_queries_size")
+_supernode_queries_size_metric = metrics.Distribution(
+    "cfg_supernode_queries_size")
 
 
-_variable_size_metric = metrics.Distribution("variable_size")
+# How many CFG nodes we create, or how many goals the Solver tries, between two
+# checks of the time and memory budgets. Reading the clock and the memory usage
+# is too slow to do it every time.
+_BUDGET_CHECK_INTERVAL = 128
+
+# Programs with more supernodes than this don't get a _SupernodeIndex. The
+# index needs about n*n/16 bytes for n supernodes.
+_MAX_INDEXED_SUPERNODES = 20000
+
+# How many answers of _FindNodeBackwards and _FindSupernodeBackwards a Solver
+# remembers. An answer of the latter holds a set of supernodes, so we keep
+# fewer of those.
+_MAX_FIND_QUERIES = 100000
+_MAX_SUPERNODE_QUERIES = 10000
 
 
 class ProgramTooComplexError(Exception):
-  """Thrown if we determine that something in our program is too complex."""
+  """Thrown if we determine that something in our program is too complex.
+
+  Attributes:
+    budget: Which limit the program exceeded. One of "variable_size",
+      "cfg_nodes", "time" and "memory".
+  """
+
+  def __init__(self, budget="variable_size"):
+    super(ProgramTooComplexError, self).__init__(
+        "Exceeded the %s budget" % budget)
+    self.budget = budget
+
+
+def GetMemoryUsage():
+  """Return the resident set size of this process, in bytes.
+
+  Returns:
+    The size, or None if we can't determine it (e.g. because we're not on
+    Linux). The peak size, which getrusage knows everywhere, is no substitute:
+    It never goes down, so it would count memory that was used and freed before
+    a budget was set.
+  """
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * resource.getpagesize()
+  except (IOError, IndexError, ValueError):
+    return None
 
 
 class Program(object):
@@ -34,6 +80,8 @@ class Program(object):
     entrypoint: Entrypoint of the program, if it has one. (None otherwise)
     cfg_nodes: CFG nodes in use. Will be used for assigning node IDs.
     variables: Variables in use. Will be used for assigning variable IDs.
+    num_bindings: The number of bindings created so far.
+    supernode_index: A _SupernodeIndex, or None. Set by Freeze.
   """
 
   def __init__(self, abort_on_complex=False):
@@ -41,15 +89,80 @@ class Program(object):
     self.entrypoint = None
     self.cfg_nodes = []
     self.next_variable_id = 0
+    self.num_bindings = 0
     self.solver = None
+    self.supernode_index = None
     self.abort_on_complex = abort_on_complex
+    self.max_cfg_nodes = None
+    self.deadline = None
+    self.max_memory = None
+    self.widen_size = None
+    self.widen_data = None
+
+  def SetBudget(self, max_cfg_nodes=None, max_seconds=None, max_memory=None,
+                deadline=None):
+    """Limit how much more work we do on this program.
+
+    Once a limit is exceeded, NewCFGNode and the Solver raise
+    ProgramTooComplexError. The limits only apply to the work done after this
+    call.
+
+    Args:
+      max_cfg_nodes: How many more CFG nodes we may create, or None.
+      max_seconds: How many seconds of wall-clock time we may use, or None.
+      max_memory: By how many bytes the resident set size of the process may
+        grow, or None. Ignored if we can't measure it (see GetMemoryUsage).
+      deadline: The time.time() by which we have to be done, or None. Takes
+        precedence over max_seconds.
+    """
+    if max_cfg_nodes is not None:
+      self.max_cfg_nodes = len(self.cfg_nodes) + max_cfg_nodes
+    if deadline is not None:
+      self.deadline = deadline
+    elif max_seconds is not None:
+      self.deadline = time.time() + max_seconds
+    self.max_memory = None
+    if max_memory is not None:
+      baseline = GetMemoryUsage()
+      if baseline is not None:
+        self.max_memory = baseline + max_memory
+
+  def WidenLargeVariables(self, max_size, data):
+    """Stop variables from growing beyond max_size bindings.
+
+    After this call, adding a binding to a variable that already has max_size
+    bindings adds a binding for "data" instead. "data" should be something
+    that stands for any value, like an unsolvable.
+
+    Args:
+      max_size: The maximum number of bindings of a variable.
+      data: The data to use instead of the data of the new bindings.
+    """
+    self.widen_size = max_size
+    self.widen_data = data
 
   def NewCFGNode(self, name=None):
     """Start a new CFG node."""
     cfg_node = CFGNode(self, name, len(self.cfg_nodes))
     self.cfg_nodes.append(cfg_node)
+    self._CheckBudget()
     return cfg_node
 
+  def _CheckBudget(self):
+    """Raise an error if we have exceeded the limits from SetBudget."""
+    num_nodes = len(self.cfg_nodes)
+    if self.max_cfg_nodes is not None and num_nodes > self.max_cfg_nodes:
+      raise ProgramTooComplexError("cfg_nodes")
+    if num_nodes % _BUDGET_CHECK_INTERVAL == 0:
+      self.CheckTimeAndMemory()
+
+  def CheckTimeAndMemory(self):
+    """Raise an error if we have exceeded the time or memory from SetBudget."""
+    if self.deadline is not None and time.time() > self.deadline:
+      raise ProgramTooComplexError("time")
+    if self.max_memory is not None and GetMemoryUsage() > self.max_memory:
+      raise ProgramTooComplexError("memory")
+
   @property
   def variables(self):
     return {b.variable for node in self.cfg_nodes for b in node.bindings}
@@ -93,9 +206,21 @@ class Program(object):
     """
     assert self.entrypoint
     self._CompressGraph()
+    heads = utils.OrderedSet(node.supernode[0] for node in self.cfg_nodes)
+    if len(heads) <= _MAX_INDEXED_SUPERNODES:
+      self.supernode_index = _SupernodeIndex(heads)
     self.solver = Solver(self)
     self.NewCFGNode = utils.disabled_function  # pylint: disable=invalid-name
 
+  def ClearCaches(self):
+    """Forget the answers the solver memoized, to release their memory.
+
+    Call this when the program won't be solved anymore. Solving still works
+    afterwards, it just has to compute everything again.
+    """
+    if self.solver:
+      self.solver.ClearCaches()
+
   def MergeVariables(self, node, name, variables):
     """Create a combined Variable for a list of variables.
 
@@ -166,7 +291,149 @@ class Program(object):
       # seconds, it was 7. Additionally, for 99% of files, the largest variable
       # was below 64, so we use that as the cutoff.
       if var_size >= 64:
-        raise ProgramTooComplexError()
+        raise ProgramTooComplexError("variable_size")
+
+
+class _SupernodeIndex(object):
+  """Which supernodes can be reached from which, going backwards.
+
+  This is the transitive closure of the graph of supernodes (see
+  Program._CompressGraph), with the edges reversed. We number the strongly
+  connected components of the graph so that a component only reaches
+  components with smaller numbers, and store, for every component, the
+  components it reaches as the bits of an int.
+  """
+
+  def __init__(self, heads):
+    """Build the index.
+
+    Arguments:
+      heads: The first node of every supernode of a frozen program.
+    """
+    self._component = {}  # Maps a head to the number of its component.
+    # Maps a component number to the components it reaches.
+    self._reachable = []
+    incoming = {head: {node.supernode[0] for node in head.incoming}
+                for head in heads}
+    # Tarjan's algorithm, without recursion. It finds a component only after
+    # all the components it reaches, so we can number them in that order.
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    for root in heads:
+      if root in index:
+        continue
+      index[root] = lowlink[root] = len(index)
+      stack.append(root)
+      on_stack.add(root)
+      work = [(root, iter(incoming[root]))]
+      while work:
+        node, it = work[-1]
+        for prev in it:
+          if prev not in index:
+            index[prev] = lowlink[prev] = len(index)
+            stack.append(prev)
+            on_stack.add(prev)
+            work.append((prev, iter(incoming[prev])))
+            break
+          elif prev in on_stack:
+            lowlink[node] = min(lowlink[node], index[prev])
+        else:
+          work.pop()
+          if work:
+            parent = work[-1][0]
+            lowlink[parent] = min(lowlink[parent], lowlink[node])
+          if lowlink[node] == index[node]:
+            members = []
+            while not members or members[-1] is not node:
+              members.append(stack.pop())
+              on_stack.remove(members[-1])
+            self._AddComponent(members, incoming)
+
+  def _AddComponent(self, members, incoming):
+    """Number a component, and compute the components it reaches."""
+    number = len(self._reachable)
+    for head in members:
+      self._component[head] = number
+    reachable = 0
+    for head in members:
+      for prev in incoming[head]:
+        prev_number = self._component[prev]
+        if prev_number == number:
+          # A cycle. Every member of the component reaches every member.
+          reachable |= 1 << number
+        else:
+          reachable |= (1 << prev_number) | self._reachable[prev_number]
+    self._reachable.append(reachable)
+
+  def Reaches(self, start, finish):
+    """Whether finish can be found from start's incoming nodes."""
+    reachable = self._reachable[self._component[start]]
+    return bool(reachable >> self._component[finish] & 1)
+
+  def FindSupernodeBackwards(self, start, finish, blocked_supernodes):
+    """Answer a query of _FindSupernodeBackwards, if the index suffices.
+
+    Arguments:
+      start: The first node in the supernode we're starting from.
+      finish: The first node in the supernode we're looking for.
+      blocked_supernodes: A set of the first node in every blocked supernode.
+
+    Returns:
+      True or False, like _FindSupernodeBackwards, or None if a blocked
+      supernode is on a path from start to finish, in which case only
+      traversing the graph can tell.
+    """
+    if not self.Reaches(start, finish):
+      return False
+    for node in blocked_supernodes:
+      if (node is not finish and self.Reaches(start, node) and
+          self.Reaches(node, finish)):
+        return None
+    return True
+
+
+class _Chain(object):
+  """A sequence of CFG nodes, each one connected to the next.
+
+  A node that is connected to a node without any other connections, like the
+  new node of CFGNode.ConnectNew, extends the chain of the first node if it is
+  the last one. So straight-line code is a single chain, and its nodes share
+  the information about which nodes are reachable from them, going backwards:
+  A node reaches the nodes before it in its chain, the nodes connected to those
+  nodes, and so on.
+
+  The only incoming connection of a node without joins (see below) is the node
+  before it in the chain, so that node is its immediate dominator. Between two
+  joins, a chain is a sequence of nodes each dominating the next one, which is
+  what Variable.Bindings uses to skip over them.
+
+  Attributes:
+    nodes: The nodes in the chain, in order.
+    joins: A dictionary mapping a position in this chain to a list of
+      (chain, chain_position) tuples. Each one means that the node at
+      chain_position in chain was connected to the node at the position in this
+      chain (except for the connections within the chain).
+    join_positions: The keys of joins, sorted.
+  """
+  __slots__ = ("nodes", "joins", "join_positions")
+
+  def __init__(self, node):
+    self.nodes = [node]
+    self.joins = {}
+    self.join_positions = []
+
+  def AddJoin(self, position, chain, chain_position):
+    if position not in self.joins:
+      self.joins[position] = []
+      bisect.insort(self.join_positions, position)
+    self.joins[position].append((chain, chain_position))
+
+  def LastJoin(self, position):
+    """The highest position <= the given one that has joins, or -1."""
+    i = bisect.bisect_right(self.join_positions, position)
+    return self.join_positions[i - 1] if i else -1
 
 
 class CFGNode(object):
@@ -183,14 +450,14 @@ class CFGNode(object):
     incoming: Other CFGNodes that are connected to this node.
     outgoing: CFGNodes we connect to.
     bindings: Bindings that are being assigned to Variables at this CFGNode.
-    reachable_subset: A subset of the nodes reachable (going backwards) from
-      this one.
+    chain: The _Chain this node belongs to.
+    chain_position: This node's position in its chain.
     supernode: A list of nodes comprising a "supernode" to which this one
       belongs. See Program._CompressGraph.
     position: This node's position in the supernode.
   """
   __slots__ = ("program", "id", "name", "incoming", "outgoing", "bindings",
-               "reachable_subset", "supernode", "position")
+               "chain", "chain_position", "supernode", "position")
 
   def __init__(self, program, name, cfgnode_id):
     """Initialize a new CFG node. Called from Program.NewCFGNode."""
@@ -200,7 +467,8 @@ class CFGNode(object):
     self.incoming = set()
     self.outgoing = set()
     self.bindings = set()  # filled through RegisterBinding()
-    self.reachable_subset = {self}
+    self.chain = _Chain(self)
+    self.chain_position = 0
     self.supernode = None
     self.position = None
 
@@ -212,9 +480,57 @@ class CFGNode(object):
 
   def ConnectTo(self, cfg_node):
     """Connect this node to an existing node."""
+    # A node that already has bindings stays in its own chain, since the
+    # Variables index their bindings by chain position.
+    if (not cfg_node.incoming and not cfg_node.outgoing and
+        not cfg_node.bindings and cfg_node is not self and
+        self.chain_position == len(self.chain.nodes) - 1):
+      cfg_node.chain = self.chain
+      cfg_node.chain_position = len(self.chain.nodes)
+      self.chain.nodes.append(cfg_node)
+    else:
+      cfg_node.chain.AddJoin(
+          cfg_node.chain_position, self.chain, self.chain_position)
     self.outgoing.add(cfg_node)
     cfg_node.incoming.add(self)
-    cfg_node.reachable_subset |= self.reachable_subset
+
+  def MayReachAny(self, nodes):
+    """Whether one of the nodes is known to be reachable, going backwards.
+
+    This only knows about the connections that were made to a node's chain, so
+    if a node gets a new incoming connection, the nodes in other chains that
+    were connected to it before don't learn about it. That makes this fast
+    enough for the shortcut in Variable.Bindings.
+
+    Arguments:
+      nodes: A collection of CFG nodes.
+
+    Returns:
+      True if one of the nodes is this node or reachable from it. If False,
+      one of them might still be reachable.
+    """
+    # Maps a chain to the lowest position of one of the nodes in it.
+    targets = {}
+    for node in nodes:
+      if targets.get(node.chain, node.chain_position) >= node.chain_position:
+        targets[node.chain] = node.chain_position
+    # Maps a chain to the highest position we reached in it.
+    reached = {}
+    stack = [(self.chain, self.chain_position)]
+    while stack:
+      chain, position = stack.pop()
+      previous = reached.get(chain, -1)
+      if previous >= position:
+        continue
+      reached[chain] = position
+      if targets.get(chain, position + 1) <= position:
+        return True
+      join_positions = chain.join_positions
+      for join_at in join_positions[
+          bisect.bisect_right(join_positions, previous):
+          bisect.bisect_right(join_positions, position)]:
+        stack.extend(chain.joins[join_at])
+    return False
 
   def HasCombination(self, bindings):
     """Query whether a combination is possible.
@@ -378,7 +694,7 @@ class Variable(object):
   and the dict.
   """
   __slots__ = ("program", "name", "id", "bindings", "_data_id_to_binding",
-               "_cfgnode_to_bindings", "_callbacks")
+               "_cfgnode_to_bindings", "_chain_to_positions", "_callbacks")
 
   def __init__(self, program, name, variable_id):
     """Initialize a new Variable. Called through Program.NewVariable."""
@@ -388,6 +704,9 @@ class Variable(object):
     self.bindings = []
     self._data_id_to_binding = {}
     self._cfgnode_to_bindings = collections.defaultdict(set)
+    # Maps a _Chain to the sorted positions of the nodes in it that assign this
+    # variable.
+    self._chain_to_positions = {}
     self._callbacks = []
 
   def __repr__(self):
@@ -411,27 +730,42 @@ class Variable(object):
       A filtered list of bindings for this variable.
     """
     num_bindings = len(self.bindings)
-    if (len(self._cfgnode_to_bindings) == 1 or num_bindings == 1) and any(
-        n in viewpoint.reachable_subset for n in self._cfgnode_to_bindings):
+    if ((len(self._cfgnode_to_bindings) == 1 or num_bindings == 1) and
+        viewpoint.MayReachAny(self._cfgnode_to_bindings)):
       return self.bindings
+    # Walk the CFG backwards, a chain segment at a time: Going backwards from a
+    # node, we pass through the nodes before it in its chain until we reach
+    # either a node that assigns this variable or a node with joins.
     result = set()
     seen = set()
-    stack = [viewpoint]
+    stack = [(viewpoint.chain, viewpoint.chain_position)]
     while stack:
       if len(result) == num_bindings:
         break
-      node = stack.pop()
-      seen.add(node)
-      # _cfgnode_to_bindings is a defaultdict, so don't use "get"
-      if node in self._cfgnode_to_bindings:
-        bindings = self._cfgnode_to_bindings[node]
+      chain, position = stack.pop()
+      positions = self._chain_to_positions.get(chain)
+      if positions:
+        i = bisect.bisect_right(positions, position)
+        assignment = positions[i - 1] if i else -1
+      else:
+        assignment = -1
+      stop = max(assignment, chain.LastJoin(position))
+      if stop < 0:
+        # We reached the start of a chain without any incoming connections.
+        continue
+      if (chain, stop) in seen:
+        continue
+      seen.add((chain, stop))
+      if stop == assignment:
+        bindings = self._cfgnode_to_bindings[chain.nodes[stop]]
         assert bindings, "empty binding list"
         result.update(bindings)
         # Don't expand this node - previous assignments to this variable will
         # be invisible, since they're overwritten here.
         continue
-      else:
-        stack.extend(set(node.incoming) - seen)
+      if stop:
+        stack.append((chain, stop - 1))
+      stack.extend(chain.joins[stop])
     return result
 
   def Data(self, viewpoint):
@@ -450,18 +784,24 @@ class Variable(object):
     Returns:
       A filtered list of bindings for this variable.
     """
-    return [b for b in self.bindings if b.IsVisible(viewpoint)]
+    visible, = self.program.solver.FilterMany([self], viewpoint)
+    return visible
 
   def FilteredData(self, viewpoint):
     """Like Filter(viewpoint), but only return the data."""
-    return [b.data for b in self.bindings if b.IsVisible(viewpoint)]
+    return [b.data for b in self.Filter(viewpoint)]
 
   def _FindOrAddBinding(self, data):
     """Add a new binding if necessary, otherwise return existing binding."""
     try:
       binding = self._data_id_to_binding[id(data)]
     except KeyError:
+      if (self.program.widen_size is not None and
+          len(self.bindings) >= self.program.widen_size and
+          data is not self.program.widen_data):
+        return self._FindOrAddBinding(self.program.widen_data)
       binding = Binding(self.program, self, data)
+      self.program.num_bindings += 1
       self.bindings.append(binding)
       self._data_id_to_binding[id(data)] = binding
       for callback in self._callbacks:
@@ -529,6 +869,10 @@ class Variable(object):
     return new_variable
 
   def RegisterBindingAtNode(self, binding, node):
+    # _cfgnode_to_bindings is a defaultdict, so don't use "get"
+    if node not in self._cfgnode_to_bindings:
+      bisect.insort(self._chain_to_positions.setdefault(node.chain, []),
+                    node.chain_position)
     self._cfgnode_to_bindings[node].add(binding)
 
   def RegisterChangeListener(self, callback):
@@ -661,75 +1005,64 @@ class State(object):
     return not self == other
 
 
-def _FindNodeBackwards(start, finish, blocked):
-  """Determine whether we can reach a CFG node, going backwards.
+class _BoundedCache(object):
+  """A cache that keeps about the max_size most recently used entries.
 
-  Traverse the CFG from a starting point to find a given node, but avoid any
-  nodes marked as "blocked".
+  New entries go into a young generation. When that is full, it becomes the
+  old generation, and the previous old generation is forgotten. Looking up an
+  entry of the old generation moves it back into the young one. This
+  approximates a least-recently-used cache, at the speed of a dictionary.
+  """
 
-  Arguments:
-    start: Start node.
-    finish: Node we're looking for.
-    blocked: A set of blocked nodes. We do not consider start or finish to be
-      blocked even if they apppear in this set.
+  __slots__ = ("_hit_key", "_miss_key", "_evicted_key", "_max_size",
+               "_size_metric", "_young", "_old")
 
-  Returns:
-    True if we can find this node, False otherwise.
-  """
-  query = (start, finish, blocked)
-  if query in _solved_find_queries:
-    return _solved_find_queries[query]
-  if start.supernode is finish.supernode and start.position >= finish.position:
-    # There is exactly one path from start to finish. Check whether any node in
-    # it is blocked.
-    if blocked.intersection(start.supernode[finish.position+1:start.position]):
-      found = False
-    else:
-      found = True
-  elif blocked.intersection(
-      start.supernode[:start.position] + finish.supernode[finish.position+1:]):
-    # A node that must be passed through to get from start to finish is blocked.
-    found = False
-  else:
-    found = _FindSupernodeBackwards(start.supernode[0], finish.supernode[0],
-                                    frozenset(node.supernode[0]
-                                              for node in blocked))
-  _solved_find_queries[query] = found
-  return found
-
-
-def _FindSupernodeBackwards(start, finish, blocked_supernodes):
-  """Determine whether we can reach a supernode, going backwards.
-
-  Arguments:
-    start: The first node in the supernode we're starting from.
-    finish: The first node in the supernode we're looking for.
-    blocked_supernodes: A set of the first node in every blocked supernode.
+  def __init__(self, name, max_size, size_metric):
+    """Initialize.
 
-  Returns:
-    True if we can find finish from any of start's *incoming nodes*, False
-    otherwise. This means that if start and finish are in the same supernode,
-    we must find a path from the supernode back to itself.
-  """
-  query = (start, blocked_supernodes)
-  if query in _supernode_reachable:
-    return finish in _supernode_reachable[query]
-  stack = list(start.incoming)
-  seen = set()
-  while stack:
-    node = stack.pop().supernode[0]
-    if node is finish:
-      return True
-    if node in seen:
-      continue
-    seen.add(node)
-    if node in blocked_supernodes:
-      continue
-    stack.extend(node.incoming)
-  # If we haven't found finish, then the seen set contains all of the nodes
-  # reachable from start.
-  _supernode_reachable[query] = seen
-  return False
+    Arguments:
+      name: The name of the cache, for the metrics.
+      max_size: The maximum number of entries.
+      size_metric: A metrics.Distribution for the size of the cache when it is
+        cleared.
+    """
+    # The keys for _reachability_cache_metric. Lookups are frequent, so we
+    # don't want to build them every time.
+    self._hit_key = name + "_hit"
+    self._miss_key = name + "_miss"
+    self._evicted_key = name + "_evicted"
+    self._max_size = max_size
+    self._size_metric = size_metric
+    self._young = {}
+    self._old = {}
+
+  def __len__(self):
+    return len(self._young) + len(self._old)
+
+  def Get(self, key):
+    """Return the entry for key, or None."""
+    value = self._young.get(key)
+    if value is None:
+      value = self._old.pop(key, None)
+      if value is None:
+        _reachability_cache_metric.inc(self._miss_key)
+        return None
+      self.Put(key, value)
+    _reachability_cache_metric.inc(self._hit_key)
+    return value
+
+  def Put(self, key, value):
+    """Add an entry. The value must not be None."""
+    if len(self._young) >= self._max_size // 2:
+      _reachability_cache_metric.inc(self._evicted_key, len(self._old))
+      self._old = self._young
+      self._young = {}
+    self._young[key] = value
+
+  def Clear(self):
+    self._size_metric.add(len(self))
+    self._young = {}
+    self._old = {}
 
 
 class Solver(object):
@@ -750,6 +1083,18 @@ class Solver(object):
     """
     self.program = program
     self._solved_states = {}
+    self._num_goals = 0  # For checking the budgets, see _FindSolutionForGoal.
+    self._find_queries = _BoundedCache(
+        "find_queries", _MAX_FIND_QUERIES, _find_queries_size_metric)
+    self._supernode_queries = _BoundedCache(
+        "supernode_queries", _MAX_SUPERNODE_QUERIES,
+        _supernode_queries_size_metric)
+
+  def ClearCaches(self):
+    """Forget all memoized answers. See Program.ClearCaches."""
+    self._solved_states = {}
+    self._find_queries.Clear()
+    self._supernode_queries.Clear()
 
   def Solve(self, start_attrs, start_node):
     """Try to solve the given problem.
@@ -770,6 +1115,51 @@ class Solver(object):
     state = State(start_node, start_attrs)
     return self._RecallOrFindSolution(state)
 
+  def FilterMany(self, variables, viewpoint):
+    """Filter the bindings of many variables at the same CFG node.
+
+    This gives the same results as calling Binding.IsVisible for every binding,
+    but computes the blocked nodes only once per variable, and which origins
+    can be reached from the viewpoint only once per origin.
+
+    Arguments:
+      variables: A sequence of Variables.
+      viewpoint: The CFG node at which to determine the visible bindings.
+
+    Returns:
+      A list with a list of the visible bindings of each variable, in the
+      order of Variable.bindings.
+    """
+    result = []
+    # Maps origin nodes to whether they can be reached from the viewpoint, for
+    # the blocked nodes of the variable we're filtering.
+    reachable = {}
+    for variable in variables:
+      visible = []
+      blocked = None  # The same for all bindings of the variable.
+      for binding in variable.bindings:
+        state = State(viewpoint, [binding])
+        if state in self._solved_states:
+          Solver._cache_metric.inc("hit")
+          if self._solved_states[state]:
+            visible.append(binding)
+          continue
+        Solver._cache_metric.inc("miss")
+        # See _RecallOrFindSolution.
+        self._solved_states[state] = True
+        if blocked is None:
+          blocked = variable.nodes
+          blocked.discard(viewpoint)
+          blocked = frozenset(blocked)
+          reachable.clear()
+        Solver._goals_per_find_metric.add(1)
+        found = self._solved_states[state] = self._FindSolutionForGoal(
+            state, binding, blocked, reachable)
+        if found:
+          visible.append(binding)
+      result.append(visible)
+    return result
+
   def _RecallOrFindSolution(self, state):
     """Memoized version of FindSolution()."""
     if state in self._solved_states:
@@ -803,17 +1193,126 @@ class Solver(object):
     # treat CFGs as DAGs, there's typically one unique cfg node with this
     # property.
     for goal in state.goals:
-      # "goal" is the assignment we're trying to find.
-      for origin in goal.origins:
-        if _FindNodeBackwards(state.pos, origin.where, blocked):
-          # This loop over multiple different combinations of origins is why
-          # we need memoization of states.
-          for source_set in origin.source_sets:
-            new_state = State(origin.where, state.goals)
-            new_state.Replace(goal, source_set)
-            # Also remove all goals that are trivially fulfilled at the
-            # new CFG node.
-            new_state.RemoveFinishedGoals()
-            if self._RecallOrFindSolution(new_state):
-              return True
+      if self._FindSolutionForGoal(state, goal, blocked):
+        return True
+    return False
+
+  def _FindSolutionForGoal(self, state, goal, blocked, reachable=None):
+    """Try to solve a state by going back to where a goal was assigned.
+
+    Arguments:
+      state: The State to solve.
+      goal: One of the goals of the state, i.e., an assignment we're trying
+        to find.
+      blocked: The nodes that assign any of the goal variables.
+      reachable: Optionally, a dictionary for memoizing _FindNodeBackwards for
+        this state's position and blocked nodes.
+
+    Returns:
+      True if we found a solution, False otherwise.
+    """
+    self._num_goals += 1
+    if self._num_goals % _BUDGET_CHECK_INTERVAL == 0:
+      self.program.CheckTimeAndMemory()
+    for origin in goal.origins:
+      if reachable is None:
+        found = self._FindNodeBackwards(state.pos, origin.where, blocked)
+      else:
+        found = reachable.get(origin.where)
+        if found is None:
+          found = reachable[origin.where] = self._FindNodeBackwards(
+              state.pos, origin.where, blocked)
+      if found:
+        # This loop over multiple different combinations of origins is why
+        # we need memoization of states.
+        for source_set in origin.source_sets:
+          new_state = State(origin.where, state.goals)
+          new_state.Replace(goal, source_set)
+          # Also remove all goals that are trivially fulfilled at the
+          # new CFG node.
+          new_state.RemoveFinishedGoals()
+          if self._RecallOrFindSolution(new_state):
+            return True
+    return False
+
+  def _FindNodeBackwards(self, start, finish, blocked):
+    """Determine whether we can reach a CFG node, going backwards.
+
+    Traverse the CFG from a starting point to find a given node, but avoid any
+    nodes marked as "blocked".
+
+    Arguments:
+      start: Start node.
+      finish: Node we're looking for.
+      blocked: A set of blocked nodes. We do not consider start or finish to be
+        blocked even if they apppear in this set.
+
+    Returns:
+      True if we can find this node, False otherwise.
+    """
+    query = (start, finish, blocked)
+    found = self._find_queries.Get(query)
+    if found is not None:
+      return found
+    if (start.supernode is finish.supernode and
+        start.position >= finish.position):
+      # There is exactly one path from start to finish. Check whether any node
+      # in it is blocked.
+      if blocked.intersection(
+          start.supernode[finish.position+1:start.position]):
+        found = False
+      else:
+        found = True
+    elif blocked.intersection(
+        start.supernode[:start.position] +
+        finish.supernode[finish.position+1:]):
+      # A node that must be passed through to get from start to finish is
+      # blocked.
+      found = False
+    else:
+      found = self._FindSupernodeBackwards(
+          start.supernode[0], finish.supernode[0],
+          frozenset(node.supernode[0] for node in blocked))
+    self._find_queries.Put(query, found)
+    return found
+
+  def _FindSupernodeBackwards(self, start, finish, blocked_supernodes):
+    """Determine whether we can reach a supernode, going backwards.
+
+    Arguments:
+      start: The first node in the supernode we're starting from.
+      finish: The first node in the supernode we're looking for.
+      blocked_supernodes: A set of the first node in every blocked supernode.
+
+    Returns:
+      True if we can find finish from any of start's *incoming nodes*, False
+      otherwise. This means that if start and finish are in the same supernode,
+      we must find a path from the supernode back to itself.
+    """
+    index = self.program.supernode_index
+    if index:
+      found = index.FindSupernodeBackwards(start, finish, blocked_supernodes)
+      if found is not None:
+        _supernode_index_metric.inc("answered")
+        return found
+      _supernode_index_metric.inc("blocked")
+    query = (start, blocked_supernodes)
+    reachable = self._supernode_queries.Get(query)
+    if reachable is not None:
+      return finish in reachable
+    stack = list(start.incoming)
+    seen = set()
+    while stack:
+      node = stack.pop().supernode[0]
+      if node is finish:
+        return True
+      if node in seen:
+        continue
+      seen.add(node)
+      if node in blocked_supernodes:
+        continue
+      stack.extend(node.incoming)
+    # If we haven't found finish, then the seen set contains all of the nodes
+    # reachable from start.
+    self._supernode_queries.Put(query, seen)
     return False
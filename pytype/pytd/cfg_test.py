@@ -1,5 +1,8 @@
 """Test for the cfg Python extension module."""
 
+import random
+
+from pytype import metrics
 from pytype.pytd import cfg
 import unittest
 
@@ -459,5 +462,267 @@ class CFGTest(unittest.TestCase):
     x.AddBinding("c")
     self.assertListEqual(counters, [2, 2])
 
+  def testCfgNodeBudget(self):
+    p = cfg.Program()
+    p.NewCFGNode("root")
+    p.SetBudget(max_cfg_nodes=2)
+    p.NewCFGNode("n1")
+    p.NewCFGNode("n2")
+    try:
+      p.NewCFGNode("n3")
+    except cfg.ProgramTooComplexError as e:
+      self.assertEquals("cfg_nodes", e.budget)
+    else:
+      self.fail("Expected ProgramTooComplexError")
+
+  def testTimeBudget(self):
+    p = cfg.Program()
+    p.SetBudget(max_seconds=1e-6)
+    p.deadline = 0  # Make sure the deadline has passed.
+    with self.assertRaises(cfg.ProgramTooComplexError) as cm:
+      for _ in range(cfg._BUDGET_CHECK_INTERVAL):  # pylint: disable=protected-access
+        p.NewCFGNode()
+    self.assertEquals("time", cm.exception.budget)
+
+  def testSolverTimeBudget(self):
+    p = cfg.Program()
+    n0 = node = p.NewCFGNode("n0")
+    binding = p.NewVariable("x0").AddBinding("x0", [], node)
+    for i in range(1, 2 * cfg._BUDGET_CHECK_INTERVAL):  # pylint: disable=protected-access
+      node = node.ConnectNew("n%d" % i)
+      binding = p.NewVariable("x%d" % i).AddBinding("x%d" % i, [binding],
+                                                   node)
+    self._Freeze(p, entrypoint=n0)
+    p.SetBudget(deadline=0)
+    with self.assertRaises(cfg.ProgramTooComplexError) as cm:
+      node.HasCombination([binding])
+    self.assertEquals("time", cm.exception.budget)
+
+  def testMemoryBudgetIsGrowth(self):
+    if cfg.GetMemoryUsage() is None:
+      self.skipTest("Can't measure memory usage on this platform")
+    p = cfg.Program()
+    p.SetBudget(max_memory=1 << 30)
+    self.assertGreater(p.max_memory, cfg.GetMemoryUsage())
+    # Creating nodes doesn't allocate a GB, so this stays within the budget.
+    for _ in range(cfg._BUDGET_CHECK_INTERVAL):  # pylint: disable=protected-access
+      p.NewCFGNode()
+
+  def testWidenLargeVariables(self):
+    p = cfg.Program()
+    x = p.NewVariable("x")
+    x.AddBinding("a")
+    p.WidenLargeVariables(2, "any")
+    x.AddBinding("b")
+    x.AddBinding("c")
+    x.AddBinding("d")
+    x.AddBinding("a")
+    self.assertItemsEqual(["a", "b", "any"], x.data)
+
+  def testSupernodeIndex(self):
+    #   n0 -> n1 -> n2 -> n3 -> n4 -> n5
+    #         ^           |
+    #         +-----------+
+    p = cfg.Program()
+    n0 = p.NewCFGNode("n0")
+    n1 = n0.ConnectNew("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    n3.ConnectTo(n1)
+    n4 = n3.ConnectNew("n4")
+    n5 = n4.ConnectNew("n5")
+    self._Freeze(p, entrypoint=n0)
+    self.assertEquals([n0], n0.supernode)
+    self.assertEquals([n1, n2, n3], n1.supernode)
+    self.assertEquals([n4, n5], n4.supernode)
+    index = p.supernode_index
+    self.assertTrue(index.Reaches(n4, n0))
+    self.assertTrue(index.Reaches(n1, n1))  # through the loop
+    self.assertFalse(index.Reaches(n0, n0))
+    self.assertFalse(index.Reaches(n0, n4))
+    self.assertTrue(index.FindSupernodeBackwards(n4, n0, frozenset()))
+    self.assertTrue(index.FindSupernodeBackwards(n4, n0, frozenset([n4])))
+    self.assertIsNone(index.FindSupernodeBackwards(n4, n0, frozenset([n1])))
+    self.assertFalse(index.FindSupernodeBackwards(n0, n4, frozenset()))
+
+  def testSupernodeIndexMatchesTraversal(self):
+    # Compare the answers of the index to traversing a random graph.
+    rand = random.Random(0)
+    p = cfg.Program()
+    nodes = [p.NewCFGNode()]
+    for _ in range(60):
+      nodes.append(rand.choice(nodes).ConnectNew())
+    for _ in range(20):
+      rand.choice(nodes).ConnectTo(rand.choice(nodes))
+    self._Freeze(p, entrypoint=nodes[0])
+    index = p.supernode_index
+    heads = list({node.supernode[0] for node in nodes})
+    for _ in range(500):
+      start, finish = rand.choice(heads), rand.choice(heads)
+      blocked = frozenset(rand.sample(heads, rand.randint(0, 3)))
+      found = index.FindSupernodeBackwards(start, finish, blocked)
+      if found is not None:
+        p.supernode_index = None
+        p.ClearCaches()
+        self.assertEquals(found, p.solver._FindSupernodeBackwards(  # pylint: disable=protected-access
+            start, finish, blocked))
+        p.supernode_index = index
+
+  def testMayReachAny(self):
+    #   n1 -> n2 -> n4 -> n5
+    #    |          ^
+    #    +--> n3 ---+
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n1.ConnectNew("n3")
+    n4 = n2.ConnectNew("n4")
+    n3.ConnectTo(n4)
+    n5 = n4.ConnectNew("n5")
+    # Straight-line code shares a chain.
+    self.assertIs(n1.chain, n5.chain)
+    self.assertIsNot(n1.chain, n3.chain)
+    self.assertTrue(n5.MayReachAny([n1]))
+    self.assertTrue(n5.MayReachAny([n3]))
+    self.assertTrue(n4.MayReachAny([n3, n5]))
+    self.assertTrue(n3.MayReachAny([n3]))
+    self.assertFalse(n2.MayReachAny([n3]))
+    self.assertFalse(n3.MayReachAny([n2, n4]))
+    self.assertFalse(n1.MayReachAny([n5]))
+    x = p.NewVariable("x")
+    x.AddBinding("a", source_set=[], where=n3)
+    self.assertEquals(["a"], [b.data for b in x.Bindings(n5)])
+    self.assertEquals([], list(x.Bindings(n2)))
+
+  def testMayReachAnyLoop(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    n3.ConnectTo(n2)
+    n4 = n3.ConnectNew("n4")
+    self.assertTrue(n2.MayReachAny([n3]))
+    self.assertTrue(n4.MayReachAny([n1]))
+    self.assertFalse(n1.MayReachAny([n4]))
+
+  def testBindingsInChain(self):
+    #   n1 -> n2 -> n3 -> n4 -> n5
+    #                ^     |
+    #                +-----+
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    n4 = n3.ConnectNew("n4")
+    n4.ConnectTo(n3)
+    n5 = n4.ConnectNew("n5")
+    x = p.NewVariable("x")
+    x1 = x.AddBinding(1, source_set=[], where=n1)
+    x4 = x.AddBinding(4, source_set=[], where=n4)
+    x5 = x.AddBinding(5, source_set=[], where=n5)
+    self.assertItemsEqual([x1], x.Bindings(n2))
+    self.assertItemsEqual([x1, x4], x.Bindings(n3))
+    self.assertItemsEqual([x4], x.Bindings(n4))
+    self.assertItemsEqual([x5], x.Bindings(n5))
+
+  def testBindingsBeforeConnecting(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = p.NewCFGNode("n2")
+    x = p.NewVariable("x")
+    x.AddBinding(1, source_set=[], where=n1)
+    x2 = x.AddBinding(2, source_set=[], where=n2)
+    n1.ConnectTo(n2)
+    self.assertIsNot(n1.chain, n2.chain)
+    n3 = n2.ConnectNew("n3")
+    self.assertItemsEqual([x2], x.Bindings(n3))
+
+  def testBindingsMatchesTraversal(self):
+    # Compare Bindings to visiting the nodes one at a time, on a random graph.
+    rand = random.Random(0)
+    p = cfg.Program()
+    nodes = [p.NewCFGNode()]
+    variables = [p.NewVariable(str(i)) for i in range(5)]
+    for i in range(200):
+      if i % 4:
+        nodes.append(rand.choice(nodes).ConnectNew())
+      else:
+        rand.choice(nodes).ConnectTo(rand.choice(nodes))
+      if i % 3 == 0:
+        rand.choice(variables).AddBinding(i, source_set=[],
+                                          where=rand.choice(nodes))
+    for node in nodes:
+      for v in variables:
+        expected = set()
+        seen = set()
+        stack = [node]
+        while stack:
+          n = stack.pop()
+          seen.add(n)
+          assigned = [b for b in n.bindings if b.variable is v]
+          if assigned:
+            expected.update(assigned)
+          else:
+            stack.extend(n.incoming - seen)
+        self.assertItemsEqual(expected, v.Bindings(node))
+
+  def testFilterMany(self):
+    #   n1 -> n2 -> n4
+    #    |          ^
+    #    +--> n3 ---+
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n1.ConnectNew("n3")
+    n4 = n2.ConnectNew("n4")
+    n3.ConnectTo(n4)
+    x = p.NewVariable("x")
+    x1 = x.AddBinding(1, source_set=[], where=n1)
+    x2 = x.AddBinding(2, source_set=[], where=n2)
+    y = p.NewVariable("y")
+    y1 = y.AddBinding(1, source_set=[x1], where=n3)
+    y2 = y.AddBinding(2, source_set=[x2], where=n3)
+    z = p.NewVariable("z")
+    self._Freeze(p, entrypoint=n1)
+    variables = [x, y, z]
+    expected = [[b for b in v.bindings if b.IsVisible(n4)] for v in variables]
+    self.assertEquals([[x1, x2], [y1], []], expected)
+    p.ClearCaches()
+    self.assertEquals(expected, p.solver.FilterMany(variables, n4))
+    # Now from the cache.
+    self.assertEquals(expected, p.solver.FilterMany(variables, n4))
+    self.assertEquals([x1], x.Filter(n3))
+
+  def testBoundedCache(self):
+    metric = metrics.Distribution("test_cache_size")
+    cache = cfg._BoundedCache("test", 4, metric)  # pylint: disable=protected-access
+    cache.Put("a", 1)
+    cache.Put("b", 2)
+    cache.Put("c", 3)  # "a" and "b" become old.
+    self.assertEquals(1, cache.Get("a"))  # "a" becomes young again.
+    cache.Put("d", 4)  # "c" and "a" become old, "b" is forgotten.
+    cache.Put("e", 5)
+    self.assertIsNone(cache.Get("b"))
+    self.assertEquals([4, 5], [cache.Get(k) for k in "de"])
+    self.assertEquals(4, len(cache))
+    cache.Clear()
+    self.assertEquals(0, len(cache))
+    self.assertIsNone(cache.Get("e"))
+
+  def testClearCaches(self):
+    p = cfg.Program()
+    n1 = p.NewCFGNode("n1")
+    n2 = n1.ConnectNew("n2")
+    n3 = n2.ConnectNew("n3")
+    x = p.NewVariable("x")
+    a = x.AddBinding("a", source_set=[], where=n1)
+    x.AddBinding("b", source_set=[], where=n2)
+    self._Freeze(p, entrypoint=n1)
+    self.assertFalse(a.IsVisible(n3))
+    self.assertTrue(len(p.solver._find_queries))  # pylint: disable=protected-access
+    p.ClearCaches()
+    self.assertFalse(len(p.solver._find_queries))  # pylint: disable=protected-access
+    self.assertFalse(a.IsVisible(n3))
+
 if __name__ == "__main__":
   unittest.main()
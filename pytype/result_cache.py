@@ -0,0 +1,170 @@
+"""A content-addressed, on-disk cache for the results of analyzing a file.
+
+The key of an entry is a hash of everything the analysis of a file depends on:
+The source code, the .pyi files of the modules it (transitively) imports, the
+Python version and the options that influence the output, and pytype's own
+builtins, stdlib and typeshed type declarations. The value is the
+generated .pyi (if any) and the errors that were found. So if none of these
+change, we can reuse the result of a previous run without running the VM.
+
+The cache is a disk_cache.DiskCache, so it has a size limit.
+"""
+
+import cPickle
+import hashlib
+import os
+
+from pytype import disk_cache
+from pytype import import_graph
+from pytype import metrics
+from pytype.pyc import pyc
+from pytype.pytd import typeshed
+
+
+# Change this whenever the format of the cache entries or the semantics of
+# pytype change, to invalidate old entries.
+_CACHE_VERSION = 2
+
+# The options that influence the generated .pyi or the errors.
+_KEY_OPTIONS = (
+    "abort_on_complex",
+    "analysis_shards",
+    "cache_unknowns",
+    "call_cache_min_cost",
+    "call_cache_size",
+    "check",
+    "disable",
+    "main_only",
+    "max_call_records",
+    "max_cfg_nodes",
+    "max_memory",
+    "max_seconds",
+    "module_name",
+    "nofail",
+    "pybuiltins_filename",
+    "python_exe",
+    "python_version",
+    "quick",
+    "report_errors",
+    "run_builtins",
+    "skip_repeat_calls",
+    "typeshed",
+)
+
+_cache_hits = metrics.Counter("result_cache_hits")
+_cache_misses = metrics.Counter("result_cache_misses")
+_cache_evictions = metrics.Counter("result_cache_evictions")
+
+# The directories with the type declarations that come with pytype.
+_PYTD_DIRS = tuple(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pytd", subdir)
+    for subdir in ("builtins", "stdlib"))
+
+# Maps a directory to the digest of the declarations in it. These don't change
+# while pytype runs, so we only read them once per process.
+_directory_digests = {}
+
+
+class Entry(object):
+  """The stored result of analyzing one file.
+
+  Attributes:
+    pyi: The generated .pyi, as a string. None if we only checked the file.
+    errorlog: The errors.ErrorLog, without an error filter.
+  """
+
+  def __init__(self, pyi, errorlog):
+    self.pyi = pyi
+    self.errorlog = errorlog
+
+
+def _directory_digest(directory):
+  """Compute a digest of the .py, .pyi and .pytd files in a directory tree."""
+  if directory not in _directory_digests:
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(directory):
+      dirs.sort()
+      for name in sorted(files):
+        if os.path.splitext(name)[1] in (".py", ".pyi", ".pytd"):
+          path = os.path.join(root, name)
+          with open(path, "rb") as fi:
+            contents = fi.read()
+          h.update("%s:%d:%s" % (os.path.relpath(path, directory),
+                                 len(contents), contents))
+    _directory_digests[directory] = h.hexdigest()
+  return _directory_digests[directory]
+
+
+def compute_key(input_filename, output_filename, options):
+  """Compute the cache key for analyzing a file.
+
+  Args:
+    input_filename: The .py file.
+    output_filename: The .pyi file we'll generate or check, or None.
+    options: config.Options object.
+  Returns:
+    A hex string, or None if the file can't be cached, e.g. because it has a
+    syntax error.
+  """
+  with open(input_filename, "rb") as fi:
+    src = fi.read()
+  try:
+    code = pyc.compile_src(src, options.python_version, options.python_exe,
+                           filename=input_filename,
+                           cache=options.bytecode_cache)
+  except pyc.CompileError:
+    return None
+  module_names = import_graph.get_module_names(
+      input_filename, output_filename, options)
+  if options.module_name:
+    module_names.add(options.module_name)
+  is_package = os.path.basename(input_filename).startswith("__init__.")
+  imported = set()
+  for name, level, fromlist in import_graph.get_imports(code):
+    for module_name in sorted(module_names) or [None]:
+      imported.update(import_graph.resolve_import(
+          module_name, is_package, name, level, fromlist))
+  h = hashlib.sha1()
+  def add(*parts):
+    for part in parts:
+      part = str(part)
+      h.update("%d:%s" % (len(part), part))
+  add(_CACHE_VERSION, input_filename, src)
+  for name in _KEY_OPTIONS:
+    add(name, repr(getattr(options, name, None)))
+  for directory in _PYTD_DIRS:
+    add(_directory_digest(directory))
+  if options.typeshed:
+    try:
+      add(_directory_digest(typeshed.get_typeshed_dir()))
+    except IOError:
+      pass  # No typeshed, so the analysis doesn't use it.
+  if options.pybuiltins_filename:
+    with open(options.pybuiltins_filename, "rb") as fi:
+      add(fi.read())
+  if options.check and output_filename:
+    # We're checking the file against this .pyi.
+    with open(output_filename, "rb") as fi:
+      add("check_pyi", fi.read())
+  for filename, contents in sorted(
+      import_graph.read_pyi_dependencies(sorted(imported), options).items()):
+    add(filename, contents)
+  return h.hexdigest()
+
+
+class ResultCache(disk_cache.DiskCache):
+  """A directory of cache entries, keyed by compute_key()."""
+
+  _hits = _cache_hits
+  _misses = _cache_misses
+  _evictions = _cache_evictions
+
+  def _decode(self, data):
+    try:
+      return cPickle.loads(data)
+    except (EOFError, ValueError, cPickle.UnpicklingError) as e:
+      # A truncated or otherwise broken entry.
+      raise disk_cache.CorruptEntryError(e)
+
+  def _encode(self, entry):
+    return cPickle.dumps(entry, cPickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,153 @@
+"""Tests for result_cache.py."""
+
+import os
+import sys
+
+from pytype import config
+from pytype import errors
+from pytype import metrics
+from pytype import result_cache
+from pytype import utils
+
+import unittest
+
+
+class ResultCacheTest(unittest.TestCase):
+  """Tests for result_cache.py."""
+
+  def setUp(self):
+    self.options = config.Options.create()
+
+  def _key(self, d, filename, output_filename=None):
+    self.options.tweak(pythonpath=[d["out"]])
+    return result_cache.compute_key(d[filename], output_filename, self.options)
+
+  def testKeyDependsOnSource(self):
+    with utils.Tempdir() as d:
+      d.create_file("a.py", "x = 1\n")
+      key1 = self._key(d, "a.py")
+      self.assertEquals(key1, self._key(d, "a.py"))
+      d.create_file("a.py", "x = 2\n")
+      self.assertNotEquals(key1, self._key(d, "a.py"))
+
+  def testKeyDependsOnOptions(self):
+    with utils.Tempdir() as d:
+      d.create_file("a.py", "x = 1\n")
+      key1 = self._key(d, "a.py")
+      self.options.tweak(quick=True)
+      self.assertNotEquals(key1, self._key(d, "a.py"))
+
+  def testKeyDependsOnPythonExe(self):
+    with utils.Tempdir() as d:
+      d.create_file("a.py", "x = 1\n")
+      key1 = self._key(d, "a.py")
+      self.options.python_exe = sys.executable
+      self.assertNotEquals(key1, self._key(d, "a.py"))
+
+  def testKeyDependsOnBuiltins(self):
+    # pylint: disable=protected-access
+    pytd_dirs = result_cache._PYTD_DIRS
+    with utils.Tempdir() as d:
+      d.create_file("a.py", "x = 1\n")
+      d.create_file("builtins/__builtin__.pytd", "x = ...  # type: int\n")
+      result_cache._PYTD_DIRS = (d["builtins"],)
+      try:
+        key1 = self._key(d, "a.py")
+        d.create_file("builtins/__builtin__.pytd", "x = ...  # type: str\n")
+        result_cache._directory_digests.clear()
+        self.assertNotEquals(key1, self._key(d, "a.py"))
+      finally:
+        result_cache._PYTD_DIRS = pytd_dirs
+        result_cache._directory_digests.clear()
+    # pylint: enable=protected-access
+
+  def testKeyDependsOnDependencies(self):
+    with utils.Tempdir() as d:
+      d.create_file("a.py", "import b\n")
+      d.create_file("out/b.pyi", "import c\n")
+      d.create_file("out/c.pyi", "x = ...  # type: int\n")
+      key1 = self._key(d, "a.py")
+      d.create_file("out/c.pyi", "x = ...  # type: str\n")
+      key2 = self._key(d, "a.py")
+      self.assertNotEquals(key1, key2)
+      d.create_file("out/unrelated.pyi", "")
+      self.assertEquals(key2, self._key(d, "a.py"))
+
+  def testKeySyntaxError(self):
+    with utils.Tempdir() as d:
+      d.create_file("a.py", "x = (\n")
+      self.assertIsNone(self._key(d, "a.py"))
+
+  def testGetAndPut(self):
+    # pylint: disable=protected-access
+    metrics._prepare_for_test()
+    hits = result_cache._cache_hits
+    misses = result_cache._cache_misses
+    hits._reset()
+    misses._reset()
+    # pylint: enable=protected-access
+    with utils.Tempdir() as d:
+      cache = result_cache.ResultCache(d["cache"], 1 << 20)
+      self.assertIsNone(cache.get("abc"))
+      errorlog = errors.ErrorLog()
+      errorlog.invalid_directive("a.py", 1, "message")
+      cache.put("abc", result_cache.Entry("x = ...  # type: int\n", errorlog))
+      entry = cache.get("abc")
+      self.assertEquals("x = ...  # type: int\n", entry.pyi)
+      self.assertEquals(str(errorlog), str(entry.errorlog))
+    self.assertEquals("result_cache_hits: 1", str(hits))
+    self.assertEquals("result_cache_misses: 1", str(misses))
+
+  def testOptions(self):
+    with utils.Tempdir() as d:
+      options = config.Options(["pytype", "--result-cache", d["cache"],
+                                "--result-cache-size", "2", "a.py"])
+      # Built once, so that all files share the size estimate.
+      self.assertIsInstance(options.result_cache, result_cache.ResultCache)
+      self.assertEquals(d["cache"], options.result_cache.path)
+
+  def testEviction(self):
+    with utils.Tempdir() as d:
+      cache = result_cache.ResultCache(d["cache"], 1000)
+      cache.put("old", result_cache.Entry("x" * 600, errors.ErrorLog()))
+      os.utime(os.path.join(d["cache"], "old.entry"), (0, 0))
+      cache.put("new", result_cache.Entry("y" * 600, errors.ErrorLog()))
+      self.assertIsNone(cache.get("old"))
+      self.assertIsNotNone(cache.get("new"))
+
+  def testEvictionOnlyScansWhenFull(self):
+    scans = []
+
+    class Cache(result_cache.ResultCache):
+
+      def _evict(self):
+        scans.append(self._size)
+        super(Cache, self)._evict()
+
+    with utils.Tempdir() as d:
+      cache = Cache(d["cache"], 1 << 20)
+      for i in range(10):
+        cache.put(str(i), result_cache.Entry("x", errors.ErrorLog()))
+      self.assertEquals([None], scans)  # Only the initial scan.
+
+  def testCorruptEntry(self):
+    # pylint: disable=protected-access
+    metrics._prepare_for_test()
+    hits = result_cache._cache_hits
+    misses = result_cache._cache_misses
+    hits._reset()
+    misses._reset()
+    # pylint: enable=protected-access
+    with utils.Tempdir() as d:
+      cache = result_cache.ResultCache(d["cache"], 1 << 20)
+      cache.put("abc", result_cache.Entry("x = ...  # type: int\n",
+                                          errors.ErrorLog()))
+      d.create_file("cache/abc.entry", "truncated")
+      self.assertIsNone(cache.get("abc"))
+      self.assertFalse(os.path.exists(os.path.join(d["cache"], "abc.entry")))
+    self.assertEquals("result_cache_hits: 0", str(hits))
+    self.assertEquals("result_cache_misses: 1", str(misses))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,134 @@
+"""A long-running pytype process that analyzes files on request.
+
+Starting pytype is expensive: It parses the builtins and typing pytds and the
+.pyi files of the stdlib and of every imported module. A server keeps all of
+that in memory (see load_pytd), so the requests after the first one only pay
+for analyzing the files themselves.
+
+The server listens on a unix socket. A request is the list of command-line
+arguments for pytype, together with the working directory of the client. The
+response contains the exit code and everything pytype wrote to stdout and
+stderr. Requests are processed one at a time.
+"""
+
+import json
+import logging
+import os
+import socket
+import SocketServer
+import StringIO
+import sys
+import traceback
+
+from pytype.pytd.parse import builtins
+
+log = logging.getLogger(__name__)
+
+
+def _send(sock, obj):
+  sock.sendall(json.dumps(obj) + "\n")
+
+
+def _receive(sock):
+  """Read one newline-terminated JSON message from a socket."""
+  data = []
+  while True:
+    chunk = sock.recv(65536)
+    if not chunk:
+      break
+    data.append(chunk)
+    if chunk.endswith("\n"):
+      break
+  if not data:
+    raise IOError("Connection closed")
+  return json.loads("".join(data))
+
+
+class _RequestHandler(SocketServer.BaseRequestHandler):
+  """Handles one request. See Server."""
+
+  def handle(self):
+    request = _receive(self.request)
+    response = self.server.run_request(request["argv"], request["cwd"])
+    _send(self.request, response)
+
+
+class Server(SocketServer.UnixStreamServer):
+  """Run pytype for the requests sent to a unix socket.
+
+  Attributes:
+    run_pytype: A function that takes a command line (a list of strings,
+      starting with the name of the program) and returns an exit code, like
+      the main() function of scripts/pytype.
+  """
+
+  def __init__(self, socket_path, run_pytype):
+    if os.path.exists(socket_path):
+      # Left over from a server that didn't shut down cleanly.
+      os.unlink(socket_path)
+    SocketServer.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+    self.run_pytype = run_pytype
+    # Load the state that's the same for every request.
+    builtins.GetBuiltinsAndTyping()
+
+  def run_request(self, argv, cwd):
+    """Run pytype with the given arguments, as if invoked from cwd.
+
+    Args:
+      argv: The command line, starting with the name of the program.
+      cwd: The working directory of the client.
+    Returns:
+      A dictionary with the exit code and the output of pytype.
+    """
+    old_cwd = os.getcwd()
+    old_stdout, old_stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO.StringIO(), StringIO.StringIO()
+    try:
+      os.chdir(cwd)
+      exit_code = self.run_pytype(argv)
+    except SystemExit as e:
+      exit_code = e.code
+    except Exception:  # pylint: disable=broad-except
+      # Don't let one bad file take down the server.
+      traceback.print_exc()
+      exit_code = 1
+    finally:
+      stdout, stderr = sys.stdout.getvalue(), sys.stderr.getvalue()
+      sys.stdout, sys.stderr = old_stdout, old_stderr
+      os.chdir(old_cwd)
+    if exit_code is None:
+      exit_code = 0
+    elif not isinstance(exit_code, int):
+      # sys.exit("message") prints the message and exits with 1.
+      stderr += "%s\n" % exit_code
+      exit_code = 1
+    log.info("Processed %r: exit code %d", argv, exit_code)
+    return {"exit_code": exit_code, "stdout": stdout, "stderr": stderr}
+
+  def server_close(self):
+    SocketServer.UnixStreamServer.server_close(self)
+    if os.path.exists(self.server_address):
+      os.unlink(self.server_address)
+
+
+def send_request(socket_path, argv, cwd=None):
+  """Ask a server to run pytype.
+
+  Args:
+    socket_path: The unix socket the server is listening on.
+    argv: The command line for pytype, starting with the name of the program.
+    cwd: The directory relative filenames in argv refer to. Defaults to the
+      current directory.
+  Returns:
+    A tuple (exit_code, stdout, stderr).
+  Raises:
+    socket.error: If we can't connect to the server.
+  """
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(socket_path)
+    _send(sock, {"argv": list(argv), "cwd": cwd or os.getcwd()})
+    response = _receive(sock)
+  finally:
+    sock.close()
+  return response["exit_code"], response["stdout"], response["stderr"]
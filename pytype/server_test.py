@@ -0,0 +1,55 @@
+"""Tests for server.py."""
+
+import os
+import sys
+import threading
+
+from pytype import server
+from pytype import utils
+
+import unittest
+
+
+def _run_pytype(argv):
+  if argv[1] == "exit":
+    sys.exit(3)
+  elif argv[1] == "raise":
+    raise ValueError("bad")
+  print "stdout: %s in %s" % (" ".join(argv[1:]), os.path.basename(os.getcwd()))
+  print >>sys.stderr, "stderr"
+  return 1
+
+
+class ServerTest(unittest.TestCase):
+  """Tests for server.py."""
+
+  def _request(self, d, *args):
+    srv = server.Server(d["socket"], _run_pytype)
+    thread = threading.Thread(target=srv.handle_request)
+    thread.start()
+    try:
+      return server.send_request(d["socket"], ("pytype",) + args,
+                                 cwd=d.create_directory("cwd"))
+    finally:
+      thread.join()
+      srv.server_close()
+
+  def testRequest(self):
+    with utils.Tempdir() as d:
+      self.assertEquals((1, "stdout: a.py b.py in cwd\n", "stderr\n"),
+                        self._request(d, "a.py", "b.py"))
+      self.assertFalse(os.path.exists(d["socket"]))
+
+  def testExit(self):
+    with utils.Tempdir() as d:
+      self.assertEquals((3, "", ""), self._request(d, "exit"))
+
+  def testException(self):
+    with utils.Tempdir() as d:
+      exit_code, _, stderr = self._request(d, "raise")
+      self.assertEquals(1, exit_code)
+      self.assertIn("ValueError: bad", stderr)
+
+
+if __name__ == "__main__":
+  unittest.main()
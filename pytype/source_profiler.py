@@ -0,0 +1,156 @@
+"""Attribute the cost of an analysis to the code being analyzed.
+
+cProfile (--profile) tells us which functions of pytype are expensive. This
+module answers a different question: Which lines of the *analyzed* program are
+expensive to type-check. The VM reports every instruction it runs to the active
+SourceProfiler, which records the wall time, CFG nodes and bindings spent on
+it, keyed by (filename, line, opcode). Costs are exclusive: The time spent
+running a called function is attributed to the instructions of that function,
+not to the CALL_FUNCTION that called it.
+
+Sample code:
+
+with source_profiler.SourceProfileContext("profile.txt"):
+  infer.infer_types(...)
+
+This writes a report sorted by time to profile.txt, and the call stacks of the
+analyzed program to profile.txt.collapsed, in the "collapsed stack" format
+that flamegraph tools (e.g. flamegraph.pl) take as input.
+"""
+
+import collections
+import time
+
+_active = None  # The SourceProfiler that the VM reports to, if any.
+
+
+def active():
+  """Return the active SourceProfiler, or None."""
+  return _active
+
+
+# Cost of the instructions at one location, or of one call stack.
+_Cost = collections.namedtuple(
+    "_Cost", ["seconds", "cfg_nodes", "bindings", "count"])
+
+
+class _Entry(object):
+  """An instruction that is currently running."""
+
+  __slots__ = ("key", "stack", "start_time", "start_cfg_nodes",
+               "start_bindings", "child_time", "child_cfg_nodes",
+               "child_bindings")
+
+  def __init__(self, key, stack, program):
+    self.key = key
+    self.stack = stack
+    self.start_time = time.time()
+    self.start_cfg_nodes = len(program.cfg_nodes)
+    self.start_bindings = program.num_bindings
+    self.child_time = 0
+    self.child_cfg_nodes = 0
+    self.child_bindings = 0
+
+
+class SourceProfiler(object):
+  """Collects the cost of the instructions run by the VM.
+
+  Attributes:
+    costs: A dictionary mapping (filename, line, opcode name) to a _Cost.
+    stacks: A dictionary mapping call stacks (tuples of (filename, line, opcode
+      name)) to the _Cost of their innermost instruction.
+  """
+
+  def __init__(self):
+    self.costs = {}
+    self.stacks = {}
+    self._running = []  # A stack of _Entry.
+
+  def enter(self, op, program):
+    """Called before the VM runs an instruction.
+
+    Args:
+      op: The instruction, an opcodes.Opcode.
+      program: The cfg.Program the instruction is run in.
+    """
+    # Code compiled without a filename (e.g. the builtins) has co_filename None.
+    key = (op.code.co_filename or "<string>", op.line, op.name)
+    if self._running:
+      stack = self._running[-1].stack + (key,)
+    else:
+      stack = (key,)
+    self._running.append(_Entry(key, stack, program))
+
+  def exit(self, program):
+    """Called after the VM ran the instruction passed to the last enter()."""
+    entry = self._running.pop()
+    seconds = time.time() - entry.start_time
+    cfg_nodes = len(program.cfg_nodes) - entry.start_cfg_nodes
+    bindings = program.num_bindings - entry.start_bindings
+    if self._running:
+      parent = self._running[-1]
+      parent.child_time += seconds
+      parent.child_cfg_nodes += cfg_nodes
+      parent.child_bindings += bindings
+    cost = _Cost(seconds - entry.child_time,
+                 cfg_nodes - entry.child_cfg_nodes,
+                 bindings - entry.child_bindings, 1)
+    self._add(self.costs, entry.key, cost)
+    self._add(self.stacks, entry.stack, cost)
+
+  def _add(self, costs, key, cost):
+    old = costs.get(key)
+    if old is not None:
+      cost = _Cost(*[x + y for x, y in zip(old, cost)])
+    costs[key] = cost
+
+  def report(self):
+    """Return the costs as a table, the most expensive instructions first."""
+    total = sum(cost.seconds for cost in self.costs.values()) or 1
+    lines = ["%9s %6s %9s %9s %9s  %s" % (
+        "seconds", "%", "cfg_nodes", "bindings", "count", "location")]
+    for (filename, line, opcode), cost in sorted(
+        self.costs.items(), key=lambda item: item[1].seconds, reverse=True):
+      lines.append("%9.4f %6.2f %9d %9d %9d  %s:%s %s" % (
+          cost.seconds, 100.0 * cost.seconds / total, cost.cfg_nodes,
+          cost.bindings, cost.count, filename, line, opcode))
+    return "\n".join(lines) + "\n"
+
+  def collapsed_stacks(self):
+    """Return the time per call stack, in microseconds, for flamegraphs."""
+    lines = []
+    for stack, cost in sorted(self.stacks.items()):
+      frames = ";".join("%s:%s %s" % (filename, line, opcode)
+                        for filename, line, opcode in stack)
+      lines.append("%s %d" % (frames, int(cost.seconds * 1e6)))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+class SourceProfileContext(object):
+  """A context manager that profiles the analyzed code and writes a report."""
+
+  def __init__(self, output_path):
+    """Initialize.
+
+    Args:
+      output_path: The path for the report. The collapsed stacks are written
+        to output_path + ".collapsed". If empty, nothing is profiled.
+    """
+    self._output_path = output_path
+    self._old_active = None  # Set in __enter__.
+
+  def __enter__(self):
+    global _active
+    self._old_active = _active
+    if self._output_path:
+      _active = SourceProfiler()
+    return _active
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    global _active
+    profiler, _active = _active, self._old_active
+    if self._output_path:
+      with open(self._output_path, "w") as f:
+        f.write(profiler.report())
+      with open(self._output_path + ".collapsed", "w") as f:
+        f.write(profiler.collapsed_stacks())
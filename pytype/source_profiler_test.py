@@ -0,0 +1,86 @@
+"""Tests for source_profiler.py."""
+
+import textwrap
+
+from pytype import config
+from pytype import errors
+from pytype import infer
+from pytype import source_profiler
+from pytype import utils
+
+import unittest
+
+
+class SourceProfilerTest(unittest.TestCase):
+  """Tests for source_profiler.py."""
+
+  def setUp(self):
+    self.options = config.Options.create()
+
+  def _infer(self, src):
+    infer.infer_types(textwrap.dedent(src), errors.ErrorLog(), self.options,
+                      filename="t.py", deep=True, run_builtins=False)
+
+  def testCosts(self):
+    with utils.Tempdir() as d:
+      with source_profiler.SourceProfileContext(d["profile"]) as profiler:
+        self.assertIs(profiler, source_profiler.active())
+        self._infer("""\
+          def f(x):
+            return [x]
+          y = f(1)
+        """)
+      self.assertIsNone(source_profiler.active())
+      costs = {(filename, line, opcode): cost for (filename, line, opcode), cost
+               in profiler.costs.items() if filename == "t.py"}
+      self.assertIn(("t.py", 2, "BUILD_LIST"), costs)
+      self.assertIn(("t.py", 3, "CALL_FUNCTION"), costs)
+      self.assertEquals(1, costs[("t.py", 3, "CALL_FUNCTION")].count)
+      self.assertTrue(any(cost.bindings for cost in costs.values()))
+      # The instructions of f() are attributed to f(), not to the call.
+      self.assertIn((("t.py", 3, "CALL_FUNCTION"), ("t.py", 2, "BUILD_LIST")),
+                    profiler.stacks)
+      with open(d["profile"]) as f:
+        self.assertIn("t.py:2 BUILD_LIST", f.read())
+      with open(d["profile"] + ".collapsed") as f:
+        self.assertIn("t.py:3 CALL_FUNCTION;t.py:2 BUILD_LIST ", f.read())
+
+  def testDisabled(self):
+    with source_profiler.SourceProfileContext(None) as profiler:
+      self.assertIsNone(profiler)
+      self._infer("x = 1\n")
+    self.assertIsNone(source_profiler.active())
+
+  def testExclusiveCosts(self):
+    profiler = source_profiler.SourceProfiler()
+
+    class FakeOp(object):
+
+      def __init__(self, line, name):
+        self.code = type("Code", (), {"co_filename": "t.py"})
+        self.line = line
+        self.name = name
+
+    class FakeProgram(object):
+      cfg_nodes = []
+      num_bindings = 0
+
+    program = FakeProgram()
+    profiler.enter(FakeOp(1, "CALL_FUNCTION"), program)
+    program.cfg_nodes = [None] * 3
+    profiler.enter(FakeOp(5, "RETURN_VALUE"), program)
+    program.cfg_nodes = [None] * 5
+    program.num_bindings = 7
+    profiler.exit(program)
+    profiler.exit(program)
+    call = profiler.costs[("t.py", 1, "CALL_FUNCTION")]
+    ret = profiler.costs[("t.py", 5, "RETURN_VALUE")]
+    self.assertEquals((3, 0, 1), (call.cfg_nodes, call.bindings, call.count))
+    self.assertEquals((2, 7, 1), (ret.cfg_nodes, ret.bindings, ret.count))
+    self.assertEquals({(("t.py", 1, "CALL_FUNCTION"),),
+                       (("t.py", 1, "CALL_FUNCTION"),
+                        ("t.py", 5, "RETURN_VALUE"))}, set(profiler.stacks))
+
+
+if __name__ == "__main__":
+  unittest.main()
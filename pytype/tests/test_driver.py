@@ -0,0 +1,66 @@
+"""Tests for the pytype script (scripts/pytype)."""
+
+import imp
+import os
+
+from pytype import config
+from pytype import utils
+
+import unittest
+
+
+PYTYPE_SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..",
+                             "scripts", "pytype")
+
+
+class CycleTest(unittest.TestCase):
+  """Tests for analyzing files that import each other."""
+
+  @classmethod
+  def setUpClass(cls):
+    # The script defines metrics, so it can only be loaded once.
+    cls.main = imp.load_source("pytype_main", PYTYPE_SCRIPT)
+
+  def setUp(self):
+    self.analyzed = []
+    self.analyze_one_file = self.main.analyze_one_file
+
+    def counting_analyze_one_file(input_filename, *args, **kwargs):
+      self.analyzed.append(os.path.basename(input_filename))
+      return self.analyze_one_file(input_filename, *args, **kwargs)
+    self.main.analyze_one_file = counting_analyze_one_file
+
+  def tearDown(self):
+    self.main.analyze_one_file = self.analyze_one_file
+
+  def _create_cycle(self, d):
+    d.create_file("a.py", "import b\ndef f():\n  return 1\n")
+    d.create_file("b.py", "import a\ndef g():\n  return 'x'\n")
+    d.create_file("a.pyi", "import b\ndef f() -> int: ...\n")
+    d.create_file("b.pyi", "import a\ndef g() -> str: ...\n")
+    return [(d["a.py"], d["a.pyi"]), (d["b.py"], d["b.pyi"])]
+
+  def testCheckAnalyzesOnce(self):
+    with utils.Tempdir() as d:
+      component = self._create_cycle(d)
+      options = config.Options(["pytype", "--check", "-P", d.path,
+                                d["a.py"] + ":" + d["a.pyi"],
+                                d["b.py"] + ":" + d["b.pyi"]])
+      errorlogs = self.main.analyze_component(component, options)
+    self.assertEquals(["a.py", "b.py"], self.analyzed)
+    self.assertEquals(2, len(errorlogs))
+
+  def testGenerateConverges(self):
+    with utils.Tempdir() as d:
+      component = self._create_cycle(d)
+      options = config.Options(["pytype", "-P", d.path,
+                                d["a.py"] + ":" + d["a.pyi"],
+                                d["b.py"] + ":" + d["b.pyi"]])
+      self.main.analyze_component(component, options)
+    # The .pyi files are up to date, so one iteration (plus the one that
+    # notices nothing changed) is enough.
+    self.assertLessEqual(len(self.analyzed), 4)
+
+
+if __name__ == "__main__":
+  unittest.main()
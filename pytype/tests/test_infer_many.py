@@ -0,0 +1,54 @@
+"""Tests for infer.infer_types_many."""
+
+import textwrap
+
+from pytype import errors
+from pytype import infer
+from pytype import utils
+from pytype.pytd import pytd
+from pytype.pytd import utils as pytd_utils
+from pytype.tests import test_inference
+
+
+class InferManyTest(test_inference.InferenceTest):
+  """Tests for infer.infer_types_many."""
+
+  def testInferMany(self):
+    with utils.Tempdir() as d:
+      d.create_file("foo.pyi", """
+        class Foo(object):
+          def get(self) -> int
+      """)
+      self.options.tweak(pythonpath=[d.path])
+      sources = [
+          (textwrap.dedent("""\
+            import foo
+            def f():
+              return foo.Foo().get()
+          """), "a.py"),
+          (textwrap.dedent("""\
+            import foo
+            def g(x):
+              return foo.Foo()
+            y = undefined_name
+          """), "b.py"),
+      ]
+      results = list(infer.infer_types_many(sources, self.options,
+                                            deep=True, cache_unknowns=True))
+      self.assertEquals(["a.py", "b.py"], [r[0] for r in results])
+      # The results are the same as if we had analyzed the sources separately.
+      for (src, filename), (_, ty, errorlog) in zip(sources, results):
+        expected_errorlog = errors.ErrorLog()
+        expected = infer.infer_types(src, expected_errorlog, self.options,
+                                     filename=filename, deep=True,
+                                     cache_unknowns=True)
+        self.assertMultiLineEqual(pytd.Print(expected), pytd.Print(ty))
+        self.assertEquals(str(expected_errorlog), str(errorlog))
+    ty_a = pytd_utils.CanonicalOrdering(results[0][1])
+    self.assertEquals("int", pytd.Print(ty_a.Lookup("f").signatures[0]
+                                        .return_type))
+    self.assertErrorLogIs(results[1][2], [(4, "name-error")])
+
+
+if __name__ == "__main__":
+  test_inference.main()
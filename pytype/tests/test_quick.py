@@ -1,5 +1,9 @@
 """Tests for --quick and --abort-on-complex."""
 
+import textwrap
+
+from pytype import errors
+from pytype import infer
 from pytype.pytd import cfg
 from pytype.tests import test_inference
 
@@ -39,6 +43,47 @@ class QuickTest(test_inference.InferenceTest):
       x = x + x
     """, abort_on_complex=True)
 
+  def testDegradeOnComplex(self):
+    self.options.tweak(abort_on_complex=True)
+    ty, budget = infer.infer_types_degraded(textwrap.dedent("""
+      if __any_object__:
+        x = [1]
+      else:
+        x = [1j]
+      x = x + x
+      x = x + x
+      x = x + x
+      x = x + x
+      x = x + x
+      x = x + x
+      x = x + x
+    """), errors.ErrorLog(), self.options, deep=True, cache_unknowns=True)
+    self.assertEquals("variable_size", budget)
+    self.assertTypesMatchPytd(ty, """
+      x = ...  # type: Any
+    """)
+
+  def testDegradeOnCfgNodeBudget(self):
+    self.options.tweak(max_cfg_nodes=40)
+    ty, budget = infer.infer_types_degraded(textwrap.dedent("""
+      def f1(x):
+        if x:
+          return f2(x) + f2(x)
+        return x
+      def f2(x):
+        if x:
+          return f3(x) + f3(x)
+        return x
+      def f3(x):
+        if x:
+          return f4(x) + f4(x)
+        return x
+      def f4(x):
+        return [y for y in x if y]
+    """), errors.ErrorLog(), self.options, deep=True, cache_unknowns=True)
+    self.assertEquals("cfg_nodes", budget)
+    self.assertItemsEqual(["f1", "f2", "f3", "f4"],
+                          [f.name for f in ty.functions])
 
 if __name__ == "__main__":
   test_inference.main()
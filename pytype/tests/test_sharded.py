@@ -0,0 +1,95 @@
+"""Tests for --analysis-shards."""
+
+import textwrap
+
+from pytype import errors
+from pytype import infer
+from pytype.pytd import cfg
+from pytype.pytd import pytd
+from pytype.tests import test_inference
+
+
+class ShardedTest(test_inference.InferenceTest):
+  """Tests for --analysis-shards."""
+
+  def setUp(self):
+    super(ShardedTest, self).setUp()
+    self.options.tweak(analysis_shards=2)
+
+  def testClassesInDifferentShards(self):
+    ty = self.Infer("""
+      class A(object):
+        def get(self):
+          return 42
+      class B(A):
+        def name(self):
+          return "b"
+      def f():
+        return B()
+    """, deep=True, solve_unknowns=True)
+    self.assertTypesMatchPytd(ty, """
+      class A(object):
+        def get(self) -> int: ...
+      class B(A):
+        def name(self) -> str: ...
+      def f() -> B: ...
+    """)
+
+  def testSameAsSerial(self):
+    src = textwrap.dedent("""
+      def f(x):
+        return x + 1
+      def g(x):
+        return [x]
+      def h():
+        return g(f(1))
+      y = h()
+    """)
+    sharded = infer.infer_types(src, errors.ErrorLog(), self.options,
+                                deep=True, solve_unknowns=True)
+    self.options.tweak(analysis_shards=1)
+    serial = infer.infer_types(src, errors.ErrorLog(), self.options,
+                               deep=True, solve_unknowns=True)
+    # The signatures of f and g can be in a different order.
+    self.assertItemsEqual(pytd.Print(serial).splitlines(),
+                          pytd.Print(sharded).splitlines())
+
+  def testEmptyModule(self):
+    for src in ("", '"""Just a docstring."""', "x = 42"):
+      ty = infer.infer_types(src, errors.ErrorLog(), self.options, deep=True,
+                             solve_unknowns=True)
+      self.assertFalse(ty.functions)
+      self.assertFalse(ty.classes)
+
+  def testErrors(self):
+    _, errorlog = self.InferAndCheck("""\
+      def f():
+        return "x".foo
+      def g():
+        return 1 .bar
+    """)
+    self.assertErrorLogContains(errorlog, r"line 2.*foo.*attribute-error")
+    self.assertErrorLogContains(errorlog, r"line 4.*bar.*attribute-error")
+
+  def testBudget(self):
+    self.options.tweak(max_cfg_nodes=40)
+    self.assertRaises(cfg.ProgramTooComplexError, infer.infer_types,
+                      textwrap.dedent("""
+      def f1(x):
+        if x:
+          return f2(x) + f2(x)
+        return x
+      def f2(x):
+        if x:
+          return f3(x) + f3(x)
+        return x
+      def f3(x):
+        if x:
+          return f4(x) + f4(x)
+        return x
+      def f4(x):
+        return [y for y in x if y]
+    """), errors.ErrorLog(), self.options, deep=True, cache_unknowns=True)
+
+if __name__ == "__main__":
+  test_inference.main()
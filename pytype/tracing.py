@@ -0,0 +1,131 @@
+"""Spans around the phases of an analysis, written as trace events.
+
+A span measures the wall time and CPU time of a phase (e.g. compiling, running
+the program, solving), and, if given the cfg.Program, how many CFG nodes,
+variables and bindings the phase created. Spans nest. The output is a JSON
+file in the Chrome trace-event format, which chrome://tracing and other trace
+viewers display as a timeline.
+
+Sample code:
+
+def foo(program):
+  with tracing.span("foo", program):
+    ...
+
+with tracing.TraceContext("trace.json"):
+  foo(program)
+"""
+
+import json
+import os
+import time
+
+_enabled = False  # True iff spans should be recorded.
+_events = []  # The trace events of the spans that have ended.
+
+
+def _cpu_time():
+  user, system = os.times()[:2]
+  return user + system
+
+
+def _program_size(program):
+  return (len(program.cfg_nodes), program.next_variable_id,
+          program.num_bindings)
+
+
+class _Span(object):
+  """A context manager that records the time spent in a phase.
+
+  Attributes:
+    name: The name of the phase.
+    program: A cfg.Program, or None. If given, we also record how much the
+      program grew during the phase.
+    args: Additional data for the trace event, e.g. the filename.
+  """
+
+  def __init__(self, name, program, args):
+    self.name = name
+    self.program = program
+    self.args = args
+    self._start = None  # Set in __enter__.
+
+  def __enter__(self):
+    if _enabled:
+      self._start = (time.time(), _cpu_time(),
+                     self.program and _program_size(self.program))
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if self._start is None:
+      return
+    start_time, start_cpu_time, start_size = self._start
+    self._start = None
+    now = time.time()
+    args = dict(self.args, cpu_ms=round((_cpu_time() - start_cpu_time) * 1e3))
+    if start_size:
+      cfg_nodes, variables, bindings = _program_size(self.program)
+      args.update(cfg_nodes=cfg_nodes - start_size[0],
+                  variables=variables - start_size[1],
+                  bindings=bindings - start_size[2])
+    if exc_type is not None:
+      args["exception"] = exc_type.__name__
+    _events.append({
+        "name": self.name, "cat": "pytype", "ph": "X",
+        "ts": int(start_time * 1e6), "dur": int((now - start_time) * 1e6),
+        "pid": os.getpid(), "tid": 0, "args": args})
+
+
+def span(name, program=None, **args):
+  """Create a span. See _Span."""
+  return _Span(name, program, args)
+
+
+def dump_and_reset():
+  """Return the events recorded so far, and forget them.
+
+  This is used by worker processes to hand their events back to the main
+  process, which adds them to its own with merge().
+
+  Returns:
+    A list of trace events.
+  """
+  events = list(_events)
+  reset()
+  return events
+
+
+def reset():
+  del _events[:]
+
+
+def merge(events):
+  """Add events returned by dump_and_reset() to the events of this process."""
+  _events.extend(events)
+
+
+class TraceContext(object):
+  """A context manager that enables spans and writes the trace events."""
+
+  def __init__(self, output_path):
+    """Initialize.
+
+    Args:
+      output_path: The path for the trace events. If empty, no spans are
+        recorded.
+    """
+    self._output_path = output_path
+    self._old_enabled = None  # Set in __enter__.
+
+  def __enter__(self):
+    global _enabled
+    self._old_enabled = _enabled
+    _enabled = bool(self._output_path)
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    global _enabled
+    _enabled = self._old_enabled
+    if self._output_path:
+      with open(self._output_path, "w") as f:
+        json.dump({"traceEvents": dump_and_reset(),
+                   "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,87 @@
+"""Tests for tracing.py."""
+
+import json
+
+from pytype import config
+from pytype import errors
+from pytype import infer
+from pytype import tracing
+from pytype import utils
+from pytype.pytd import cfg
+
+import unittest
+
+
+class TracingTest(unittest.TestCase):
+  """Tests for tracing.py."""
+
+  def setUp(self):
+    tracing.reset()
+
+  def _trace(self, f):
+    with utils.Tempdir() as d:
+      with tracing.TraceContext(d["trace.json"]):
+        f()
+      with open(d["trace.json"]) as fi:
+        return json.load(fi)["traceEvents"]
+
+  def testDisabled(self):
+    with tracing.span("foo"):
+      pass
+    self.assertEquals([], tracing.dump_and_reset())
+
+  def testSpans(self):
+    program = cfg.Program()
+    def f():
+      with tracing.span("outer", filename="a.py"):
+        with tracing.span("inner", program):
+          program.NewCFGNode()
+          program.NewVariable("x", [1, 2], [], program.NewCFGNode())
+    inner, outer = self._trace(f)
+    self.assertEquals("outer", outer["name"])
+    self.assertEquals("X", outer["ph"])
+    self.assertEquals("a.py", outer["args"]["filename"])
+    self.assertNotIn("cfg_nodes", outer["args"])
+    self.assertEquals("inner", inner["name"])
+    self.assertEquals(2, inner["args"]["cfg_nodes"])
+    self.assertEquals(1, inner["args"]["variables"])
+    self.assertEquals(2, inner["args"]["bindings"])
+    self.assertLessEqual(outer["ts"], inner["ts"])
+    self.assertGreaterEqual(outer["ts"] + outer["dur"],
+                            inner["ts"] + inner["dur"])
+    self.assertEquals([], tracing.dump_and_reset())
+
+  def testException(self):
+    def f():
+      with tracing.span("foo"):
+        raise ValueError()
+    with utils.Tempdir() as d:
+      with tracing.TraceContext(d["trace.json"]):
+        self.assertRaises(ValueError, f)
+      with open(d["trace.json"]) as fi:
+        event, = json.load(fi)["traceEvents"]
+    self.assertEquals("ValueError", event["args"]["exception"])
+
+  def testMerge(self):
+    def f():
+      with tracing.span("foo"):
+        pass
+      events = tracing.dump_and_reset()
+      self.assertEquals(["foo"], [e["name"] for e in events])
+      with tracing.span("bar"):
+        pass
+      tracing.merge(events)
+    self.assertEquals(["bar", "foo"], [e["name"] for e in self._trace(f)])
+
+  def testInferTypes(self):
+    options = config.Options.create()
+    events = self._trace(lambda: infer.infer_types(
+        "def f(): return 42\n", errors.ErrorLog(), options, deep=True))
+    names = [e["name"] for e in events]
+    for name in ("compile", "run_program", "analyze", "compute_types",
+                 "resolve_ast", "convert_pytd"):
+      self.assertIn(name, names)
+
+
+if __name__ == "__main__":
+  unittest.main()
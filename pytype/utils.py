@@ -286,6 +286,66 @@ def topological_sort(nodes):
   assert not stack
 
 
+def strongly_connected_components(nodes):
+  """Group a list of nodes into strongly connected components.
+
+  This is Tarjan's algorithm. Like topological_sort(), it uses the "incoming"
+  attribute of the nodes, but allows cycles: Every cycle ends up in one
+  component, and the components are in topological order, i.e., any node that
+  appears in the "incoming" list of a node n2 is in the component of n2 or in
+  a component before it.
+
+  Args:
+    nodes: A sequence of nodes. Each node may have an attribute "incoming",
+      a list of nodes (every node in this list needs to be in "nodes"). The
+      list of nodes can't have duplicates.
+  Returns:
+    A list of components. Each component is a list of nodes, in the order in
+    which they appear in "nodes".
+  """
+  position = {node: i for i, node in enumerate(nodes)}
+  index = {}
+  lowlink = {}
+  stack = []
+  on_stack = set()
+  components = []
+  for root in nodes:
+    if root in index:
+      continue
+    # Iterative depth-first search. Each entry is a node and an iterator over
+    # the nodes it still needs to visit.
+    index[root] = lowlink[root] = len(index)
+    stack.append(root)
+    on_stack.add(root)
+    work = [(root, iter(getattr(root, "incoming", ())))]
+    while work:
+      node, edges = work[-1]
+      for inc in edges:
+        if inc not in index:
+          index[inc] = lowlink[inc] = len(index)
+          stack.append(inc)
+          on_stack.add(inc)
+          work.append((inc, iter(getattr(inc, "incoming", ()))))
+          break
+        elif inc in on_stack:
+          lowlink[node] = min(lowlink[node], index[inc])
+      else:
+        work.pop()
+        if work:
+          parent = work[-1][0]
+          lowlink[parent] = min(lowlink[parent], lowlink[node])
+        if lowlink[node] == index[node]:
+          component = []
+          while True:
+            member = stack.pop()
+            on_stack.remove(member)
+            component.append(member)
+            if member is node:
+              break
+          components.append(sorted(component, key=position.get))
+  return components
+
+
 def flattened_superclasses(cls):
   """Given a pytd.Class return a list of all superclasses.
 
@@ -372,6 +432,37 @@ def _makedirs(path):
       raise
 
 
+def write_atomically(filename, data):
+  """Write a file such that readers see either the old or the new contents.
+
+  The data is written to a temporary file in the same directory, which is then
+  renamed. This is for files that other processes might read concurrently.
+
+  Args:
+    filename: The file to (over)write.
+    data: The new contents, a string.
+  """
+  if os.path.exists(filename) and not os.path.isfile(filename):
+    # E.g. /dev/null. Renaming would replace the device.
+    with open(filename, "wb") as fi:
+      fi.write(data)
+    return
+  dirname, basename = os.path.split(filename)
+  fd, tmp_filename = tempfile.mkstemp(prefix="." + basename + ".",
+                                      dir=dirname or ".")
+  umask = os.umask(0)
+  os.umask(umask)
+  try:
+    # mkstemp creates files that only we can read. Use the usual permissions.
+    os.fchmod(fd, 0o666 & ~umask)
+    with os.fdopen(fd, "wb") as fi:
+      fi.write(data)
+    os.rename(tmp_filename, filename)
+  except:
+    os.unlink(tmp_filename)
+    raise
+
+
 class Tempdir(object):
   """Context handler for creating temporary directories."""
 
@@ -298,6 +298,35 @@ class UtilsTest(unittest.TestCase):
     generator = utils.topological_sort([n1, n2, n3])
     self.assertRaises(ValueError, list, generator)
 
+  def testStronglyConnectedComponents(self):
+    n1 = Node("1")
+    n2 = Node("2", n1)
+    n3 = Node("3", n2)
+    n4 = Node("4", n2, n3)
+    for permutation in itertools.permutations([n1, n2, n3, n4]):
+      self.assertEquals(utils.strongly_connected_components(permutation),
+                        [[n1], [n2], [n3], [n4]])
+
+  def testStronglyConnectedComponentsCycle(self):
+    #  n1 <-- n2 <-- n3 <-- n5
+    #         |      ^
+    #         +-> n4-+
+    n1 = Node("1")
+    n2 = Node("2")
+    n3 = Node("3")
+    n4 = Node("4")
+    n5 = Node("5")
+    n2.incoming = [n1, n4]
+    n3.incoming = [n2]
+    n4.incoming = [n3]
+    n5.incoming = [n3]
+    for permutation in itertools.permutations([n1, n2, n3, n4, n5]):
+      components = utils.strongly_connected_components(permutation)
+      self.assertEquals(len(components), 3)
+      self.assertEquals(components[0], [n1])
+      self.assertItemsEqual(components[1], [n2, n3, n4])
+      self.assertEquals(components[2], [n5])
+
   def testTopologicalSortGetattr(self):
     self.assertEquals(list(utils.topological_sort([1])), [1])
 
@@ -345,6 +374,15 @@ class UtilsTest(unittest.TestCase):
     self.assertFalse(os.path.isdir(os.path.join(d.path, "d1", "d2")))
     self.assertFalse(os.path.isdir(filename5))
 
+  def testWriteAtomically(self):
+    with utils.Tempdir() as d:
+      filename = d.create_file("foo.pyi", "old")
+      utils.write_atomically(filename, "new")
+      with open(filename, "rb") as fi:
+        self.assertEquals("new", fi.read())
+      # No temporary files are left behind.
+      self.assertEquals(["foo.pyi"], os.listdir(d.path))
+
   def testListStripPrefix(self):
     self.assertEqual([1, 2, 3], utils.list_strip_prefix([1, 2, 3], []))
     self.assertEqual([2, 3], utils.list_strip_prefix([1, 2, 3], [1]))
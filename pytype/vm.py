@@ -21,14 +21,18 @@ import sys
 
 from pytype import abstract
 from pytype import blocks
+from pytype import call_cache
 from pytype import convert
 from pytype import exceptions
 from pytype import load_pytd
 from pytype import metrics
+from pytype import source_profiler
 from pytype import state as frame_state
+from pytype import tracing
 from pytype import typing
 from pytype import utils
 from pytype.pyc import loadmarshal
+from pytype.pyc import opcodes
 from pytype.pyc import pyc
 from pytype.pytd import cfg as typegraph
 from pytype.pytd import slots
@@ -53,6 +57,10 @@ Block = collections.namedtuple("Block", ["type", "handler", "level"])
 
 _opcode_counter = metrics.MapCounter("vm_opcode")
 
+# The code of __builtin__.py, compiled and processed. Running the code doesn't
+# modify it, so every VM in this process can use the same code objects.
+_compiled_builtins = {}  # (src, python_version, python_exe, compact) => code
+
 
 class RecursionException(Exception):
   pass
@@ -79,7 +87,8 @@ class VirtualMachine(object):
                module_name=None,
                reverse_operators=False,
                generate_unknowns=False,
-               cache_unknowns=True):
+               cache_unknowns=True,
+               shared_modules=None):
     """Construct a TypegraphVirtualMachine."""
     self.maximum_depth = sys.maxint
     self.errorlog = errorlog
@@ -88,7 +97,8 @@ class VirtualMachine(object):
     self.reverse_operators = reverse_operators
     self.generate_unknowns = generate_unknowns
     self.cache_unknowns = cache_unknowns
-    self.loader = load_pytd.Loader(base_module=module_name, options=options)
+    self.loader = load_pytd.Loader(base_module=module_name, options=options,
+                                   shared_modules=shared_modules)
     self.frames = []  # The call stack of frames.
     self.frame = None  # The current frame.
     self.program = typegraph.Program(abort_on_complex=options.abort_on_complex)
@@ -96,6 +106,19 @@ class VirtualMachine(object):
     self.program.entrypoint = self.root_cfg_node
     self.vmbuiltins = self.loader.builtins
     self.convert = convert.Converter(self)
+    self._preloaded = None  # See preload_program.
+    # See abstract.InterpreterFunction.make_function.
+    self.function_cache = {}
+    # See abstract.InterpreterFunction.call.
+    self.call_cache = call_cache.CallCache(options.call_cache_size,
+                                           options.call_cache_min_cost)
+    # Map from opcode classes to (byte_* method, whether it takes the opcode).
+    if self.python_version[0] == 2:
+      mapping = opcodes.python2_mapping
+    else:
+      mapping = opcodes.python3_mapping
+    self._dispatch_table = {cls: self._make_dispatch_entry(cls)
+                            for cls in mapping.values()}
 
     # Map from builtin names to canonical objects.
     self.special_builtins = {
@@ -115,6 +138,9 @@ class VirtualMachine(object):
   def is_at_maximum_depth(self):
     return len(self.frames) > self.maximum_depth
 
+  def _make_dispatch_entry(self, cls):
+    return getattr(self, "byte_%s" % cls.__name__, None), cls.has_arg()
+
   def run_instruction(self, op, state):
     """Run a single bytecode instruction.
 
@@ -128,16 +154,25 @@ class VirtualMachine(object):
       FrameState right after this instruction that should roll over to the
       subsequent instruction.
     """
-    _opcode_counter.inc(op.name)
+    if metrics.enabled():
+      _opcode_counter.inc(op.name)
     if log.isEnabledFor(logging.INFO):
       self.log_opcode(op, state)
     self.frame.current_opcode = op
+    profiler = source_profiler.active()
+    if profiler:
+      profiler.enter(self.frame.current_opcode, self.program)
     try:
       # dispatch
-      bytecode_fn = getattr(self, "byte_%s" % op.name, None)
+      cls = op.opcode_class
+      try:
+        bytecode_fn, has_arg = self._dispatch_table[cls]
+      except KeyError:
+        bytecode_fn, has_arg = self._dispatch_table[cls] = (
+            self._make_dispatch_entry(cls))
       if bytecode_fn is None:
         raise VirtualMachineError("Unknown opcode: %s" % op.name)
-      if op.has_arg():
+      if has_arg:
         state = bytecode_fn(state, op)
       else:
         state = bytecode_fn(state)
@@ -154,6 +189,9 @@ class VirtualMachine(object):
       log.info("Exception in program: %s: %r",
                e.exception_type.__name__, e.message)
       state = state.set_why("exception")
+    finally:
+      if profiler:
+        profiler.exit(self.program)
     if state.why == "reraise":
       state = state.set_why("exception")
     del self.frame.current_opcode
@@ -493,11 +531,12 @@ class VirtualMachine(object):
     return " ".join(items)
 
   def compile_src(self, src, filename=None, mode="exec"):
-    code = pyc.compile_src(
-        src, python_version=self.python_version,
-        python_exe=self.options.python_exe,
-        filename=filename, mode=mode)
-    return blocks.process_code(code)
+    with tracing.span("compile", self.program):
+      code = pyc.compile_src(
+          src, python_version=self.python_version,
+          python_exe=self.options.python_exe,
+          filename=filename, mode=mode, cache=self.options.bytecode_cache)
+      return blocks.process_code(code, compact=self.options.compact_bytecode)
 
   def run_bytecode(self, node, code, f_globals=None, f_locals=None):
     frame = self.make_frame(node, code, f_globals=f_globals, f_locals=f_locals)
@@ -511,7 +550,11 @@ class VirtualMachine(object):
         src = fi.read()
     else:
       src = builtins.GetBuiltinsCode(self.python_version)
-    builtins_code = self.compile_src(src)
+    key = (src, self.python_version, self.options.python_exe,
+           self.options.compact_bytecode)
+    builtins_code = _compiled_builtins.get(key)
+    if builtins_code is None:
+      builtins_code = _compiled_builtins[key] = self.compile_src(src)
     node, f_globals, f_locals, _ = self.run_bytecode(node, builtins_code)
     assert not self.frames
     # TODO(kramm): pytype doesn't support namespacing of the currently parsed
@@ -523,7 +566,27 @@ class VirtualMachine(object):
     builtin_names = frozenset(f_globals.members)
     return node, f_globals, f_locals, builtin_names
 
-  def run_program(self, src, filename, maximum_depth, run_builtins):
+  def preload_program(self, maximum_depth, run_builtins):
+    """Do the part of run_program that doesn't depend on the program.
+
+    This can be called before run_program, to get a VM that's ready to run
+    any program, e.g. to fork it (see scripts/pytype).
+
+    Args:
+      maximum_depth: Maximum depth to follow call chains.
+      run_builtins: Whether to preload the native Python builtins.
+    """
+    assert self._preloaded is None
+    self.maximum_depth = sys.maxint if maximum_depth is None else maximum_depth
+    node = self.root_cfg_node.ConnectNew("builtins")
+    if run_builtins:
+      with tracing.span("preload_builtins", self.program):
+        self._preloaded = self.preload_builtins(node)
+    else:
+      self._preloaded = node, None, None, frozenset()
+
+  def run_program(self, src, filename, maximum_depth, run_builtins,
+                  deadline=None):
     """Run the code and return the CFG nodes.
 
     This function loads in the builtins and puts them ahead of `code`,
@@ -534,17 +597,24 @@ class VirtualMachine(object):
       filename: The filename the source is from.
       maximum_depth: Maximum depth to follow call chains.
       run_builtins: Whether to preload the native Python builtins.
+      deadline: The time.time() by which the analysis has to be done, or None
+        to allow options.max_seconds from now.
     Returns:
       A tuple (CFGNode, set) containing the last CFGNode of the program as
         well as all the top-level names defined by it.
     """
+    if self._preloaded is None:
+      self.preload_program(maximum_depth, run_builtins)
     self.maximum_depth = sys.maxint if maximum_depth is None else maximum_depth
-    node = self.root_cfg_node.ConnectNew("builtins")
-    if run_builtins:
-      node, f_globals, f_locals, builtin_names = self.preload_builtins(node)
-    else:
-      node, f_globals, f_locals, builtin_names = node, None, None, frozenset()
-
+    node, f_globals, f_locals, builtin_names = self._preloaded
+
+    # The budgets are for the module itself, not for the builtins, which may
+    # have been preloaded long before (see preload_program).
+    self.program.SetBudget(
+        max_cfg_nodes=self.options.max_cfg_nodes,
+        max_seconds=self.options.max_seconds,
+        max_memory=(self.options.max_memory and self.options.max_memory << 20),
+        deadline=deadline)
     code = self.compile_src(src, filename=filename)
 
     node = node.ConnectNew("init")
@@ -0,0 +1,66 @@
+"""Benchmark for the instruction loop of the VM.
+
+Usage:
+  python -m pytype.vm_benchmark [file.py ...]
+
+Runs the VM over test_data/pytree.py (or the given files) and all of their
+functions a few times, and prints how many bytecode instructions it executed
+per second. Only the interpreter is timed: loading the builtins before, and
+solving and printing the types after, are left out, so the numbers are
+dominated by VirtualMachine.run_instruction and the byte_* methods it
+dispatches to.
+"""
+
+import os
+import sys
+import time
+
+from pytype import config
+from pytype import errors
+from pytype import infer
+from pytype import vm
+
+
+def _run(src, options):
+  """Run the VM on a module and its functions. Returns the elapsed time."""
+  tracer = infer.CallTracer(errors.ErrorLog(), options,
+                            generate_unknowns=True)
+  start = time.time()
+  loc, defs, builtin_names = tracer.run_program(
+      src, None, infer.INIT_MAXIMUM_DEPTH, True)
+  tracer.analyze(loc, defs, builtin_names, None)
+  return time.time() - start
+
+
+def _count_instructions(src, options):
+  """Run the VM once, counting the instructions executed."""
+  count = [0]
+  run_instruction = vm.VirtualMachine.run_instruction
+  def counting_run_instruction(self, op, state):
+    count[0] += 1
+    return run_instruction(self, op, state)
+  vm.VirtualMachine.run_instruction = counting_run_instruction
+  try:
+    _run(src, options)
+  finally:
+    vm.VirtualMachine.run_instruction = run_instruction
+  return count[0]
+
+
+def main(argv):
+  filenames = argv[1:] or [os.path.join(os.path.dirname(__file__),
+                                        "test_data", "pytree.py")]
+  options = config.Options.create()
+  repeat = 5
+  for filename in filenames:
+    with open(filename) as fi:
+      src = fi.read()
+    instructions = _count_instructions(src, options)
+    seconds = min(_run(src, options) for _ in range(repeat))
+    print "%s: %d instructions, %.3f s, %.0f instructions/s" % (
+        os.path.basename(filename), instructions, seconds,
+        instructions / seconds)
+
+
+if __name__ == "__main__":
+  main(sys.argv)
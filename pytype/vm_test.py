@@ -7,9 +7,12 @@ import textwrap
 from pytype import blocks
 from pytype import config
 from pytype import errors
+from pytype import infer
+from pytype import metrics
 from pytype import vm
 from pytype.pyc import pyc
 from pytype.pytd import cfg
+from pytype.pytd import utils as pytd_utils
 from pytype.tests import test_inference
 
 
@@ -57,6 +60,23 @@ class BytecodeTest(test_inference.InferenceTest):
     v = vm.VirtualMachine(self.errorlog, self.options)
     v.run_bytecode(program.NewCFGNode(), code)
 
+  def test_opcode_counter(self):
+    # pylint: disable=protected-access
+    code = self.make_code([
+        0x64, 1, 0,  # 0 LOAD_CONST, arg=1 (1)
+        0x53,  # 3 RETURN_VALUE
+    ], name="simple")
+    code = blocks.process_code(code)
+    metrics._prepare_for_test(enabled=False)
+    vm._opcode_counter._reset()
+    v = vm.VirtualMachine(self.errorlog, self.options)
+    v.run_bytecode(cfg.Program().NewCFGNode(), code)
+    self.assertEquals("vm_opcode: 0 {}", str(vm._opcode_counter))
+    metrics._prepare_for_test()
+    v.run_bytecode(cfg.Program().NewCFGNode(), code)
+    self.assertEquals("vm_opcode: 2 {LOAD_CONST=1, RETURN_VALUE=1}",
+                      str(vm._opcode_counter))
+
   def test_diamond(self):
     program = cfg.Program()
     # Disassembled from:
@@ -181,5 +201,39 @@ class BytecodeTest(test_inference.InferenceTest):
     self.assertItemsEqual(self.trace_vm.instructions_executed, [0, 1, 5, 6])
 
 
+class PreloadTest(test_inference.InferenceTest):
+  """Tests for running programs in a VM that has preloaded the builtins."""
+
+  def testPreloadedTracer(self):
+    options = config.Options.create(python_version=self.PYTHON_VERSION,
+                                    python_exe=self.PYTHON_EXE)
+    errorlog = errors.ErrorLog()
+    tracer = infer.preload_tracer(errorlog, options, check=False,
+                                  cache_unknowns=True)
+    ty = infer.infer_types(textwrap.dedent("""\
+      def f():
+        return len([])
+      x = f()
+    """), errorlog, options, cache_unknowns=True, tracer=tracer)
+    self.assertTypesMatchPytd(pytd_utils.CanonicalOrdering(ty), """
+      def f() -> int
+      x = ...  # type: int
+    """)
+    self.assertFalse(errorlog.has_error())
+
+  def testCompiledBuiltinsDependOnCompactBytecode(self):
+    for compact in (False, True):
+      options = config.Options.create(python_version=self.PYTHON_VERSION,
+                                      python_exe=self.PYTHON_EXE,
+                                      compact_bytecode=compact)
+      infer.preload_tracer(errors.ErrorLog(), options, check=False)
+    # pylint: disable=protected-access
+    for (_, _, _, compact), code in vm._compiled_builtins.items():
+      self.assertEquals(compact, isinstance(code, blocks.CompactOrderedCode))
+    self.assertEquals({False, True},
+                      {key[3] for key in vm._compiled_builtins})
+    # pylint: enable=protected-access
+
+
 if __name__ == "__main__":
   test_inference.main()
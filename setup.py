@@ -34,7 +34,7 @@ setup(
               'pytype/pytd',
               'pytype/pytd/parse',
              ],
-    scripts=['scripts/pytype', 'scripts/pytd'],
+    scripts=['scripts/pytype', 'scripts/pytype-client', 'scripts/pytd'],
     package_data={'pytype': ['pytd/builtins/*.py*',
                              'pytd/stdlib/*.pytd',
                              'pytd/stdlib/*/*.pytd',